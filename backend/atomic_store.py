@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks below are per process only
+    fcntl = None
+
+"""Crash-safe JSON/text files shared by several processes.
+
+Writes go to a temp file in the same directory, are fsync'd, and then replace the target with
+os.replace, so readers see either the old or the new document and never a truncated one. Each
+write is recorded first in a small journal (<path>.journal: temp file name and checksum); if the
+process dies between the journal and the rename, the next writer or reader rolls the write forward
+when the temp file is complete, or discards it otherwise.
+
+Writers hold an exclusive flock on <path>.lock for the whole read-modify-write (update_json), so
+concurrent workers or overlapping ingests cannot overwrite each other's entries.
+
+read_json raises CorruptStoreError for an unparseable file instead of returning an empty value:
+callers must not mistake damage for "no data" (and, e.g., re-ingest everything).
+"""
+
+
+class CorruptStoreError(ValueError):
+    pass
+
+
+_local_locks: Dict[str, threading.RLock] = {}
+_local_locks_guard = threading.Lock()
+
+
+def _local_lock(path: str) -> threading.RLock:
+    with _local_locks_guard:
+        return _local_locks.setdefault(os.path.abspath(path), threading.RLock())
+
+
+@contextmanager
+def file_lock(path: str):
+    """Exclusive lock for `path` across threads and (on POSIX) processes."""
+    with _local_lock(path):
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(f"{path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _journal_path(path: str) -> str:
+    return f"{path}.journal"
+
+
+def _fsync_dir(path: str):
+    if os.name != "posix":
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)) or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def recover(path: str) -> bool:
+    """Finish or discard a write interrupted by a crash (caller holds the lock). True if rolled forward."""
+    journal = _journal_path(path)
+    if not os.path.exists(journal):
+        return False
+    rolled = False
+    try:
+        with open(journal, "r") as f:
+            entry = json.load(f)
+        tmp = entry.get("tmp", "")
+        if tmp and os.path.exists(tmp):
+            if _sha256_file(tmp) == entry.get("sha256"):
+                os.replace(tmp, path)
+                _fsync_dir(path)
+                rolled = True
+                print(f"Recovered interrupted write of {path}")
+            else:
+                os.remove(tmp)
+    except Exception as e:
+        print(f"Warning: discarding unreadable journal for {path}: {e}")
+    os.remove(journal)
+    return rolled
+
+
+def _write_locked(path: str, text: str):
+    data = text.encode("utf-8")
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    with open(_journal_path(path), "w") as f:
+        json.dump({"tmp": tmp, "sha256": hashlib.sha256(data).hexdigest(), "time": time.time()}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(path)
+    os.remove(_journal_path(path))
+
+
+def atomic_write_text(path: str, text: str):
+    with file_lock(path):
+        recover(path)
+        _write_locked(path, text)
+
+
+def write_json(path: str, data: Any, indent: int = 2):
+    atomic_write_text(path, json.dumps(data, indent=indent))
+
+
+def _read_locked(path: str, default: Any) -> Any:
+    if not os.path.exists(path):
+        return default
+    with open(path, "r") as f:
+        content = f.read().strip()
+    if not content:
+        return default
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError as e:
+        raise CorruptStoreError(f"{path} is not valid JSON ({e}); refusing to treat it as empty") from e
+
+
+def read_json(path: str, default: Any = None) -> Any:
+    """Parsed JSON at `path`, or `default` if the file is missing or empty. Raises CorruptStoreError
+    if it cannot be parsed (after completing any interrupted write)."""
+    if os.path.exists(_journal_path(path)):
+        with file_lock(path):
+            recover(path)
+            return _read_locked(path, default)
+    try:
+        return _read_locked(path, default)
+    except CorruptStoreError:
+        # A write may have been interrupted just now; retry under the lock after recovery
+        with file_lock(path):
+            recover(path)
+            return _read_locked(path, default)
+
+
+def update_json(path: str, fn: Callable[[Any], Any], default: Any = None, indent: int = 2) -> Any:
+    """Read-modify-write under the file lock: writes and returns fn(current)."""
+    with file_lock(path):
+        recover(path)
+        updated = fn(_read_locked(path, default))
+        _write_locked(path, json.dumps(updated, indent=indent))
+        return updated
@@ -0,0 +1,155 @@
+"""Batch compliance runs across many companies (nightly sweep).
+
+Stage 1 (amendment summaries) is company-independent, so it runs once on the union of every
+company's relevant amendments, in prompts of at most STAGE1_BATCH_SIZE amendments so the sweep
+does not outgrow the models' context as the corpus grows. Stages 2-5 then fan out per company on a thread pool; all LLM calls
+still go through the process-wide GroqPool, whose adaptive limiter caps global concurrency no
+matter how many companies run at once.
+
+Usage (from backend/):
+    python batch.py [--companies id1,id2] [--workers 4]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from prompt_chain import AmendmentAnalyzer, amendment_id
+from vigilo_utils import DATA_DIR, get_company_info, get_latest_filtered_amendments, list_companies
+
+# The shared Stage 1 run and the batch summary are logged under this pseudo company id
+BATCH_COMPANY_ID = "batch"
+UPLOADS_DIR = os.path.join(DATA_DIR, "uploads")
+DEFAULT_WORKERS = int(os.getenv("VIGILO_BATCH_WORKERS", "4"))
+
+
+def all_company_ids() -> List[str]:
+    ids, cursor = [], None
+    while True:
+        page = list_companies(limit=500, cursor=cursor)
+        ids.extend(item["company_id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            return ids
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return round(ordered[index], 3)
+
+
+def _run_company(company_id: str, analyzed: List[Dict], run_id: str) -> Dict:
+    started = time.perf_counter()
+    record: Dict = {"company_id": company_id, "status": "ok", "run_id": run_id}
+    try:
+        company = get_company_info(company_id)
+        if not company:
+            raise ValueError("Company not found")
+        analyzer = AmendmentAnalyzer(company_id=company_id, run_id=run_id)
+        result = analyzer.run_full_chain(company, uploads_dir=UPLOADS_DIR, analyzed_amendments=analyzed)
+        report = (result.get("final_report") or {}).get("compliance_report") or {}
+        models = ((result.get("telemetry") or {}).get("models") or {}).values()
+        record.update({
+            "company_name": company.get("name", ""),
+            "overall_status": report.get("overall_status", "unclear"),
+            "amendments": len(analyzed),
+            "llm_calls": sum(m["calls"] for m in models),
+            "tokens": sum(m["prompt_tokens"] + m["completion_tokens"] for m in models),
+            "cost_usd": round(sum(m["cost_usd"] for m in models), 6),
+        })
+    except Exception as e:
+        record.update({"status": "error", "error": str(e)})
+        print(f"Batch: company {company_id} failed: {e}")
+    record["duration_s"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def run_batch(company_ids: Optional[List[str]] = None, workers: int = DEFAULT_WORKERS) -> Dict:
+    """Run the compliance chain for `company_ids` (default: every registered company). Each company's
+    run is logged as run "batch_<timestamp>"; Stage 1 and batch_summary.json go to the "batch" run
+    log. Returns the summary."""
+    batch_started = time.perf_counter()
+    company_ids = company_ids or all_company_ids()
+    batch_id = f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    print(f"Batch: {len(company_ids)} companies, {workers} workers, run id {batch_id}")
+
+    # Union of every company's relevant amendments, each analyzed once
+    per_company: Dict[str, List[str]] = {}
+    union: Dict[str, Dict] = {}
+    for cid in company_ids:
+        amendments = get_latest_filtered_amendments(cid)
+        per_company[cid] = [amendment_id(a) for a in amendments]
+        for a in amendments:
+            union.setdefault(amendment_id(a), a)
+
+    shared = AmendmentAnalyzer(company_id=BATCH_COMPANY_ID, run_id=batch_id)
+    stage1_started = time.perf_counter()
+    inputs = shared.amendment_inputs(list(union.values()))
+    shared._write_json("inputs_amendments.json", {"amendments": inputs})
+    analyzed = shared.analyze_amendments(inputs)
+    stage1_s = time.perf_counter() - stage1_started
+    print(f"Batch: Stage 1 analyzed {len(inputs)} unique amendments in {stage1_s:.1f}s")
+
+    # Stage 1 carries each amendment's document_id through to its summary
+    by_id = {a["document_id"]: a for a in analyzed if isinstance(a, dict) and a.get("document_id")}
+
+    def company_amendments(cid: str) -> List[Dict]:
+        matched = [by_id[i] for i in per_company[cid] if i in by_id]
+        if len(matched) < len(per_company[cid]):
+            print(f"Batch: {len(per_company[cid]) - len(matched)} amendment(s) of {cid} have no Stage 1 summary")
+        return matched
+
+    records: List[Dict] = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [
+            executor.submit(_run_company, cid, company_amendments(cid), batch_id)
+            for cid in company_ids
+        ]
+        for future in as_completed(futures):
+            records.append(future.result())
+
+    wall_s = time.perf_counter() - batch_started
+    durations = [r["duration_s"] for r in records if r["status"] == "ok"]
+    summary = {
+        "batch_id": batch_id,
+        "run_log": shared.run.path,
+        "companies": len(company_ids),
+        "succeeded": len(durations),
+        "failed": len(records) - len(durations),
+        "workers": workers,
+        "unique_amendments": len(inputs),
+        "stage1_s": round(stage1_s, 3),
+        "stage1_telemetry": shared.tracer.summary(),
+        "wall_s": round(wall_s, 3),
+        "companies_per_min": round(len(records) / wall_s * 60, 2) if wall_s else 0.0,
+        "latency_s": {
+            "p50": _percentile(durations, 0.5),
+            "p95": _percentile(durations, 0.95),
+            "max": round(max(durations), 3) if durations else 0.0,
+        },
+        "llm_tokens": sum(r.get("tokens", 0) for r in records),
+        "llm_cost_usd": round(sum(r.get("cost_usd", 0.0) for r in records), 6),
+        "companies_detail": sorted(records, key=lambda r: r["company_id"]),
+    }
+    shared._write_json("batch_summary.json", summary)
+    print(f"Batch: {summary['succeeded']}/{summary['companies']} ok in {wall_s:.1f}s "
+          f"(p50 {summary['latency_s']['p50']}s, p95 {summary['latency_s']['p95']}s)")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--companies", default="", help="comma-separated company ids (default: all)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args()
+    ids = [c.strip() for c in args.companies.split(",") if c.strip()] or None
+    run_batch(ids, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
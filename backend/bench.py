@@ -0,0 +1,242 @@
+"""Micro-benchmarks against the PDFs shipped under backend/data.
+
+Usage (from backend/):
+    python bench.py script-filter [--repeat 20]
+    python bench.py pdf-backends [--backends pdfium,pdfminer,pdfplumber]
+    python bench.py vector-index [--synthetic 200000] [--queries 200] [--k 8] [--oversample 8]
+"""
+import argparse
+import glob
+import os
+import re
+import shutil
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+PDF_DIRS = ["pdfs", "dgft-pdfs", "gst-pdfs", "rbi-pdf", "uploads"]
+
+
+def _pdf_paths(dirs: List[str] = PDF_DIRS) -> List[str]:
+    paths: List[str] = []
+    for d in dirs:
+        paths.extend(sorted(glob.glob(os.path.join(DATA_DIR, d, "*.pdf"))))
+    return paths
+
+
+def _timeit(fn: Callable, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _report(rows: List[Dict]):
+    width = max(len(r["name"]) for r in rows)
+    for r in rows:
+        extra = "  ".join(f"{k}={v}" for k, v in r.items() if k not in ("name", "seconds"))
+        print(f"  {r['name']:<{width}}  {r['seconds'] * 1000:9.2f} ms  {extra}")
+
+
+# -------- script-filter --------
+
+def _legacy_filter_hindi(text: str) -> str:
+    """Pre-optimisation AmendmentAnalyzer._filter_hindi_content (two re.findall per line)."""
+    english_lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        devanagari_ratio = len(re.findall(r'[ऀ-ॿ]', line)) / max(1, len(line))
+        english_ratio = len(re.findall(r'[a-zA-Z]', line)) / max(1, len(line))
+        if english_ratio > devanagari_ratio or (english_ratio + devanagari_ratio) < 0.3:
+            english_lines.append(line)
+    return "\n".join(english_lines)
+
+
+def _legacy_excerpt(text: str, max_lines: int = 7) -> str:
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if len(re.findall(r'[ऀ-ॿ]', line)) / max(1, len(line)) > 0.3:
+            continue
+        if len(re.findall(r'[a-zA-Z]', line)) / max(1, len(line)) < 0.2:
+            continue
+        lines.append(line)
+        if len(lines) >= max_lines:
+            break
+    return " ".join(lines[:max_lines])
+
+
+def bench_script_filter(args):
+    from vigilo_utils import extract_text_from_pdf, filter_english_lines, extract_excerpt
+
+    texts = [t for t in (extract_text_from_pdf(p) for p in _pdf_paths()) if t]
+    chars = sum(len(t) for t in texts)
+    print(f"script-filter: {len(texts)} PDFs, {chars:,} characters, best of {args.repeat}")
+    for t in texts:
+        assert filter_english_lines(t) == _legacy_filter_hindi(t)
+        assert extract_excerpt(t, 50) == _legacy_excerpt(t, 50)
+
+    rows = []
+    for name, fn in [
+        ("filter legacy (re.findall)", lambda: [_legacy_filter_hindi(t) for t in texts]),
+        ("filter translate table", lambda: [filter_english_lines(t) for t in texts]),
+        ("excerpt(50) legacy", lambda: [_legacy_excerpt(t, 50) for t in texts]),
+        ("excerpt(50) translate table", lambda: [extract_excerpt(t, 50) for t in texts]),
+    ]:
+        seconds = _timeit(fn, args.repeat)
+        rows.append({"name": name, "seconds": seconds, "MB/s": round(chars / seconds / 1e6, 1)})
+    _report(rows)
+    print(f"  speedup filter: {rows[0]['seconds'] / rows[1]['seconds']:.2f}x  "
+          f"excerpt: {rows[2]['seconds'] / rows[3]['seconds']:.2f}x")
+
+
+# -------- pdf-backends --------
+
+def bench_pdf_backends(args):
+    from pdf_backends import FallbackBackend, make_backend
+
+    paths = _pdf_paths(["pdfs", "dgft-pdfs", "uploads"])
+    print(f"pdf-backends: {len(paths)} PDFs (pdfs, dgft-pdfs, uploads)")
+    rows = []
+    for name in args.backends.split(","):
+        backend = make_backend(name.strip())
+        pages = chars = failed = 0
+        started = time.perf_counter()
+        for path in paths:
+            try:
+                for text in backend.iter_pages(path):
+                    pages += 1
+                    chars += len(text)
+            except Exception as e:
+                failed += 1
+                print(f"  {backend.name}: {os.path.basename(path)} failed: {e}")
+        seconds = time.perf_counter() - started
+        row = {"name": backend.name, "seconds": seconds, "pages": pages, "chars": chars,
+               "pages/s": round(pages / seconds, 1) if seconds else 0.0, "failed": failed}
+        if isinstance(backend, FallbackBackend):
+            row["fallback_pages"] = backend.stats["fallback_pages"]
+        rows.append(row)
+    _report(rows)
+
+
+# -------- vector-index --------
+
+def _corpus_vectors(args):
+    """(ids, float32 matrix) from the persisted Chroma collections, or a synthetic clustered corpus."""
+    import numpy as np
+
+    if args.synthetic:
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(max(1, args.synthetic // 200), args.dim)).astype(np.float32)
+        vectors = centers[rng.integers(0, len(centers), args.synthetic)] + 0.35 * rng.normal(size=(args.synthetic, args.dim))
+        vectors = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+        return [f"s{i}" for i in range(len(vectors))], vectors
+    from vector_registry import SOURCES, collection_name
+    from vigilo_utils import VECTOR_DB_DIR, _open_chroma
+
+    ids, rows = [], []
+    for source in SOURCES:
+        collection = _open_chroma(collection_name(source), VECTOR_DB_DIR)._collection
+        for offset in range(0, collection.count(), 5000):
+            batch = collection.get(include=["embeddings"], limit=5000, offset=offset)
+            ids.extend(batch["ids"])
+            rows.extend(batch["embeddings"])
+    return ids, np.asarray(rows, dtype=np.float32)
+
+
+def _file_mb(*paths: str) -> float:
+    return sum(os.path.getsize(p) for p in paths if os.path.exists(p)) / 1e6
+
+
+def bench_vector_index(args):
+    import chromadb
+    import numpy as np
+
+    from quantized_index import QuantizedCollection
+
+    ids, vectors = _corpus_vectors(args)
+    if not len(ids):
+        print("vector-index: no vectors (ingest first or pass --synthetic N)")
+        return
+    rng = np.random.default_rng(1)
+    # Queries: stored vectors with noise, so the exact neighbours are not just the vector itself
+    queries = vectors[rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)]
+    queries = queries + 0.1 * rng.normal(size=queries.shape).astype(np.float32) * np.abs(queries).mean()
+    norms = (vectors * vectors).sum(axis=1)
+    truth = [set(np.argsort(norms - 2 * vectors @ q)[:args.k].tolist()) for q in queries]
+    print(f"vector-index: {len(ids):,} vectors x {vectors.shape[1]} dims, {len(queries)} queries, recall@{args.k} "
+          f"against exact float32 search")
+
+    workdir = tempfile.mkdtemp(prefix="vigilo-bench-")
+    rows = []
+    try:
+        client = chromadb.PersistentClient(path=os.path.join(workdir, "chroma"))
+        collection = client.create_collection("bench", metadata={"hnsw:space": "l2"})
+        for start in range(0, len(ids), 5000):
+            collection.add(ids=[str(i) for i in range(start, min(start + 5000, len(ids)))],
+                           embeddings=vectors[start:start + 5000].tolist())
+        started = time.perf_counter()
+        hits = [collection.query(query_embeddings=[q.tolist()], n_results=args.k)["ids"][0] for q in queries]
+        seconds = time.perf_counter() - started
+        hnsw = glob.glob(os.path.join(workdir, "chroma", "*", "*.bin"))
+        resident = max(_file_mb(*hnsw), len(ids) * vectors.shape[1] * 4 / 1e6)
+        rows.append({"name": "chroma hnsw float32", "seconds": seconds / len(queries),
+                     "recall": round(np.mean([len(t & {int(h) for h in hit}) / args.k for t, hit in zip(truth, hits)]), 4),
+                     "resident_MB": round(resident, 1), "disk_MB": round(_file_mb(*_walk(os.path.join(workdir, "chroma"))), 1)})
+
+        for mode in ("int8", "binary"):
+            index = QuantizedCollection(os.path.join(workdir, mode), mode)
+            for start in range(0, len(ids), 5000):
+                index.upsert(ids[start:start + 5000], vectors[start:start + 5000])
+            oversample = args.oversample * (4 if mode == "binary" else 1)
+            started = time.perf_counter()
+            hits = [index.search(q, args.k, oversample=oversample) for q in queries]
+            seconds = time.perf_counter() - started
+            resident = [index._path(n) for n in ("codes.bin", "norms.f32", "scales.f32")]
+            rows.append({"name": f"{mode} mmap + re-rank (x{oversample})", "seconds": seconds / len(queries),
+                         "recall": round(np.mean([len(t & {p for p, _ in hit}) / args.k for t, hit in zip(truth, hits)]), 4),
+                         "resident_MB": round(_file_mb(*resident), 1), "disk_MB": round(_file_mb(*_walk(index.directory)), 1)})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print("  (seconds column is per query; resident = HNSW graph + vectors for Chroma, codes + norms for mmap)")
+    _report(rows)
+
+
+def _walk(directory: str) -> List[str]:
+    return [os.path.join(d, f) for d, _, files in os.walk(directory) for f in files]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("script-filter", help="Devanagari line filtering: legacy regex vs translate table")
+    p.add_argument("--repeat", type=int, default=20)
+    p.set_defaults(func=bench_script_filter)
+
+    p = sub.add_parser("pdf-backends", help="PDF text extraction throughput per backend")
+    p.add_argument("--backends", default="pdfium,pdfminer,pdfplumber")
+    p.set_defaults(func=bench_pdf_backends)
+
+    p = sub.add_parser("vector-index", help="Memory and recall: Chroma HNSW vs quantized mmap index")
+    p.add_argument("--synthetic", type=int, default=0, help="use N synthetic vectors instead of data/vector_db")
+    p.add_argument("--dim", type=int, default=384)
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--k", type=int, default=8)
+    p.add_argument("--oversample", type=int, default=8, help="int8 candidates per result (binary uses 4x)")
+    p.set_defaults(func=bench_vector_index)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
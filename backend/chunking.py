@@ -0,0 +1,165 @@
+import math
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+"""Page- and clause-aware chunking of regulations and company documents.
+
+Text is split per page, and within a page at clause/schedule headings ("Regulation 2.3.1",
+"2.3.1 Labelling of ...", "SCHEDULE II", "Annexure-A"), before the character splitter runs, so a
+chunk never straddles two clauses or two pages. Every chunk carries its 1-based page, the heading
+of the clause it belongs to (carried across page breaks) and its character span within the page,
+which lets retrieval merge neighbouring chunks without repeating the splitter overlap.
+"""
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+_HEADING_RE = re.compile(
+    r'^\s*(?:'
+    r'(?:Regulation|Reg\.|Sub-regulation|Rule|Clause|Section|Para(?:graph)?)\s+\d+(?:\.\d+)*[A-Za-z]?\b'
+    r'|(?:SCHEDULE|Schedule|ANNEXURE|Annexure|APPENDIX|Appendix|FORM|Form)\s*[-–]?\s*(?:[IVXLC]+|\d+|[A-Z])\b'
+    r'|\d+(?:\.\d+){1,4}\.?\s+[A-Z(]'
+    r')'
+)
+MAX_HEADING_CHARS = 80
+
+
+def section_heading(line: str) -> Optional[str]:
+    """Return the heading label if `line` starts a clause or schedule, else None."""
+    if not _HEADING_RE.match(line):
+        return None
+    heading = " ".join(line.split())
+    return heading if len(heading) <= MAX_HEADING_CHARS else heading[:MAX_HEADING_CHARS].rsplit(" ", 1)[0] + "…"
+
+
+def split_sections(page_text: str, current: Optional[str] = None) -> List[Tuple[Optional[str], int, str]]:
+    """Split one page into [(heading, start offset, text)] blocks. Text before the first heading on
+    the page continues the clause `current` from the previous page."""
+    blocks: List[Tuple[Optional[str], int, str]] = []
+    start = 0
+    offset = 0
+    for line in page_text.splitlines(keepends=True):
+        heading = section_heading(line)
+        if heading and offset > start:
+            blocks.append((current, start, page_text[start:offset]))
+            start = offset
+        if heading:
+            current = heading
+        offset += len(line)
+    if offset > start:
+        blocks.append((current, start, page_text[start:offset]))
+    return [b for b in blocks if b[2].strip()]
+
+
+def chunk_pages(pages: Iterable[str], metadata: Dict, chunk_size: int = CHUNK_SIZE,
+                chunk_overlap: int = CHUNK_OVERLAP, paged: bool = True) -> List[Document]:
+    """Chunk page texts (in order) into Documents with page/section/span metadata.
+    With `paged=False` the input is one page-less text and no page number is recorded."""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len)
+    documents: List[Document] = []
+    current: Optional[str] = None
+    for page_no, page_text in enumerate(pages, start=1):
+        if not page_text:
+            continue
+        for heading, block_start, block in split_sections(page_text, current):
+            current = heading
+            local, previous_len = 0, 0
+            for chunk in splitter.split_text(block):
+                # Same start-index recovery as the splitter's add_start_index: the next chunk begins
+                # at most `chunk_overlap` characters before the previous one ended
+                search_from = max(0, local + previous_len - chunk_overlap)
+                found = block.find(chunk, search_from)
+                local = found if found >= 0 else search_from
+                previous_len = len(chunk)
+                doc_metadata = metadata.copy()
+                doc_metadata["chunk"] = len(documents)
+                if paged:
+                    doc_metadata["page"] = page_no
+                if heading:
+                    doc_metadata["section"] = heading
+                doc_metadata["start"] = block_start + local
+                doc_metadata["end"] = block_start + local + len(chunk)
+                documents.append(Document(page_content=chunk, metadata=doc_metadata))
+    return documents
+
+
+def merge_overlapping_chunks(documents: List[Document]) -> List[Document]:
+    """Merge chunks of the same document page and clause whose spans overlap or touch, dropping the
+    repeated overlap text. Result is in document order; chunks without span metadata pass through."""
+    spanned, loose = [], []
+    for d in documents:
+        (spanned if "start" in d.metadata and "end" in d.metadata else loose).append(d)
+    spanned.sort(key=lambda d: (str(d.metadata.get("document_id", "")), d.metadata.get("page") or 0, d.metadata["start"]))
+    merged: List[Document] = []
+    for d in spanned:
+        prev = merged[-1] if merged else None
+        if (prev is not None
+                and prev.metadata.get("document_id") == d.metadata.get("document_id")
+                and prev.metadata.get("page") == d.metadata.get("page")
+                and prev.metadata.get("section") == d.metadata.get("section")
+                and d.metadata["start"] <= prev.metadata["end"]):
+            if d.metadata["end"] > prev.metadata["end"]:
+                tail = d.page_content[prev.metadata["end"] - d.metadata["start"]:]
+                prev.page_content += tail
+                prev.metadata["end"] = d.metadata["end"]
+            continue
+        merged.append(Document(page_content=d.page_content, metadata=dict(d.metadata)))
+    return merged + loose
+
+
+def chunk_label(metadata: Dict) -> str:
+    """Page indicator shown to the model, e.g. "[p. 3 | Regulation 2.3.1]"."""
+    parts = []
+    if metadata.get("page"):
+        parts.append(f"p. {metadata['page']}")
+    if metadata.get("section"):
+        parts.append(metadata["section"])
+    return f"[{' | '.join(parts)}]" if parts else ""
+
+
+def format_chunks(documents: List[Document]) -> str:
+    return "\n".join(f"{chunk_label(d.metadata)} {d.page_content.strip()}".strip() for d in documents)
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    na = math.sqrt(sum(x * x for x in a))
+    nb = math.sqrt(sum(y * y for y in b))
+    return dot / (na * nb) if na and nb else 0.0
+
+
+def select_evidence(documents: List[Document], query: str, max_chars: int,
+                    embed_fn: Optional[Callable[[List[str]], List[List[float]]]] = None,
+                    vectors: Optional[List[List[float]]] = None) -> List[Document]:
+    """Pick the chunks most similar to `query` until `max_chars` of labelled text is reached, then
+    merge overlaps and restore document order. Precomputed chunk `vectors` are used when given
+    (only the query is embedded). Without an embedding function (or query) the leading chunks
+    are used."""
+    if not documents:
+        return []
+    order = list(range(len(documents)))
+    if embed_fn and query:
+        try:
+            if vectors is not None and len(vectors) == len(documents):
+                query_vector = embed_fn([query])[0]
+            else:
+                query_vector, *vectors = embed_fn([query] + [d.page_content for d in documents])
+            scores = [_cosine(query_vector, v) for v in vectors]
+            order.sort(key=lambda i: -scores[i])
+        except Exception as e:
+            print(f"Warning: evidence ranking failed, using leading chunks: {e}")
+    picked: List[Document] = []
+    used = 0
+    for i in order:
+        d = documents[i]
+        cost = len(d.page_content) + len(chunk_label(d.metadata)) + 2
+        if used + cost > max_chars and picked:
+            continue
+        picked.append(d)
+        used += cost
+        if used >= max_chars:
+            break
+    return merge_overlapping_chunks(picked)
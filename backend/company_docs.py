@@ -0,0 +1,187 @@
+import json
+import os
+import threading
+import time
+from array import array
+from typing import Dict, List, NamedTuple, Optional
+
+from langchain_core.documents import Document
+
+from chunking import chunk_pages
+from text_cache import file_sha256
+from vigilo_utils import (
+    DATA_DIR,
+    embeddings,
+    extract_document_pages,
+    filter_english_lines,
+    get_company_label_paths,
+    get_company_legal_documents,
+)
+
+"""Per-company store of pre-processed uploads.
+
+Built right after /company/submit (background task) and read by the compliance chain, so a check
+starts without parsing a single PDF. For each of the company's own legal documents and packaging
+labels it keeps the English-only page texts, clause-aware evidence chunks and their embeddings
+(raw page text lives in the content-hash text cache, see text_cache.py):
+
+  data/company_docs/<company_id>/index.json     document list in submission order
+  data/company_docs/<company_id>/<sha256>.json  cleaned pages + chunks
+  data/company_docs/<company_id>/<sha256>.f32   chunk embeddings (float32, row-major)
+"""
+
+COMPANY_DOCS_DIR = os.path.join(DATA_DIR, "company_docs")
+# Evidence windows for Stage 3/4 (see AmendmentAnalyzer._document_evidence)
+EVIDENCE_CHUNK_SIZE = 600
+EVIDENCE_CHUNK_OVERLAP = 120
+# Very long uploads (full audit reports) are indexed up to this many cleaned characters
+MAX_INDEX_CHARS = 200_000
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+class CompanyDocument(NamedTuple):
+    name: str
+    document_type: str
+    kind: str  # "legal" or "label"
+    path: str
+    sha256: str
+    pages: List[str]
+    chunks: List[Document]
+    vectors: Optional[List[List[float]]]
+
+
+def _company_dir(company_id: str) -> str:
+    return os.path.join(COMPANY_DOCS_DIR, company_id)
+
+
+def _company_lock(company_id: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(company_id, threading.Lock())
+
+
+def _write_json(path: str, payload: Dict):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _company_files(company_id: str) -> List[Dict]:
+    files = [{"document_type": t, "kind": "legal", "path": p} for t, p in get_company_legal_documents(company_id)]
+    files += [{"document_type": name.split(":", 1)[0], "kind": "label", "path": p}
+              for name, p in get_company_label_paths(company_id)]
+    return files
+
+
+def _clean_pages(pages: List[str]) -> List[str]:
+    cleaned, total = [], 0
+    for page in pages:
+        english = filter_english_lines(page) if total < MAX_INDEX_CHARS else ""
+        total += len(english)
+        cleaned.append(english)
+    return cleaned
+
+
+def _index_file(company_dir: str, entry: Dict) -> Dict:
+    path = entry["path"]
+    sha = file_sha256(path)
+    doc_path = os.path.join(company_dir, f"{sha}.json")
+    vec_path = os.path.join(company_dir, f"{sha}.f32")
+    meta = {**entry, "name": f"{entry['document_type']}: {os.path.basename(path)}", "sha256": sha}
+    if os.path.exists(doc_path):
+        with open(doc_path, "r", encoding="utf-8") as f:
+            stored = json.load(f)
+        return {**meta, "pages": len(stored["pages"]), "chunks": len(stored["chunks"]), "dim": stored.get("dim", 0)}
+
+    pages = _clean_pages(extract_document_pages(path))
+    paged = os.path.splitext(path)[1].lower() == ".pdf"
+    chunks = chunk_pages(pages, {"document_id": sha}, chunk_size=EVIDENCE_CHUNK_SIZE,
+                         chunk_overlap=EVIDENCE_CHUNK_OVERLAP, paged=paged)
+    dim = 0
+    if chunks:
+        try:
+            vectors = embeddings.embed_documents([c.page_content for c in chunks])
+            dim = len(vectors[0])
+            flat = array("f")
+            for v in vectors:
+                flat.extend(v)
+            with open(vec_path, "wb") as f:
+                flat.tofile(f)
+        except Exception as e:
+            print(f"Warning: could not embed {os.path.basename(path)}: {e}")
+    _write_json(doc_path, {
+        "sha256": sha,
+        "dim": dim,
+        "pages": pages,
+        "chunks": [{"text": c.page_content, "metadata": c.metadata} for c in chunks],
+    })
+    return {**meta, "pages": len(pages), "chunks": len(chunks), "dim": dim}
+
+
+def index_company_documents(company_id: str) -> Dict:
+    """(Re)build the company's document store; unchanged files (same content hash) are reused."""
+    started = time.perf_counter()
+    company_dir = _company_dir(company_id)
+    with _company_lock(company_id):
+        os.makedirs(company_dir, exist_ok=True)
+        documents = []
+        for entry in _company_files(company_id):
+            try:
+                documents.append(_index_file(company_dir, entry))
+            except Exception as e:
+                print(f"Error indexing {entry['path']} for company {company_id}: {e}")
+                documents.append({**entry, "error": str(e)})
+        index = {"company_id": company_id, "updated": time.time(), "documents": documents}
+        _write_json(os.path.join(company_dir, "index.json"), index)
+    print(f"Indexed {len(documents)} document(s) for company {company_id} in {time.perf_counter() - started:.1f}s")
+    return index
+
+
+def _load_index(company_id: str) -> Optional[Dict]:
+    path = os.path.join(_company_dir(company_id), "index.json")
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Warning: unreadable document index for company {company_id}: {e}")
+        return None
+
+
+def _load_document(company_dir: str, meta: Dict) -> CompanyDocument:
+    with open(os.path.join(company_dir, f"{meta['sha256']}.json"), "r", encoding="utf-8") as f:
+        stored = json.load(f)
+    chunks = [Document(page_content=c["text"], metadata=c["metadata"]) for c in stored["chunks"]]
+    vectors = None
+    dim = stored.get("dim") or 0
+    vec_path = os.path.join(company_dir, f"{meta['sha256']}.f32")
+    if dim and os.path.exists(vec_path):
+        flat = array("f")
+        with open(vec_path, "rb") as f:
+            flat.frombytes(f.read())
+        if len(flat) == dim * len(chunks):
+            vectors = [flat[i * dim:(i + 1) * dim].tolist() for i in range(len(chunks))]
+    return CompanyDocument(meta["name"], meta["document_type"], meta["kind"], meta["path"],
+                           meta["sha256"], stored["pages"], chunks, vectors)
+
+
+def load_company_documents(company_id: str) -> List[CompanyDocument]:
+    """The company's indexed documents in submission order (legal documents, then labels).
+    The store is (re)built on demand when it is missing or the company's files changed."""
+    index = _load_index(company_id)
+    wanted = [f["path"] for f in _company_files(company_id)]
+    if index is None or [d["path"] for d in index["documents"]] != wanted:
+        index = index_company_documents(company_id)
+    company_dir = _company_dir(company_id)
+    out: List[CompanyDocument] = []
+    for meta in index["documents"]:
+        if meta.get("error"):
+            continue
+        try:
+            out.append(_load_document(company_dir, meta))
+        except Exception as e:
+            print(f"Warning: could not load indexed document {meta.get('name')}: {e}")
+    return out
@@ -0,0 +1,207 @@
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from atomic_store import atomic_write_text, read_json
+
+"""Indexed registry of submitted companies.
+
+Company JSON files under data/companies remain the source of truth; this registry keeps a SQLite
+index of them (company_id, name, business type, updated_at) so "latest company" and listings are
+index lookups instead of a directory scan with one stat per file, and caches parsed company data
+(raw dict and validated model) in process. A cached entry is dropped when the registry writes the
+company, and re-read if the file's mtime changed underneath (another process saved it).
+"""
+
+CACHE_SIZE = 512
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _encode_cursor(updated_at: float, company_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{updated_at!r}|{company_id}".encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, str]:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    updated_at, company_id = raw.split("|", 1)
+    return float(updated_at), company_id
+
+
+class CompanyRegistry:
+    def __init__(self, companies_dir: str, db_path: str, model_cls=None):
+        self.companies_dir = companies_dir
+        self.db_path = db_path
+        self.model_cls = model_cls
+        self._cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(companies_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS companies ("
+                " company_id TEXT PRIMARY KEY, name TEXT, business_type TEXT, fssai_license TEXT,"
+                " updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_companies_updated ON companies(updated_at DESC, company_id DESC)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_companies_name ON companies(name)")
+        self.reconcile()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def path_for(self, company_id: str) -> str:
+        return os.path.join(self.companies_dir, f"{company_id}.json")
+
+    @staticmethod
+    def _summary(data: Dict) -> Tuple[str, str, str]:
+        ci = data.get("company_info") or {}
+        return ci.get("company_name", ""), ci.get("business_type", ""), ci.get("fssai_license", "")
+
+    def _upsert(self, conn: sqlite3.Connection, company_id: str, data: Dict, updated_at: float):
+        conn.execute(
+            "INSERT INTO companies (company_id, name, business_type, fssai_license, updated_at) VALUES (?,?,?,?,?)"
+            " ON CONFLICT(company_id) DO UPDATE SET name=excluded.name, business_type=excluded.business_type,"
+            " fssai_license=excluded.fssai_license, updated_at=excluded.updated_at",
+            (company_id, *self._summary(data), updated_at))
+
+    def reconcile(self) -> int:
+        """Index company files that are missing from (or newer than) the registry, and drop rows
+        whose file is gone. One directory scan, run at startup."""
+        with self._connect() as conn:
+            known = dict(conn.execute("SELECT company_id, updated_at FROM companies").fetchall())
+            seen = set()
+            changed = 0
+            for entry in os.scandir(self.companies_dir):
+                if not entry.name.endswith(".json") or not entry.is_file():
+                    continue
+                company_id = entry.name[:-len(".json")]
+                seen.add(company_id)
+                mtime = entry.stat().st_mtime
+                if company_id in known and known[company_id] >= mtime:
+                    continue
+                data = self._read_file(entry.path)
+                if data is None:
+                    continue
+                self._upsert(conn, company_id, data, mtime)
+                changed += 1
+            gone = [(cid,) for cid in known if cid not in seen]
+            conn.executemany("DELETE FROM companies WHERE company_id = ?", gone)
+        if changed or gone:
+            print(f"Company registry: indexed {changed} file(s), removed {len(gone)} stale row(s)")
+        return changed
+
+    @staticmethod
+    def _read_file(path: str) -> Optional[Dict]:
+        try:
+            return read_json(path)
+        except Exception as e:
+            print(f"Warning: unreadable company file {path}: {e}")
+            return None
+
+    # -------- writes --------
+
+    def save(self, company_id: str, payload: str) -> str:
+        """Write the company's JSON document and index it; returns the file path."""
+        path = self.path_for(company_id)
+        atomic_write_text(path, payload)
+        with self._connect() as conn:
+            self._upsert(conn, company_id, json.loads(payload), time.time())
+        self.invalidate(company_id)
+        return path
+
+    def invalidate(self, company_id: str):
+        with self._lock:
+            self._cache.pop(company_id, None)
+
+    # -------- reads --------
+
+    def _entry(self, company_id: str) -> Optional[Dict]:
+        path = self.path_for(company_id)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            self.invalidate(company_id)
+            return None
+        with self._lock:
+            entry = self._cache.get(company_id)
+            if entry is not None and entry["mtime"] == mtime:
+                self._cache.move_to_end(company_id)
+                return entry
+        data = self._read_file(path)
+        if data is None:
+            return None
+        entry = {"mtime": mtime, "data": data, "model": None}
+        with self._lock:
+            self._cache[company_id] = entry
+            self._cache.move_to_end(company_id)
+            while len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return entry
+
+    def get(self, company_id: str) -> Optional[Dict]:
+        """Parsed company JSON (shared cached object: treat as read-only), or None."""
+        entry = self._entry(company_id)
+        return entry["data"] if entry else None
+
+    def get_model(self, company_id: str):
+        """Company data validated as `model_cls`, cached alongside the raw JSON; None if missing or invalid."""
+        entry = self._entry(company_id)
+        if entry is None or self.model_cls is None:
+            return None
+        if entry["model"] is None:
+            try:
+                entry["model"] = self.model_cls.model_validate(entry["data"])
+            except Exception as e:
+                print(f"Warning: company {company_id} does not match the schema: {e}")
+                return None
+        return entry["model"]
+
+    def latest_id(self) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT company_id FROM companies ORDER BY updated_at DESC, company_id DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def count(self, query: str = "") -> int:
+        with self._connect() as conn:
+            if query:
+                return conn.execute("SELECT COUNT(*) FROM companies WHERE name LIKE ?", (f"%{query}%",)).fetchone()[0]
+            return conn.execute("SELECT COUNT(*) FROM companies").fetchone()[0]
+
+    def list(self, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, query: str = "") -> Dict:
+        """Companies, most recently updated first, with keyset pagination:
+        {"items": [...], "next_cursor": str|None}. `query` filters by name substring."""
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        where, params = [], []
+        if cursor:
+            updated_at, company_id = _decode_cursor(cursor)
+            where.append("(updated_at < ? OR (updated_at = ? AND company_id < ?))")
+            params += [updated_at, updated_at, company_id]
+        if query:
+            where.append("name LIKE ?")
+            params.append(f"%{query}%")
+        sql = "SELECT company_id, name, business_type, fssai_license, updated_at FROM companies"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY updated_at DESC, company_id DESC LIMIT ?"
+        with self._connect() as conn:
+            rows = conn.execute(sql, (*params, limit + 1)).fetchall()
+        items = [
+            {"company_id": r[0], "company_name": r[1], "business_type": r[2], "fssai_license": r[3], "updated_at": r[4]}
+            for r in rows[:limit]
+        ]
+        next_cursor = _encode_cursor(rows[limit - 1][4], rows[limit - 1][0]) if len(rows) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
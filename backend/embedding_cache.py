@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+from telemetry import Counter, REGISTRY
+
+"""Persistent embedding cache in front of the sentence-transformer model.
+
+Vectors are keyed by sha256(model, kind, text), where kind is "document" or "query", and stored
+as float16 (half the size of float32, well within the precision cosine/L2 ranking needs) in a
+SQLite file under backend/data. embed_documents looks a whole batch up in one query, embeds only
+the texts it has not seen (deduplicated, in one batched model call) and stores them, so company
+descriptions, amendment descriptions, evidence chunks and cache prompts that recur across
+requests reach the model once. A small in-process LRU keeps the hottest vectors out of SQLite.
+
+Configuration (environment):
+  VIGILO_EMBED_CACHE         path of the SQLite file, or "off" to disable
+  VIGILO_EMBED_CACHE_MAX_MB  size budget before least recently used vectors are evicted (default 512)
+"""
+
+EMBED_CACHE_LOOKUPS = Counter("vigilo_embedding_cache_lookups_total", "Embedding cache lookups by result")
+REGISTRY.extend([EMBED_CACHE_LOOKUPS])
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+MEMORY_ITEMS = 4096
+# SQLite host-parameter limit stays well above this
+LOOKUP_BATCH = 500
+# Per-row overhead (key, columns, index entry) counted against the size budget
+ROW_OVERHEAD = 100
+# Re-read the exact store size after this many writes (other workers share the file)
+SIZE_RESYNC_WRITES = 256
+
+
+def embedding_key(model: str, kind: str, text: str) -> str:
+    return hashlib.sha256(json.dumps([model, kind, text], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _pack(vector: List[float]) -> bytes:
+    return struct.pack(f"{len(vector)}e", *vector)
+
+
+def _unpack(blob: bytes) -> List[float]:
+    return list(struct.unpack(f"{len(blob) // 2}e", blob))
+
+
+class CachedEmbeddings(Embeddings):
+    """Drop-in replacement for the wrapped LangChain Embeddings object."""
+
+    def __init__(self, base: Embeddings, model: str, path: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.base = base
+        self.model = model
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._session = {"hits": 0, "misses": 0, "model_calls": 0}
+        # Running estimate of the store size, so writes do not scan the table to check the budget
+        self._approx_bytes = 0
+        self._writes_since_sync = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY, model TEXT, dim INTEGER, vector BLOB, created REAL, last_access REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_lru ON embeddings(last_access)")
+            self._approx_bytes = self._store_bytes(conn)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _remember(self, key: str, vector: List[float]):
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > MEMORY_ITEMS:
+                self._memory.popitem(last=False)
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+        missing = [k for k in keys if k not in found]
+        if not missing:
+            return found
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                for i in range(0, len(missing), LOOKUP_BATCH):
+                    batch = missing[i:i + LOOKUP_BATCH]
+                    rows = conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                                        batch).fetchall()
+                    for key, blob in rows:
+                        found[key] = _unpack(blob)
+                        self._remember(key, found[key])
+                    conn.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, k) for k, _ in rows])
+        except sqlite3.Error as e:
+            print(f"Warning: embedding cache lookup failed: {e}")
+        return found
+
+    def _store(self, items: Dict[str, List[float]]):
+        now = time.time()
+        rows = []
+        for key, vector in items.items():
+            blob = _pack(vector)
+            # Return the stored (float16) values on the first call too, so results never depend on hit/miss
+            items[key] = _unpack(blob)
+            self._remember(key, items[key])
+            rows.append((key, self.model, len(vector), blob, now, now))
+        try:
+            with self._connect() as conn:
+                conn.executemany("INSERT OR REPLACE INTO embeddings (key, model, dim, vector, created, last_access)"
+                                 " VALUES (?,?,?,?,?,?)", rows)
+                self._evict(conn, sum(len(r[3]) + ROW_OVERHEAD for r in rows), len(rows))
+        except sqlite3.Error as e:
+            print(f"Warning: embedding cache write failed: {e}")
+
+    @staticmethod
+    def _store_bytes(conn: sqlite3.Connection) -> int:
+        return conn.execute(
+            f"SELECT COALESCE(SUM(LENGTH(vector)) + COUNT(*) * {ROW_OVERHEAD}, 0) FROM embeddings").fetchone()[0]
+
+    def _evict(self, conn: sqlite3.Connection, written: int, rows: int):
+        with self._lock:
+            self._approx_bytes += written
+            self._writes_since_sync += rows
+            if self._approx_bytes <= self.max_bytes and self._writes_since_sync < SIZE_RESYNC_WRITES:
+                return
+            self._writes_since_sync = 0
+        # Only scan the table when the estimate says we may be over budget, or it is due a resync
+        total = self._store_bytes(conn)
+        if total > self.max_bytes:
+            # Drop least recently used vectors until we are 10% under budget
+            target, freed, victims = total - int(self.max_bytes * 0.9), 0, []
+            for key, size in conn.execute(
+                    f"SELECT key, LENGTH(vector) + {ROW_OVERHEAD} FROM embeddings ORDER BY last_access ASC"):
+                victims.append((key,))
+                freed += size
+                if freed >= target:
+                    break
+            conn.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+            total -= freed
+        with self._lock:
+            self._approx_bytes = total
+
+    def _embed(self, texts: List[str], kind: str) -> List[List[float]]:
+        keys = [embedding_key(self.model, kind, t) for t in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+        todo = {k: t for k, t in zip(keys, texts) if k not in found}
+        if todo:
+            if kind == "query" and len(todo) == 1:
+                computed = [self.base.embed_query(next(iter(todo.values())))]
+            else:
+                computed = self.base.embed_documents(list(todo.values()))
+            fresh = dict(zip(todo, computed))
+            self._store(fresh)
+            found.update(fresh)
+        hits, misses = len(keys) - len(todo), len(todo)
+        EMBED_CACHE_LOOKUPS.inc(hits, result="hit")
+        EMBED_CACHE_LOOKUPS.inc(misses, result="miss")
+        with self._lock:
+            self._session["hits"] += hits
+            self._session["misses"] += misses
+            self._session["model_calls"] += 1 if todo else 0
+        return [found[k] for k in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._embed(list(texts), "document")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], "query")[0]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            session = dict(self._session)
+        lookups = session["hits"] + session["misses"]
+        session["hit_rate"] = round(session["hits"] / lookups, 4) if lookups else 0.0
+        with self._connect() as conn:
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings WHERE model = ?", (self.model,)
+            ).fetchone()
+        return {"session": session, "store": {"path": self.path, "model": self.model, "entries": entries,
+                                              "vector_bytes": size, "max_bytes": self.max_bytes}}
+
+
+def build_embedding_cache(base: Embeddings, model: str, data_dir: str) -> Embeddings:
+    """Wrap `base` with the persistent cache from environment settings; `base` itself when disabled."""
+    path = os.getenv("VIGILO_EMBED_CACHE", os.path.join(data_dir, "embedding_cache.sqlite3"))
+    if path.lower() in ("off", "0", "false", "none", ""):
+        return base
+    try:
+        return CachedEmbeddings(
+            base, model, path,
+            max_bytes=int(float(os.getenv("VIGILO_EMBED_CACHE_MAX_MB", DEFAULT_MAX_BYTES / (1024 * 1024))) * 1024 * 1024),
+        )
+    except Exception as e:
+        print(f"Warning: embedding cache disabled: {e}")
+        return base
@@ -0,0 +1,114 @@
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+"""Company-keyed store of filtered (relevant) amendment sets.
+
+Each /latest-relevant call saves the selected amendments as a new version of that company's set
+(companies are keyed by id; calls without a company share the GLOBAL_KEY set). The current set is
+a primary-key lookup, older versions stay available as history, and saving compacts the company's
+history down to the newest KEEP_VERSIONS. Saving a set identical to the current one only refreshes
+its timestamp instead of adding a version.
+
+Legacy data/filtered_amms/filtered_<ts>[_<company>].json snapshots are imported once on first use.
+"""
+
+GLOBAL_KEY = "_global"
+KEEP_VERSIONS = int(os.getenv("VIGILO_FILTERED_KEEP_VERSIONS", "10"))
+
+
+def _digest(amendments: List[Dict]) -> str:
+    payload = json.dumps(amendments, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class FilteredAmendmentStore:
+    def __init__(self, db_path: str, legacy_dir: Optional[str] = None, keep_versions: int = KEEP_VERSIONS):
+        self.db_path = db_path
+        self.keep_versions = max(1, keep_versions)
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS filtered_sets ("
+                " company_id TEXT NOT NULL, version INTEGER NOT NULL, created REAL NOT NULL,"
+                " updated REAL NOT NULL, digest TEXT NOT NULL, total_count INTEGER NOT NULL,"
+                " amendments TEXT NOT NULL, PRIMARY KEY (company_id, version))"
+            )
+            imported = conn.execute("SELECT COUNT(*) FROM filtered_sets").fetchone()[0] > 0
+        if legacy_dir and not imported:
+            self._import_legacy(legacy_dir)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _import_legacy(self, legacy_dir: str):
+        files = sorted(glob.glob(os.path.join(legacy_dir, "filtered_*.json")))
+        for path in files:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.save(data.get("amendments", []) or [], data.get("company_id"), created=os.path.getmtime(path))
+            except Exception as e:
+                print(f"Warning: could not import {path}: {e}")
+        if files:
+            print(f"Filtered amendments: imported {len(files)} legacy snapshot(s) from {legacy_dir}")
+
+    def save(self, amendments: List[Dict], company_id: Optional[str] = None, created: Optional[float] = None) -> int:
+        """Store `amendments` as the company's current set; returns its version number."""
+        key = company_id or GLOBAL_KEY
+        now = created or time.time()
+        digest = _digest(amendments)
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT version, digest FROM filtered_sets WHERE company_id = ? ORDER BY version DESC LIMIT 1",
+                (key,)).fetchone()
+            if row and row[1] == digest:
+                conn.execute("UPDATE filtered_sets SET updated = ? WHERE company_id = ? AND version = ?",
+                             (now, key, row[0]))
+                return row[0]
+            version = (row[0] + 1) if row else 1
+            conn.execute(
+                "INSERT INTO filtered_sets (company_id, version, created, updated, digest, total_count, amendments)"
+                " VALUES (?,?,?,?,?,?,?)",
+                (key, version, now, now, digest, len(amendments), json.dumps(amendments, ensure_ascii=False, default=str)))
+            # Compaction: keep only the newest versions of this company's history
+            conn.execute("DELETE FROM filtered_sets WHERE company_id = ? AND version <= ?",
+                         (key, version - self.keep_versions))
+        return version
+
+    def current(self, company_id: Optional[str] = None) -> Optional[Dict]:
+        """{"company_id", "version", "created", "updated", "total_count", "amendments"} or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT company_id, version, created, updated, total_count, amendments FROM filtered_sets"
+                " WHERE company_id = ? ORDER BY version DESC LIMIT 1", (company_id or GLOBAL_KEY,)).fetchone()
+        if not row:
+            return None
+        return {"company_id": row[0], "version": row[1], "created": row[2], "updated": row[3],
+                "total_count": row[4], "amendments": json.loads(row[5])}
+
+    def history(self, company_id: Optional[str] = None, limit: int = 10) -> List[Dict]:
+        """Version metadata (newest first), without the amendment payloads."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT version, created, updated, total_count, digest FROM filtered_sets WHERE company_id = ?"
+                " ORDER BY version DESC LIMIT ?", (company_id or GLOBAL_KEY, max(1, limit))).fetchall()
+        return [{"version": r[0], "created": r[1], "updated": r[2], "total_count": r[3], "digest": r[4]} for r in rows]
+
+    def version(self, company_id: Optional[str], version: int) -> Optional[List[Dict]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT amendments FROM filtered_sets WHERE company_id = ? AND version = ?",
+                               (company_id or GLOBAL_KEY, version)).fetchone()
+        return json.loads(row[0]) if row else None
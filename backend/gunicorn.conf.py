@@ -0,0 +1,30 @@
+"""Multi-worker deployment.
+
+    gunicorn -c gunicorn.conf.py main:app        # web workers (VIGILO_ROLE=web)
+    VIGILO_ROLE=ingest python ingest_worker.py   # the single ingestion writer, alongside
+
+Web workers serve the read-heavy endpoints (/list*, /pdf, /latest-relevant, /company/*) in
+parallel. Everything they share lives out of process: the LLM response cache, company registry,
+filtered amendment store and ingest queue are SQLite files under data/, and extracted text/OCR
+caches are content-hash files. Per-worker indexes (metadata lists, company cache) revalidate
+against file mtimes, and the vector store reopens when the writer publishes new vectors.
+
+Setting VIGILO_ROLE=all instead makes the workers elect one of themselves as the ingestion
+writer (no separate process needed, but that worker also serves requests).
+
+Environment: VIGILO_BIND (default 0.0.0.0:5005), VIGILO_WORKERS (default: CPU count),
+VIGILO_WORKER_TIMEOUT (seconds, default 600: compliance checks run long LLM chains).
+"""
+import multiprocessing
+import os
+
+os.environ.setdefault("VIGILO_ROLE", "web")
+
+bind = os.getenv("VIGILO_BIND", "0.0.0.0:5005")
+workers = int(os.getenv("VIGILO_WORKERS", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("VIGILO_WORKER_TIMEOUT", "600"))
+graceful_timeout = 30
+# Each worker loads its own embedding model after fork (torch does not survive fork reliably)
+preload_app = False
+accesslog = "-"
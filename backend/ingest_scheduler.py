@@ -0,0 +1,323 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: every process with a worker considers itself the leader
+    fcntl = None
+
+"""Background ingestion scheduler.
+
+Each source (FSSAI, RBI, DGFT, GST) is ingested on its own cadence, VIGILO_INGEST_INTERVAL_<SOURCE>
+seconds (default VIGILO_INGEST_INTERVAL, 6 hours), with +/- VIGILO_INGEST_JITTER (default 10%)
+random jitter so sources do not all hit the network at once. The first scheduled run happens
+VIGILO_INGEST_INITIAL_DELAY seconds (default 120) after startup; VIGILO_INGEST_SCHEDULE=0 turns the
+timer off and leaves only explicit triggers.
+
+The queue lives in data/ingest_runs.sqlite3, so any process can enqueue (HTTP triggers in every
+web worker just insert a "queued" row and return). Exactly one process executes runs: the one
+holding the leader lock (an flock on <db>.leader). Processes started with a worker compete for
+it and a standby takes over if the leader dies; runs it left "running" are marked abandoned.
+The leader executes one run at a time, so two ingests never overlap on the shared vector store
+and metadata files. Triggering a source that is already queued or running returns that run
+instead of queueing another.
+"""
+
+DEFAULT_INTERVAL_S = float(os.getenv("VIGILO_INGEST_INTERVAL", str(6 * 3600)))
+JITTER = float(os.getenv("VIGILO_INGEST_JITTER", "0.1"))
+INITIAL_DELAY_S = float(os.getenv("VIGILO_INGEST_INITIAL_DELAY", "120"))
+SCHEDULE_ENABLED = os.getenv("VIGILO_INGEST_SCHEDULE", "1") != "0"
+# Run history rows kept per source
+HISTORY_KEEP = 200
+# How often the leader looks for rows queued by other processes, and a standby for the lock
+POLL_S = 2.0
+LEADER_RETRY_S = 10.0
+
+
+def _interval_for(source: str, default: float = DEFAULT_INTERVAL_S) -> float:
+    return float(os.getenv(f"VIGILO_INGEST_INTERVAL_{source.upper()}", str(default)))
+
+
+def _jittered(seconds: float) -> float:
+    return max(1.0, seconds * (1 + random.uniform(-JITTER, JITTER)))
+
+
+_RUN_COLUMNS = ("run_id", "source", "trigger", "status", "queued_at", "started_at", "finished_at",
+                "new_entries", "error")
+_SELECT_RUNS = f"SELECT {', '.join(_RUN_COLUMNS)} FROM ingest_runs"
+
+
+class IngestScheduler:
+    def __init__(self, jobs: Dict[str, Callable[[], int]], db_path: str, schedule: bool = SCHEDULE_ENABLED,
+                 intervals: Optional[Dict[str, float]] = None):
+        """`jobs` maps a source name to its ingest function (returns the number of new entries);
+        `intervals` overrides the default cadence per job (the environment still wins); an interval
+        of 0 makes a job trigger-only."""
+        self.jobs = jobs
+        self.db_path = db_path
+        self.schedule = schedule
+        self.intervals = {source: _interval_for(source, (intervals or {}).get(source, DEFAULT_INTERVAL_S))
+                          for source in jobs}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._leader_file = None
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ingest_runs ("
+                " run_id INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT NOT NULL, trigger TEXT NOT NULL,"
+                " status TEXT NOT NULL, queued_at REAL NOT NULL, started_at REAL, finished_at REAL,"
+                " new_entries INTEGER, error TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ingest_runs_source ON ingest_runs(source, run_id DESC)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ingest_runs_status ON ingest_runs(status, run_id)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ingest_schedule ("
+                " source TEXT PRIMARY KEY, next_run_at REAL, leader_pid INTEGER)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction that takes the database write lock up front (cross-process check-then-insert)."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    # -------- lifecycle --------
+
+    def start(self, run_worker: bool = True):
+        """Start the worker thread, which executes runs once it holds the leader lock (and runs the
+        timer, if scheduling is enabled). With run_worker=False this process only enqueues."""
+        if self._thread is not None or not run_worker:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._loop, name="ingest-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._release_leadership()
+
+    def _try_lead(self) -> bool:
+        if self._leader_file is not None:
+            return True
+        if fcntl is None:
+            self._leader_file = True
+            return True
+        f = open(f"{self.db_path}.leader", "a")
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._leader_file = f
+        return True
+
+    def _release_leadership(self):
+        if self._leader_file is not None and self._leader_file is not True:
+            self._leader_file.close()
+        self._leader_file = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leader_file is not None
+
+    def _become_leader(self) -> Dict[str, float]:
+        """Take over from a previous leader; returns each source's next due time."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("UPDATE ingest_runs SET status = 'abandoned', finished_at = ? WHERE status = 'running'",
+                         (now,))
+        next_due: Dict[str, float] = {}
+        if self.schedule:
+            for source in self.jobs:
+                if self.intervals[source] <= 0:
+                    continue
+                last = self.history(source, 1, finished_only=True)
+                first = now + INITIAL_DELAY_S + random.uniform(0, JITTER * INITIAL_DELAY_S)
+                next_due[source] = max(first, last[0]["finished_at"] + self.intervals[source]) if last else first
+        self._save_schedule(next_due)
+        print(f"Ingest scheduler: pid {os.getpid()} is the ingestion writer (schedule "
+              f"{'on' if self.schedule else 'off'}: "
+              + ", ".join(f"{s} every {int(i)}s" if i > 0 else f"{s} on demand" for s, i in self.intervals.items())
+              + ")")
+        return next_due
+
+    def _save_schedule(self, next_due: Dict[str, float]):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM ingest_schedule")
+            conn.executemany("INSERT INTO ingest_schedule (source, next_run_at, leader_pid) VALUES (?,?,?)",
+                             [(s, next_due.get(s), os.getpid()) for s in self.jobs])
+
+    # -------- triggers --------
+
+    def enqueue(self, source: str, trigger: str = "manual", min_gap_s: float = 0.0) -> Dict:
+        """Queue an ingest of `source` and return immediately with the run record. If the source is
+        already queued or running, or (with `min_gap_s`) finished a run less than that many seconds
+        ago, that run is returned instead (deduplicated=True)."""
+        if source not in self.jobs:
+            raise KeyError(source)
+        with self._transaction() as conn:
+            row = conn.execute(_SELECT_RUNS + " WHERE source = ? AND status IN ('queued', 'running')"
+                               " ORDER BY run_id LIMIT 1", (source,)).fetchone()
+            if row is None and min_gap_s > 0:
+                row = conn.execute(_SELECT_RUNS + " WHERE source = ? AND finished_at > ?"
+                                   " ORDER BY run_id DESC LIMIT 1", (source, time.time() - min_gap_s)).fetchone()
+            if row is not None:
+                return {**dict(zip(_RUN_COLUMNS, row)), "deduplicated": True}
+            queued_at = time.time()
+            cur = conn.execute("INSERT INTO ingest_runs (source, trigger, status, queued_at) VALUES (?,?,?,?)",
+                               (source, trigger, "queued", queued_at))
+            run = {"run_id": cur.lastrowid, "source": source, "trigger": trigger, "status": "queued",
+                   "queued_at": queued_at}
+        with self._cond:
+            self._cond.notify_all()
+        return {**run, "deduplicated": False}
+
+    # -------- worker --------
+
+    def _claim_next(self) -> Optional[Dict]:
+        with self._transaction() as conn:
+            row = conn.execute(_SELECT_RUNS + " WHERE status = 'queued' ORDER BY run_id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            run = dict(zip(_RUN_COLUMNS, row))
+            run.update(status="running", started_at=time.time())
+            conn.execute("UPDATE ingest_runs SET status = 'running', started_at = ? WHERE run_id = ?",
+                         (run["started_at"], run["run_id"]))
+        return run
+
+    def _loop(self):
+        next_due: Optional[Dict[str, float]] = None
+        failures = 0
+        try:
+            while True:
+                with self._cond:
+                    if self._stopping:
+                        return
+                try:
+                    if next_due is None:
+                        if not self._try_lead():
+                            wait = LEADER_RETRY_S
+                        else:
+                            next_due = self._become_leader()
+                            wait = 0.0
+                    else:
+                        wait = self._tick(next_due)
+                    failures = 0
+                except Exception as e:
+                    # A locked or unreadable database must not kill the writer while it holds the lock
+                    failures += 1
+                    wait = min(LEADER_RETRY_S * 6, POLL_S * 2 ** min(failures, 6))
+                    print(f"Ingest scheduler: iteration failed ({e}), retrying in {wait:.0f}s")
+                if wait > 0:
+                    with self._cond:
+                        if not self._stopping:
+                            self._cond.wait(timeout=wait)
+        finally:
+            # Never keep the leader lock without a thread to act on it: a standby takes over instead
+            self._release_leadership()
+
+    def _tick(self, next_due: Dict[str, float]) -> float:
+        """One leader iteration: enqueue due sources and execute at most one run. Returns how long to
+        wait before the next iteration (0 when more work may be queued)."""
+        now = time.time()
+        due = [s for s, t in next_due.items() if t <= now]
+        for source in due:
+            self.enqueue(source, "schedule")
+            next_due[source] = now + _jittered(self.intervals[source])
+        if due:
+            self._save_schedule(next_due)
+
+        run = self._claim_next()
+        if run is not None:
+            self._execute(run)
+            return 0.0
+        return max(0.1, min([t - now for t in next_due.values()] + [POLL_S]))
+
+    def _execute(self, run: Dict):
+        source = run["source"]
+        print(f"Ingest: {source} run {run['run_id']} started ({run['trigger']})")
+        status, new_entries, error = "ok", None, None
+        try:
+            new_entries = int(self.jobs[source]() or 0)
+        except Exception as e:
+            status, error = "error", str(e)
+            print(f"Ingest: {source} run {run['run_id']} failed: {e}")
+        finished_at = time.time()
+        with self._transaction() as conn:
+            conn.execute("UPDATE ingest_runs SET status = ?, finished_at = ?, new_entries = ?, error = ?"
+                         " WHERE run_id = ?", (status, finished_at, new_entries, error, run["run_id"]))
+            conn.execute("DELETE FROM ingest_runs WHERE source = ? AND run_id NOT IN"
+                         " (SELECT run_id FROM ingest_runs WHERE source = ? ORDER BY run_id DESC LIMIT ?)",
+                         (source, source, HISTORY_KEEP))
+        print(f"Ingest: {source} run {run['run_id']} {status} in {finished_at - run['started_at']:.1f}s"
+              + (f", {new_entries} new" if new_entries is not None else ""))
+
+    # -------- status --------
+
+    def history(self, source: Optional[str] = None, limit: int = 20, finished_only: bool = False) -> List[Dict]:
+        where, params = [], []
+        if source:
+            where.append("source = ?")
+            params.append(source)
+        if finished_only:
+            where.append("finished_at IS NOT NULL AND status != 'abandoned'")
+        sql = _SELECT_RUNS + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY run_id DESC LIMIT ?"
+        with self._connect() as conn:
+            rows = conn.execute(sql, (*params, max(1, limit))).fetchall()
+        return [dict(zip(_RUN_COLUMNS, row)) for row in rows]
+
+    def status(self, history: int = 20) -> Dict:
+        with self._connect() as conn:
+            active = [dict(zip(_RUN_COLUMNS, r)) for r in conn.execute(
+                _SELECT_RUNS + " WHERE status IN ('queued', 'running') ORDER BY run_id").fetchall()]
+            schedule = {r[0]: (r[1], r[2]) for r in conn.execute(
+                "SELECT source, next_run_at, leader_pid FROM ingest_schedule").fetchall()}
+        running = next((r for r in active if r["status"] == "running"), None)
+        sources = {}
+        for source in self.jobs:
+            last = self.history(source, 1)
+            sources[source] = {
+                "interval_s": self.intervals[source],
+                "next_run_at": schedule.get(source, (None, None))[0],
+                "running": bool(running and running["source"] == source),
+                "queued": any(r["source"] == source and r["status"] == "queued" for r in active),
+                "last_run": last[0] if last else None,
+            }
+        leader_pid = next((pid for _, pid in schedule.values() if pid), None)
+        return {
+            "leader_pid": leader_pid,
+            "this_process": {"pid": os.getpid(), "is_leader": self.is_leader,
+                             "worker_alive": bool(self._thread and self._thread.is_alive())},
+            "schedule_enabled": self.schedule,
+            "running": running,
+            "queue": [r for r in active if r["status"] == "queued"],
+            "sources": sources,
+            "recent_runs": self.history(limit=history),
+        }
@@ -0,0 +1,44 @@
+"""Ingestion writer process for multi-worker deployments.
+
+Web workers (VIGILO_ROLE=web, see gunicorn.conf.py) only enqueue ingests; this process executes
+them and runs the per-source schedule. It is the single writer of the metadata files and the
+vector store.
+
+Usage (from backend/):
+    VIGILO_ROLE=ingest python ingest_worker.py
+"""
+import os
+import time
+
+from ingest_scheduler import IngestScheduler
+from vigilo_utils import (DATA_DIR, compact_vector_db, ingest_local_pdfs_from, update_dgft_only, update_gst_only,
+                          update_rbi_only, update_vector_db)
+
+# Synthetic test notifications at the project root, ingested as source LOCAL by /seed/synthetic
+SYNTHETIC_PDFS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "synthetic_pdfs_detailed")
+
+
+def seed_synthetic_pdfs() -> int:
+    return ingest_local_pdfs_from(SYNTHETIC_PDFS_DIR)
+
+
+INGEST_JOBS = {"FSSAI": update_vector_db, "RBI": update_rbi_only, "DGFT": update_dgft_only, "GST": update_gst_only,
+               # Vector store compaction and local seeding run on the same queue so they never overlap an ingest
+               "VECTOR_GC": compact_vector_db, "LOCAL": seed_synthetic_pdfs}
+INGEST_DB = os.path.join(DATA_DIR, "ingest_runs.sqlite3")
+
+# All ingestion (timer and HTTP triggers from any worker) runs through this queue, one source at a time
+ingest_scheduler = IngestScheduler(INGEST_JOBS, db_path=INGEST_DB, intervals={"VECTOR_GC": 7 * 86400, "LOCAL": 0})
+
+
+def main():
+    ingest_scheduler.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        ingest_scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+"""Incremental extraction of array elements from a streamed JSON reply.
+
+LLM replies arrive token by token and may be wrapped in prose, code fences or a <think> block,
+and may be cut off before the closing brackets. JsonArrayStream scans the text as it arrives and
+returns every element of one target array (e.g. {"amendments": [...]}) as soon as that element is
+syntactically complete, so callers can act on it early and keep it even if the tail is broken.
+"""
+
+
+class JsonArrayStream:
+    def __init__(self, key_path: Tuple[str, ...], accept_root_array: bool = True):
+        """`key_path` names the array inside the top-level object, e.g. ("amendments",) or
+        ("compliance_report", "by_amendment"). A bare top-level array is accepted as the target
+        when `accept_root_array` is set (models often drop the wrapper object)."""
+        self.key_path = tuple(key_path)
+        self.accept_root_array = accept_root_array
+        self.text = ""
+        self.items: List[Any] = []
+        self._pos = 0
+        self._started = False
+        self._finished = False
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        # One entry per open container: the key currently being filled (None inside arrays)
+        self._path: List[Optional[str]] = []
+        self._array_depth: Optional[int] = None
+        self._item_start: Optional[int] = None
+        self._think = None  # None = undecided, True = inside a <think> preamble, False = no preamble
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Consume more text; return the elements completed by it."""
+        self.text += chunk
+        if self._think is not False and not self._skip_think():
+            return []
+        new_items: List[Any] = []
+        text = self.text
+        i = self._pos
+        n = len(text)
+        while i < n and not self._finished:
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start + 1:i]
+            elif not self._started:
+                if c in "{[":
+                    self._started = True
+                    continue  # re-process as a structural character
+            elif c == '"':
+                self._mark_item_start(i)
+                self._in_string = True
+                self._string_start = i
+            elif c in "{[":
+                self._mark_item_start(i)
+                self._path.append(None)
+                depth = len(self._path)
+                if c == "[" and self._array_depth is None and self._is_target(depth):
+                    self._array_depth = depth
+            elif c in "}]":
+                depth = len(self._path)
+                if self._array_depth is not None and depth == self._array_depth and c == "]":
+                    self._flush_scalar(i, new_items)
+                    self._array_depth = None
+                if self._path:
+                    self._path.pop()
+                if self._array_depth is not None and len(self._path) == self._array_depth and self._item_start is not None:
+                    self._emit(text[self._item_start:i + 1], new_items)
+                if not self._path:
+                    self._finished = True
+            elif c == ":":
+                if self._path:
+                    self._path[-1] = self._last_string
+            elif c == ",":
+                if self._array_depth is not None and len(self._path) == self._array_depth:
+                    self._flush_scalar(i, new_items)
+            elif not c.isspace():
+                self._mark_item_start(i)
+            i += 1
+        self._pos = i
+        return new_items
+
+    @property
+    def finished(self) -> bool:
+        """True once the top-level JSON value has been closed."""
+        return self._finished
+
+    def json_text(self) -> str:
+        """The reply with any <think> preamble removed."""
+        return self.text
+
+    def _skip_think(self) -> bool:
+        stripped = self.text.lstrip()
+        if self._think is None:
+            if len(stripped) < len("<think>") and "<think>".startswith(stripped):
+                return False  # not enough text yet to decide
+            self._think = stripped.startswith("<think>")
+            if not self._think:
+                return True
+        end = self.text.find("</think>")
+        if end == -1:
+            return False
+        self.text = self.text[end + len("</think>"):]
+        self._think = False
+        return True
+
+    def _is_target(self, depth: int) -> bool:
+        if depth == 1:
+            return self.accept_root_array or not self.key_path
+        return tuple(self._path[:-1]) == self.key_path
+
+    def _mark_item_start(self, i: int):
+        if self._array_depth is not None and len(self._path) == self._array_depth and self._item_start is None:
+            self._item_start = i
+
+    def _flush_scalar(self, end: int, out: List[Any]):
+        if self._item_start is not None:
+            self._emit(self.text[self._item_start:end], out)
+
+    def _emit(self, raw: str, out: List[Any]):
+        self._item_start = None
+        raw = raw.strip()
+        if not raw:
+            return
+        try:
+            item = json.loads(raw)
+        except json.JSONDecodeError:
+            return
+        self.items.append(item)
+        out.append(item)
+
+
+def nest_items(key_path: Tuple[str, ...], items: List[Any]) -> Dict:
+    """Build {"a": {"b": items}} for key_path ("a", "b")."""
+    result: Any = items
+    for key in reversed(key_path):
+        result = {key: result}
+    return result
@@ -0,0 +1,260 @@
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from telemetry import Counter, REGISTRY, estimate_cost
+
+"""Persistent prompt -> response cache for Groq calls.
+
+Entries are keyed by sha256(model, temperature, prompt) and stored in a SQLite file under
+backend/data. Expired entries (TTL) are ignored, and purged at startup and every
+SIZE_RESYNC_WRITES writes. Writes keep a running size total, and when it passes the size budget
+the least recently used entries are evicted.
+
+An optional near-duplicate lookup compares prompt embeddings among entries of the same model and
+temperature, but only for calls that name the variable part of their prompt (`payload`: company
+profile, amendment list, evidence) and only against entries with an identical payload. It absorbs
+template wording changes; it can never hand one company's or amendment set's answer to another,
+which a similarity threshold over long shared headers/footers could.
+
+Configuration (environment):
+  VIGILO_LLM_CACHE            path of the SQLite file, or "off" to disable
+  VIGILO_LLM_CACHE_TTL        entry lifetime in seconds (default 7 days)
+  VIGILO_LLM_CACHE_MAX_MB     size budget before LRU eviction (default 256)
+  VIGILO_LLM_CACHE_SEMANTIC   "1" to enable near-duplicate lookup via prompt embeddings
+"""
+
+CACHE_LOOKUPS = Counter("vigilo_llm_cache_lookups_total", "LLM response cache lookups by result")
+CACHE_SAVED_TOKENS = Counter("vigilo_llm_cache_saved_tokens_total", "Tokens not sent to Groq thanks to cache hits")
+REGISTRY.extend([CACHE_LOOKUPS, CACHE_SAVED_TOKENS])
+
+DEFAULT_TTL_S = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+SEMANTIC_THRESHOLD = 0.985
+SEMANTIC_CANDIDATES = 500
+# Long prompts share a template prefix, so embed head and tail windows rather than the first tokens only
+SEMANTIC_WINDOW_CHARS = 1500
+# Re-read the exact store size (and purge expired entries) after this many writes
+SIZE_RESYNC_WRITES = 256
+
+
+def cache_key(model: str, temperature: float, prompt: str) -> str:
+    payload = json.dumps([model, round(float(temperature), 4), prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def payload_hash(payload: str) -> str:
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _pack(vector: List[float]) -> bytes:
+    return struct.pack(f"{len(vector)}f", *vector)
+
+
+def _unpack(blob: bytes) -> List[float]:
+    return list(struct.unpack(f"{len(blob) // 4}f", blob))
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    na = math.sqrt(sum(x * x for x in a))
+    nb = math.sqrt(sum(y * y for y in b))
+    return dot / (na * nb) if na and nb else 0.0
+
+
+class LLMResponseCache:
+    def __init__(self, path: str, ttl_s: float = DEFAULT_TTL_S, max_bytes: int = DEFAULT_MAX_BYTES,
+                 embed_fn: Optional[Callable[[List[str]], List[List[float]]]] = None):
+        self.path = path
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self.embed_fn = embed_fn
+        self._lock = threading.Lock()
+        self._session = {"hits": 0, "semantic_hits": 0, "misses": 0, "saved_prompt_tokens": 0,
+                         "saved_completion_tokens": 0, "saved_cost_usd": 0.0}
+        # Running estimate of the store size, so writes do not scan the table to check the budget
+        self._approx_bytes = 0
+        self._writes_since_sync = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, model TEXT, temperature REAL, response TEXT,"
+                " prompt_tokens INTEGER, completion_tokens INTEGER, size INTEGER,"
+                " created REAL, last_access REAL, hits INTEGER DEFAULT 0, embedding BLOB, payload_hash TEXT)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(responses)")}
+            if "payload_hash" not in columns:
+                conn.execute("ALTER TABLE responses ADD COLUMN payload_hash TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_lru ON responses(last_access)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_model ON responses(model, temperature)")
+            self._approx_bytes = self._purge_expired(conn, time.time())
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _embed(self, prompt: str) -> Optional[List[float]]:
+        if not self.embed_fn:
+            return None
+        windows = [prompt[:SEMANTIC_WINDOW_CHARS], prompt[-SEMANTIC_WINDOW_CHARS:]]
+        try:
+            head, tail = self.embed_fn(windows)
+        except Exception as e:
+            print(f"Warning: LLM cache embedding failed: {e}")
+            return None
+        return [(x + y) / 2 for x, y in zip(head, tail)]
+
+    def get(self, model: str, temperature: float, prompt: str, payload: Optional[str] = None) -> Optional[Dict]:
+        """Return {"content", "usage", "semantic"} for a fresh entry, or None. Near-duplicate prompts
+        only match when `payload` is given and equal to the stored entry's."""
+        key = cache_key(model, temperature, prompt)
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT key, response, prompt_tokens, completion_tokens FROM responses WHERE key = ? AND created >= ?",
+                (key, now - self.ttl_s)).fetchone()
+            semantic = False
+            if row is None and self.embed_fn and payload is not None:
+                row = self._nearest(conn, model, temperature, prompt, payload, now)
+                semantic = row is not None
+            if row is None:
+                self._count("misses")
+                return None
+            conn.execute("UPDATE responses SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, row[0]))
+        usage = {"prompt_tokens": row[2] or 0, "completion_tokens": row[3] or 0}
+        self._count("semantic_hits" if semantic else "hits", model, usage)
+        return {"content": row[1], "usage": usage, "semantic": semantic}
+
+    def _nearest(self, conn: sqlite3.Connection, model: str, temperature: float, prompt: str, payload: str,
+                 now: float):
+        query = self._embed(prompt)
+        if query is None:
+            return None
+        best, best_score = None, SEMANTIC_THRESHOLD
+        rows = conn.execute(
+            "SELECT key, response, prompt_tokens, completion_tokens, embedding FROM responses"
+            " WHERE model = ? AND temperature = ? AND created >= ? AND embedding IS NOT NULL AND payload_hash = ?"
+            " ORDER BY last_access DESC LIMIT ?",
+            (model, round(float(temperature), 4), now - self.ttl_s, payload_hash(payload),
+             SEMANTIC_CANDIDATES)).fetchall()
+        for row in rows:
+            score = _cosine(query, _unpack(row[4]))
+            if score >= best_score:
+                best, best_score = row[:4], score
+        return best
+
+    def put(self, model: str, temperature: float, prompt: str, content: str, usage: Optional[Dict] = None,
+            payload: Optional[str] = None):
+        if content is None:
+            return
+        usage = usage or {}
+        embedding = self._embed(prompt) if payload is not None else None
+        size = len(content.encode("utf-8")) + len(prompt) // 64
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, temperature, response, prompt_tokens,"
+                " completion_tokens, size, created, last_access, hits, embedding, payload_hash)"
+                " VALUES (?,?,?,?,?,?,?,?,?,0,?,?)",
+                (cache_key(model, temperature, prompt), model, round(float(temperature), 4), content,
+                 int(usage.get("prompt_tokens", 0) or 0), int(usage.get("completion_tokens", 0) or 0),
+                 size, now, now,
+                 _pack(embedding) if embedding else None, payload_hash(payload) if payload is not None else None))
+            self._evict(conn, now, size)
+
+    def _purge_expired(self, conn: sqlite3.Connection, now: float) -> int:
+        """Delete expired entries; returns the size of what is left."""
+        conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_s,))
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _evict(self, conn: sqlite3.Connection, now: float, written: int):
+        with self._lock:
+            self._approx_bytes += written
+            self._writes_since_sync += 1
+            if self._approx_bytes <= self.max_bytes and self._writes_since_sync < SIZE_RESYNC_WRITES:
+                return
+            self._writes_since_sync = 0
+        # Only scan the table when the estimate says we may be over budget, or it is due a resync
+        total = self._purge_expired(conn, now)
+        if total > self.max_bytes:
+            # Drop least recently used entries until we are 10% under budget
+            target = total - int(self.max_bytes * 0.9)
+            freed = 0
+            victims = []
+            for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC"):
+                victims.append((key,))
+                freed += size or 0
+                if freed >= target:
+                    break
+            conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+            total -= freed
+        with self._lock:
+            self._approx_bytes = total
+
+    def _count(self, result: str, model: str = "", usage: Optional[Dict] = None):
+        CACHE_LOOKUPS.inc(result=result)
+        with self._lock:
+            self._session[result] += 1
+            if usage:
+                p, c = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+                self._session["saved_prompt_tokens"] += p
+                self._session["saved_completion_tokens"] += c
+                self._session["saved_cost_usd"] += estimate_cost(model, p, c)
+                CACHE_SAVED_TOKENS.inc(p, kind="prompt")
+                CACHE_SAVED_TOKENS.inc(c, kind="completion")
+
+    def stats(self) -> Dict:
+        """Hit rate and savings for this process plus lifetime totals stored in the cache file."""
+        with self._lock:
+            session = dict(self._session)
+        lookups = session["hits"] + session["semantic_hits"] + session["misses"]
+        session["hit_rate"] = round((session["hits"] + session["semantic_hits"]) / lookups, 4) if lookups else 0.0
+        with self._connect() as conn:
+            entries, size, hits, saved_p, saved_c = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size),0), COALESCE(SUM(hits),0),"
+                " COALESCE(SUM(hits * prompt_tokens),0), COALESCE(SUM(hits * completion_tokens),0) FROM responses"
+            ).fetchone()
+        return {
+            "session": session,
+            "store": {"path": self.path, "entries": entries, "bytes": size, "max_bytes": self.max_bytes,
+                      "ttl_s": self.ttl_s, "semantic": bool(self.embed_fn), "lifetime_hits": hits,
+                      "lifetime_saved_prompt_tokens": saved_p, "lifetime_saved_completion_tokens": saved_c},
+        }
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+        with self._lock:
+            self._approx_bytes = 0
+
+
+def build_cache(data_dir: str, embed_fn=None) -> Optional[LLMResponseCache]:
+    """Create the process cache from environment settings; None when disabled."""
+    path = os.getenv("VIGILO_LLM_CACHE", os.path.join(data_dir, "llm_cache.sqlite3"))
+    if path.lower() in ("off", "0", "false", "none", ""):
+        return None
+    semantic = os.getenv("VIGILO_LLM_CACHE_SEMANTIC", "0") == "1"
+    try:
+        return LLMResponseCache(
+            path,
+            ttl_s=float(os.getenv("VIGILO_LLM_CACHE_TTL", DEFAULT_TTL_S)),
+            max_bytes=int(float(os.getenv("VIGILO_LLM_CACHE_MAX_MB", DEFAULT_MAX_BYTES / (1024 * 1024))) * 1024 * 1024),
+            embed_fn=embed_fn if semantic else None,
+        )
+    except Exception as e:
+        print(f"Warning: LLM response cache disabled: {e}")
+        return None
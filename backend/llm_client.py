@@ -0,0 +1,423 @@
+import random
+import re
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Optional
+
+from telemetry import LLM_CONCURRENCY, LLM_HEDGES, LLM_RETRIES, LLM_THROTTLES, LLM_TOKENS_AVAILABLE
+
+"""Shared, rate-limit-aware access to the Groq chat completions API.
+
+All LLM traffic (select_relevant_amendments and every AmendmentAnalyzer stage) goes through one
+GroqPool per process. The pool:
+  - keeps a token bucket per model, re-synced from Groq's x-ratelimit-* response headers,
+  - honours 429 retry-after and backs off exponentially with full jitter on 429/5xx/network errors,
+  - caps in-flight requests with an AIMD limiter (additive increase, halve on throttling),
+  - optionally hedges a request: if it has not finished `hedge_after` seconds after it got its
+    tokens and concurrency slot (local queueing does not count), a duplicate is sent unless the
+    pool is saturated; whichever finishes first wins and the loser is abandoned, giving its slot
+    back at once,
+  - streams completions (GroqPool.stream) for callers that parse output incrementally.
+Client errors other than 429 (bad model name, invalid request) are raised immediately so callers
+can apply their own fallback, e.g. AmendmentAnalyzer's retry with MODEL_DEFAULT.
+"""
+
+# Conservative defaults until the first response tells us the real per-model quota
+DEFAULT_TOKENS_PER_MINUTE = 6000
+DEFAULT_COMPLETION_BUDGET = 1024
+
+
+def _parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse Groq reset/retry values like '7.66s', '2m59.56s', '120ms' or plain seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total = 0.0
+    matched = False
+    for amount, unit in re.findall(r'([\d.]+)(ms|h|m|s)', value):
+        matched = True
+        amount = float(amount)
+        total += {"ms": amount / 1000, "s": amount, "m": amount * 60, "h": amount * 3600}[unit]
+    return total if matched else None
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap prompt-size estimate (~4 characters per token) used to reserve bucket capacity."""
+    return max(1, len(text or "") // 4)
+
+
+class TokenBucket:
+    """Tokens-per-minute budget for one model."""
+
+    def __init__(self, model: str, capacity: int = DEFAULT_TOKENS_PER_MINUTE):
+        self.model = model
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.refill_per_s = capacity / 60.0
+        self.paused_until = 0.0
+        self.updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_s)
+        self.updated = now
+
+    def acquire(self, amount: int, timeout: float = 120.0):
+        """Block until `amount` tokens are available (requests larger than the bucket wait for a full one)."""
+        amount = min(float(amount), self.capacity)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                self._refill()
+                now = time.monotonic()
+                if now >= self.paused_until and self.tokens >= amount:
+                    self.tokens -= amount
+                    LLM_TOKENS_AVAILABLE.set(round(self.tokens), model=self.model)
+                    return
+                if now >= deadline:
+                    raise TimeoutError(f"Rate-limit budget for {self.model} not available within {timeout}s")
+                wait_s = max(self.paused_until - now, (amount - self.tokens) / max(self.refill_per_s, 1e-6))
+                self._cond.wait(timeout=min(max(wait_s, 0.05), deadline - now))
+
+    def available(self, amount: int) -> bool:
+        """Whether acquire(amount) would succeed right now."""
+        with self._cond:
+            self._refill()
+            return time.monotonic() >= self.paused_until and self.tokens >= min(float(amount), self.capacity)
+
+    def refund(self, amount: int):
+        with self._cond:
+            self.tokens = min(self.capacity, self.tokens + amount)
+            self._cond.notify_all()
+
+    def sync(self, headers: Dict[str, str]):
+        """Adopt the server's view of the token quota from x-ratelimit-* headers."""
+        limit = headers.get("x-ratelimit-limit-tokens")
+        remaining = headers.get("x-ratelimit-remaining-tokens")
+        reset = _parse_duration(headers.get("x-ratelimit-reset-tokens"))
+        with self._cond:
+            try:
+                if limit:
+                    self.capacity = float(limit)
+                    self.refill_per_s = self.capacity / 60.0
+                if remaining is not None:
+                    self.tokens = min(self.capacity, float(remaining))
+                    self.updated = time.monotonic()
+                    if self.tokens <= 0 and reset:
+                        self.paused_until = max(self.paused_until, time.monotonic() + reset)
+            except ValueError:
+                return
+            LLM_TOKENS_AVAILABLE.set(round(self.tokens), model=self.model)
+            self._cond.notify_all()
+
+    def pause(self, seconds: float):
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit: +1 slot per window of successes, halved on every 429."""
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 16):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        LLM_CONCURRENCY.set(int(self.limit))
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def saturated(self) -> bool:
+        with self._cond:
+            return self.in_flight >= int(self.limit)
+
+    def on_success(self):
+        with self._cond:
+            self.limit = min(self.maximum, self.limit + 1.0 / max(self.limit, 1.0))
+            LLM_CONCURRENCY.set(int(self.limit))
+            self._cond.notify_all()
+
+    def on_throttle(self):
+        with self._cond:
+            self.limit = max(float(self.minimum), self.limit / 2)
+            LLM_CONCURRENCY.set(int(self.limit))
+
+
+class _Slot:
+    """One limiter slot; release() is idempotent so an abandoned request can give it back early."""
+
+    def __init__(self, limiter: AdaptiveLimiter):
+        self._limiter = limiter
+        self._held = True
+        self._lock = threading.Lock()
+
+    def release(self):
+        with self._lock:
+            if not self._held:
+                return
+            self._held = False
+        self._limiter.release()
+
+
+class _HedgeState:
+    """Shared between complete() and one of its (primary or hedge) requests."""
+
+    def __init__(self):
+        # Set once the request holds its bucket tokens and a concurrency slot
+        self.started = threading.Event()
+        self.abandoned = threading.Event()
+        self.slot: Optional[_Slot] = None
+
+    def abandon(self):
+        self.abandoned.set()
+        slot = self.slot
+        if slot is not None:
+            slot.release()
+
+
+class Completion:
+    """Result of a pooled call: text plus what it took to get it."""
+
+    def __init__(self, content: str, usage, model: str, attempts: int, hedged: bool = False, headers=None):
+        self.content = content
+        self.usage = usage
+        self.model = model
+        self.attempts = attempts
+        self.hedged = hedged
+        self.headers = dict(headers or {})
+
+
+class CompletionStream:
+    """Iterate text deltas of a streaming completion; usage and finish state are set once exhausted."""
+
+    def __init__(self, stream, model: str, attempts: int, headers=None, release=None):
+        self._stream = stream
+        self._release = release
+        self.model = model
+        self.attempts = attempts
+        self.headers = dict(headers or {})
+        self.usage = None
+        self.finish_reason: Optional[str] = None
+        self.error: Optional[Exception] = None
+        self.parts: List[str] = []
+
+    @property
+    def content(self) -> str:
+        return "".join(self.parts)
+
+    @property
+    def truncated(self) -> bool:
+        """True when the reply stopped early (token limit or broken connection)."""
+        return self.error is not None or self.finish_reason not in (None, "stop")
+
+    def __iter__(self):
+        try:
+            for chunk in self._stream:
+                # Groq reports usage on the final chunk under x_groq
+                x_groq = getattr(chunk, "x_groq", None)
+                if x_groq is not None and getattr(x_groq, "usage", None) is not None:
+                    self.usage = x_groq.usage
+                elif getattr(chunk, "usage", None) is not None:
+                    self.usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.finish_reason:
+                    self.finish_reason = choice.finish_reason
+                delta = getattr(choice.delta, "content", None)
+                if delta:
+                    self.parts.append(delta)
+                    yield delta
+        except Exception as e:
+            # Keep what arrived so far; the caller decides whether it can be salvaged
+            self.error = e
+        finally:
+            self.close()
+
+    def close(self):
+        if self._release is not None:
+            release, self._release = self._release, None
+            try:
+                self._stream.close()
+            except Exception:
+                pass
+            release()
+
+
+class GroqPool:
+    def __init__(self, client, max_attempts: int = 5, base_delay: float = 0.5, max_delay: float = 30.0,
+                 initial_concurrency: int = 4, max_concurrency: int = 16):
+        # We own retries, so disable the SDK's built-in ones
+        self.client = client.with_options(max_retries=0) if hasattr(client, "with_options") else client
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limiter = AdaptiveLimiter(initial=initial_concurrency, maximum=max_concurrency)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._buckets_lock = threading.Lock()
+        self._hedge_executor = ThreadPoolExecutor(max_workers=max_concurrency * 2, thread_name_prefix="groq-hedge")
+
+    def bucket(self, model: str) -> TokenBucket:
+        with self._buckets_lock:
+            if model not in self._buckets:
+                self._buckets[model] = TokenBucket(model)
+            return self._buckets[model]
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: uniform(0, min(cap, base * 2^attempt))
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    @staticmethod
+    def _status(exc: Exception) -> Optional[int]:
+        status = getattr(exc, "status_code", None)
+        if status is None and getattr(exc, "response", None) is not None:
+            status = getattr(exc.response, "status_code", None)
+        return status
+
+    @staticmethod
+    def _headers(exc: Exception) -> Dict[str, str]:
+        response = getattr(exc, "response", None)
+        return dict(getattr(response, "headers", None) or {})
+
+    def _attempt(self, messages: List[Dict], model: str, temperature: float, max_tokens: Optional[int],
+                 stream: bool = False):
+        kwargs = {"messages": messages, "model": model, "temperature": temperature}
+        if max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+        if stream:
+            kwargs["stream"] = True
+        raw = self.client.chat.completions.with_raw_response.create(**kwargs)
+        return raw.parse(), dict(raw.headers)
+
+    @staticmethod
+    def _reserve(messages: List[Dict], max_tokens: Optional[int]) -> int:
+        return sum(estimate_tokens(m.get("content", "")) for m in messages) + (max_tokens or DEFAULT_COMPLETION_BUDGET)
+
+    def _complete_with_retries(self, messages: List[Dict], model: str, temperature: float,
+                               max_tokens: Optional[int], stream: bool = False,
+                               hedge: Optional[_HedgeState] = None):
+        bucket = self.bucket(model)
+        reserve = self._reserve(messages, max_tokens)
+        last_error: Optional[Exception] = None
+        for attempt in range(self.max_attempts):
+            if hedge is not None and hedge.abandoned.is_set():
+                raise CancelledError()
+            bucket.acquire(reserve)
+            self.limiter.acquire()
+            slot = _Slot(self.limiter)
+            if hedge is not None:
+                hedge.slot = slot
+                if hedge.abandoned.is_set():
+                    # Lost the race before sending anything: hand back the slot and the tokens
+                    slot.release()
+                    bucket.refund(reserve)
+                    raise CancelledError()
+                hedge.started.set()
+            # A successful stream keeps its concurrency slot until it is fully consumed
+            holds_slot = False
+            try:
+                response, headers = self._attempt(messages, model, temperature, max_tokens, stream=stream)
+            except Exception as e:
+                last_error = e
+                status = self._status(e)
+                headers = self._headers(e)
+                if status == 429:
+                    LLM_THROTTLES.inc(model=model)
+                    self.limiter.on_throttle()
+                    bucket.sync(headers)
+                    retry_after = _parse_duration(headers.get("retry-after"))
+                    delay = retry_after if retry_after is not None else self._backoff(attempt)
+                    bucket.pause(delay)
+                    reason = "rate_limited"
+                elif status is None or status >= 500 or status == 408:
+                    # Network failure, timeout or server error: retryable
+                    bucket.refund(reserve)
+                    delay = self._backoff(attempt)
+                    reason = "server_error" if status else "connection"
+                else:
+                    bucket.refund(reserve)
+                    raise
+            else:
+                self.limiter.on_success()
+                bucket.sync(headers)
+                if stream:
+                    holds_slot = True
+                    return CompletionStream(response, model, attempt + 1, headers, release=slot.release)
+                content = response.choices[0].message.content
+                return Completion(content, response.usage, model, attempt + 1, headers=headers)
+            finally:
+                if not holds_slot:
+                    slot.release()
+            if attempt + 1 >= self.max_attempts or (hedge is not None and hedge.abandoned.is_set()):
+                break
+            LLM_RETRIES.inc(model=model, reason=reason)
+            print(f"Groq {reason} for {model} (attempt {attempt + 1}); retrying in {delay:.2f}s")
+            time.sleep(delay)
+        raise last_error
+
+    def stream(self, prompt: str, model: str, temperature: float = 0.2,
+               max_tokens: Optional[int] = None) -> "CompletionStream":
+        """Open a streaming completion. Retries apply only until the stream is established."""
+        messages = [{"role": "user", "content": prompt}]
+        return self._complete_with_retries(messages, model, temperature, max_tokens, stream=True)
+
+    def complete(self, prompt: str, model: str, temperature: float = 0.2, max_tokens: Optional[int] = None,
+                 hedge_after: Optional[float] = None) -> Completion:
+        """Run one chat completion for `prompt`, optionally hedged `hedge_after` seconds after the
+        request was actually sent."""
+        messages = [{"role": "user", "content": prompt}]
+        if not hedge_after:
+            return self._complete_with_retries(messages, model, temperature, max_tokens)
+
+        states = {}
+        primary_state = _HedgeState()
+        primary = self._hedge_executor.submit(self._complete_with_retries, messages, model, temperature, max_tokens,
+                                              hedge=primary_state)
+        states[primary] = primary_state
+        # Waiting for local rate-limit tokens or a concurrency slot is not slowness of the request
+        while not primary.done() and not primary_state.started.wait(timeout=0.05):
+            pass
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+        if self.limiter.saturated() or not self.bucket(model).available(self._reserve(messages, max_tokens)):
+            # A duplicate would only queue behind other work (and spend budget it does not have)
+            return primary.result()
+        hedge_state = _HedgeState()
+        hedge = self._hedge_executor.submit(self._complete_with_retries, messages, model, temperature, max_tokens,
+                                            hedge=hedge_state)
+        states[hedge] = hedge_state
+        pending = {primary, hedge}
+        first_error: Optional[Exception] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                try:
+                    result = fut.result()
+                except Exception as e:
+                    first_error = first_error or e
+                    continue
+                for loser in pending:
+                    loser.cancel()
+                    states[loser].abandon()
+                winner = "hedge" if fut is hedge else "primary"
+                LLM_HEDGES.inc(model=model, winner=winner)
+                result.hedged = fut is hedge
+                return result
+        raise first_error
@@ -1,8 +1,6 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from vigilo_utils import (
-    update_vector_db,
-    get_metadata_store,
     store_company_data,
     CompanyData,
     CompanyInfo,
@@ -11,30 +9,52 @@ from vigilo_utils import (
     PackagingInfo,
     hash_company,
     get_company_info,
-    ingest_local_pdfs_from,
     get_latest_company_id,
-    update_rbi_only,
-    load_rbi_metadata,
+    get_company_model,
+    list_companies,
     get_latest_rbi_amendments,
-    update_dgft_only,
-    load_dgft_metadata,
-    update_gst_only,
-    load_gst_metadata,
     save_filtered_amendments,
-    get_latest_by_sources
+    filtered_store,
+    metadata_index,
+    amendment_text_pages,
+    get_latest_by_sources,
+    vector_health,
+    embeddings
 )
 from typing import List, Dict, Optional, Any
-from fastapi import UploadFile, Form, File, HTTPException
+from fastapi import BackgroundTasks, Depends, Request, UploadFile, Form, File, HTTPException
+from fastapi.middleware.gzip import GZipMiddleware
 from datetime import date
 import hashlib
 import json
 import os
-from fastapi.responses import FileResponse
+import queue
+import threading
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from prompt_chain import AmendmentAnalyzer
 from prompt_chain import select_relevant_amendments
+from prompt_chain import response_cache
 from vigilo_utils import backfill_metadata_excerpts
-
-app = FastAPI(title="Vigilo FSSAI Compliance API")
+from company_docs import index_company_documents
+from uploads import save_upload
+from telemetry import render_metrics
+from run_store import list_runs, read_artifact, read_run, run_path
+from metadata_index import iso_date
+from ingest_worker import ingest_scheduler
+from worker_role import is_writer
+from contextlib import asynccontextmanager
+
+# An empty list endpoint re-triggers its source at most this often (e.g. while the portal is down)
+EMPTY_STORE_RETRY_S = 300
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Web workers only enqueue; writer processes compete for the ingestion leader lock
+    ingest_scheduler.start(run_worker=is_writer())
+    yield
+    ingest_scheduler.stop()
+
+app = FastAPI(title="Vigilo FSSAI Compliance API", lifespan=lifespan)
 
 # CORS configuration
 app.add_middleware(
@@ -45,42 +65,128 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class ListGZipMiddleware(GZipMiddleware):
+    """gzip for the /list* endpoints only; the NDJSON stream must not sit in the compressor's buffer."""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith("/list"):
+            await super().__call__(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+app.add_middleware(ListGZipMiddleware, minimum_size=1024)
+
+def list_params(limit: Optional[int] = None, cursor: Optional[str] = None, source: Optional[str] = None,
+                date_from: Optional[str] = None, date_to: Optional[str] = None, q: str = "",
+                fields: Optional[str] = None) -> Dict[str, Any]:
+    """Query parameters shared by the /list* endpoints. Dates accept YYYY-MM-DD or DD-MM-YYYY;
+    `fields` is a comma-separated projection, e.g. fields=title,date,pdf_url."""
+    params: Dict[str, Any] = {"limit": limit, "cursor": cursor, "source": source, "q": q,
+                              "fields": [f.strip() for f in (fields or "").split(",") if f.strip()] or None}
+    for name, value in (("date_from", date_from), ("date_to", date_to)):
+        params[name] = iso_date(value) if value else None
+        if value and not params[name]:
+            raise HTTPException(status_code=400, detail=f"Invalid {name}: {value}")
+    return params
+
+def _list_response(request: Request, store: str, params: Dict[str, Any]) -> Response:
+    """Serve one page of a metadata store from the index, as a JSON array. The next page's cursor is
+    in the X-Next-Cursor and Link headers; the ETag follows the store file and the query."""
+    etag = '"' + hashlib.sha1(f"{store}|{metadata_index.version(store)}|{request.url.query}".encode()).hexdigest()[:20] + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    try:
+        page = metadata_index.query(store, **params)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if page["next_cursor"]:
+        headers["X-Next-Cursor"] = page["next_cursor"]
+        headers["Link"] = f'<{request.url.include_query_params(cursor=page["next_cursor"])}>; rel="next"'
+    return JSONResponse(page["items"], headers=headers)
+
 @app.get("/")
 def root():
     return {"msg": "Vigilo FSSAI Compliance API Running 🚀"}
 
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint: per-stage latency and per-model LLM tokens, cost, retries, fallbacks."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/llm-cache/stats")
+def llm_cache_stats() -> Dict[str, Any]:
+    """Hit rate and saved tokens of the prompt -> response cache."""
+    if response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **response_cache.stats()}
+
+@app.get("/embedding-cache/stats")
+def embedding_cache_stats() -> Dict[str, Any]:
+    """Hit rate and size of the persistent embedding cache."""
+    if not hasattr(embeddings, "stats"):
+        return {"enabled": False}
+    return {"enabled": True, **embeddings.stats()}
+
 @app.get("/update")
-def update() -> Dict[str, int]:
-    count = update_vector_db()
-    return {"new_entries": count}
+def update() -> Dict[str, Any]:
+    """Queue an FSSAI ingest and return at once; follow it on /ingest/status"""
+    return ingest_scheduler.enqueue("FSSAI", trigger="http")
 
 @app.get("/update-rbi")
-def update_rbi() -> Dict[str, int]:
-    """Update only RBI notifications"""
-    count = update_rbi_only()
-    return {"new_entries": count, "source": "RBI"}
+def update_rbi() -> Dict[str, Any]:
+    """Queue an RBI-only ingest"""
+    return ingest_scheduler.enqueue("RBI", trigger="http")
+
+@app.get("/ingest/status")
+def ingest_status(history: int = 20) -> Dict[str, Any]:
+    """Scheduler state: per-source cadence, next run, queue, current run and recent run history."""
+    return ingest_scheduler.status(history=history)
+
+@app.get("/vector/health")
+def vector_health_report() -> Dict[str, Any]:
+    """Vector index health: chunks per collection, dangling ids, duplicate ratio, size on disk."""
+    try:
+        return vector_health()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/vector/gc")
+def vector_gc() -> Dict[str, Any]:
+    """Queue a vector compaction (runs in the ingestion writer, between ingests)"""
+    return ingest_scheduler.enqueue("VECTOR_GC", trigger="http")
 
 @app.get("/list-rbi")
-def list_rbi_notifications() -> List[Dict]:
-    """Get only RBI notifications"""
-    data = load_rbi_metadata()
-    if not data:
-        # Attempt to populate if empty
-        try:
-            update_rbi_only()
-            data = load_rbi_metadata()
-        except Exception:
-            pass
-    return data
+def list_rbi_notifications(request: Request, params: Dict[str, Any] = Depends(list_params)):
+    """Get only RBI notifications (newest first; see list_params for paging and filters)"""
+    if not metadata_index.count("rbi"):
+        # Populate in the background; this call answers with the (empty) store right away
+        ingest_scheduler.enqueue("RBI", trigger="empty-store", min_gap_s=EMPTY_STORE_RETRY_S)
+    return _list_response(request, "rbi", params)
 
 @app.get("/amendments-rbi")
-def get_rbi_amendments(limit: int = 6) -> List[Dict]:
-    """Get latest RBI amendments only"""
-    return get_latest_rbi_amendments(limit)
+def get_rbi_amendments(limit: int = 6, include_content: bool = False) -> List[Dict]:
+    """Get latest RBI amendments only: title, date, description and excerpt. Full text is served
+    by /amendments/{id}/content (or inline with include_content=true)."""
+    return get_latest_rbi_amendments(limit, include_content=include_content)
+
+@app.get("/amendments/{document_id}/content")
+def amendment_content(document_id: str):
+    """Stream the full text of an ingested amendment, page by page, from the text cache."""
+    pages = amendment_text_pages(document_id)
+    if pages is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    def page_chunks():
+        for number, text in enumerate(pages, start=1):
+            if text:
+                yield f"--- page {number} ---\n{text}\n"
+
+    return StreamingResponse(page_chunks(), media_type="text/plain; charset=utf-8")
 
 @app.get("/list")
-def list_notifications() -> List[Dict]:
-    return get_metadata_store()
+def list_notifications(request: Request, params: Dict[str, Any] = Depends(list_params)):
+    return _list_response(request, "fssai", params)
 
 @app.get("/test-scrape")
 def test_scrape():
@@ -98,49 +204,32 @@ def test_scrape_dgft():
     return scrape_dgft_notifications()
 
 @app.get("/seed/synthetic")
-def seed_synthetic() -> Dict[str, int]:
-    """Ingest local PDFs from synthetic_pdfs_detailed/ for quick testing."""
-    base_dir = os.path.dirname(os.path.dirname(__file__))  # project root
-    dir_path = os.path.join(base_dir, "synthetic_pdfs_detailed")
-    added = ingest_local_pdfs_from(dir_path)
-    return {"ingested": added}
+def seed_synthetic() -> Dict[str, Any]:
+    """Queue ingestion of the local PDFs in synthetic_pdfs_detailed/ for quick testing (source LOCAL)."""
+    return ingest_scheduler.enqueue("LOCAL", trigger="http")
 
 @app.get("/update-dgft")
-def update_dgft() -> Dict[str, Any]:  
-    count = update_dgft_only()
-    return {"new_entries": count, "source": "DGFT"}
+def update_dgft() -> Dict[str, Any]:
+    return ingest_scheduler.enqueue("DGFT", trigger="http")
 
 @app.get("/list-dgft")
-def list_dgft_notifications() -> List[Dict]:
+def list_dgft_notifications(request: Request, params: Dict[str, Any] = Depends(list_params)):
     """Get only DGFT notifications"""
-    # You'll need to implement load_dgft_metadata() similar to load_rbi_metadata()
-    data = load_dgft_metadata()
-    if not data:
-        # Attempt to populate if empty
-        try:
-            update_dgft_only()
-            data = load_dgft_metadata()
-        except Exception:
-            pass
-    return data
+    if not metadata_index.count("dgft"):
+        ingest_scheduler.enqueue("DGFT", trigger="empty-store", min_gap_s=EMPTY_STORE_RETRY_S)
+    return _list_response(request, "dgft", params)
 
 @app.get("/update-gst")
 def update_gst() -> Dict[str, Any]:
-    """Update only GST notifications"""
-    count = update_gst_only()
-    return {"new_entries": count, "source": "GST"}
+    """Queue a GST-only ingest"""
+    return ingest_scheduler.enqueue("GST", trigger="http")
 
 @app.get("/list-gst")
-def list_gst_notifications() -> List[Dict]:
+def list_gst_notifications(request: Request, params: Dict[str, Any] = Depends(list_params)):
     """Get only GST notifications"""
-    data = load_gst_metadata()
-    if not data:
-        try:
-            update_gst_only()
-            data = load_gst_metadata()
-        except Exception:
-            pass
-    return data
+    if not metadata_index.count("gst"):
+        ingest_scheduler.enqueue("GST", trigger="empty-store", min_gap_s=EMPTY_STORE_RETRY_S)
+    return _list_response(request, "gst", params)
 
 @app.get("/test-scrape-gst")
 def test_scrape_gst():
@@ -184,42 +273,18 @@ def test_scrape_gst():
 #     except Exception as e:
 #         print(f"Error in latest_relevant: {e}")
 #         return {"FSSAI": [], "DGFT": [], "GST": []}
-def _load_company_json(company_id: str) -> Optional[Dict]:
-    """Load complete company JSON data"""
-    base_dir = os.path.dirname(__file__)
-    path = os.path.join(base_dir, "data", "companies", f"{company_id}.json")
-    if os.path.exists(path):
-        with open(path, "r") as f:
-            try:
-                return json.load(f)
-            except Exception:
-                return None
-    return None
-
 @app.get("/latest-relevant")
 def latest_relevant(company_id: Optional[str] = None):
     """Return the most recent and relevant amendments: 5 FSSAI, 4 DGFT, 3 GST"""
     try:
-        # Load recent amendments from each source
-        fssai_meta = get_metadata_store()
-        fssai_sorted = sorted([m for m in fssai_meta if m.get("source") == "FSSAI"], 
-                             key=lambda m: (m.get("date") or ""), reverse=True)[:15]  # More candidates
-
-        dgft_meta = load_dgft_metadata()
-        dgft_sorted = sorted(dgft_meta, key=lambda m: (m.get("date") or ""), reverse=True)[:15]
-
-        gst_meta = load_gst_metadata()
-        gst_sorted = sorted(gst_meta, key=lambda m: (m.get("date") or ""), reverse=True)[:15]
+        # Most recent candidates from each source's date index
+        fssai_sorted = metadata_index.latest("fssai", 15, source="FSSAI")  # More candidates
+        dgft_sorted = metadata_index.latest("dgft", 15)
+        gst_sorted = metadata_index.latest("gst", 15)
 
         # Fetch company profile
-        company_profile = None
-        if company_id:
-            company_profile = get_company_info(company_id)
-            # Also get company description
-            company_data = _load_company_json(company_id)
-            if company_data and company_data.get("optional_data"):
-                company_profile = company_profile or {}
-                company_profile["description"] = company_data["optional_data"].get("business_description", "")
+        # (get_company_info already includes optional_data.business_description as "description")
+        company_profile = get_company_info(company_id) if company_id else None
 
         print(f"/latest-relevant: company_id={company_id} fssai_candidates={len(fssai_sorted)} dgft_candidates={len(dgft_sorted)} gst_candidates={len(gst_sorted)}")
         
@@ -236,7 +301,7 @@ def latest_relevant(company_id: Optional[str] = None):
         # Combine all results
         combined = selected_fssai + selected_dgft + selected_gst
         
-        # Save filtered amendments to separate folder
+        # Save as this company's current filtered set (new version in filtered_store)
         save_filtered_amendments(combined, company_id)
         
         return combined
@@ -247,6 +312,16 @@ def latest_relevant(company_id: Optional[str] = None):
         traceback.print_exc()
         return []
 
+@app.get("/latest-relevant/history")
+def latest_relevant_history(company_id: Optional[str] = None, limit: int = 10, version: Optional[int] = None):
+    """Saved filtered-amendment versions for a company (newest first); `version` returns that set."""
+    if version is not None:
+        amendments = filtered_store.version(company_id, version)
+        if amendments is None:
+            raise HTTPException(status_code=404, detail="Version not found")
+        return {"company_id": company_id, "version": version, "amendments": amendments}
+    return {"company_id": company_id, "versions": filtered_store.history(company_id, limit)}
+
 @app.get("/backfill-excerpts")
 def backfill_excerpts():
     """Scan existing metadata entries and populate excerpt fields where missing."""
@@ -258,6 +333,7 @@ def backfill_excerpts():
 
 @app.post("/company/submit")
 async def submit_company_data(
+    background_tasks: BackgroundTasks,
     # Company Info
     company_name: str = Form(...),
     address: str = Form(""),
@@ -289,15 +365,12 @@ async def submit_company_data(
     ingredients_file: Optional[UploadFile] = File(None),
     nutrition_file: Optional[UploadFile] = File(None),
 ):
-    # Save uploaded files
-    def save_file(file: UploadFile) -> str:
-        base_dir = os.path.dirname(__file__)
-        upload_dir = os.path.join(base_dir, "data", "uploads")
-        os.makedirs(upload_dir, exist_ok=True)
-        path = os.path.join(upload_dir, f"{hashlib.md5(file.filename.encode()).hexdigest()}_{file.filename}")
-        with open(path, 'wb') as f:
-            f.write(file.file.read())
-        return path
+    # Stream uploads to disk (content-addressed, see uploads.py); text extraction runs after the response
+    async def save_file(file: UploadFile) -> str:
+        return await save_upload(file)
+
+    label_front_path = await save_file(label_front) if label_front else ""
+    label_back_path = await save_file(label_back) if label_back else ""
 
     # Prepare company data
     company_data = CompanyData(
@@ -323,8 +396,8 @@ async def submit_company_data(
         ],
         packaging=[
             PackagingInfo(
-                label_front_url=save_file(label_front) if label_front else "",
-                label_back_url=save_file(label_back) if label_back else "",
+                label_front_url=label_front_path,
+                label_back_url=label_back_path,
                 expiry_format=expiry_format,
                 packaging_claims=[c.strip() for c in claims.split(",")] if claims else []
             )
@@ -335,25 +408,25 @@ async def submit_company_data(
     if fssai_file:
         company_data.legal_documents.append(ComplianceDocument(
             document_type="FSSAI License",
-            file_path=save_file(fssai_file),
+            file_path=await save_file(fssai_file),
             issue_date=date.today()
         ))
     if gst_file:
         company_data.legal_documents.append(ComplianceDocument(
             document_type="GST Certificate",
-            file_path=save_file(gst_file),
+            file_path=await save_file(gst_file),
             issue_date=date.today()
         ))
     if lab_report_file:
         company_data.legal_documents.append(ComplianceDocument(
             document_type="Lab Test Report",
-            file_path=save_file(lab_report_file),
+            file_path=await save_file(lab_report_file),
             issue_date=date.today()
         ))
     if audit_file:
         company_data.legal_documents.append(ComplianceDocument(
             document_type="Audit Report",
-            file_path=save_file(audit_file),
+            file_path=await save_file(audit_file),
             issue_date=date.today()
         ))
 
@@ -361,18 +434,21 @@ async def submit_company_data(
     if ingredients_file:
         company_data.legal_documents.append(ComplianceDocument(
             document_type="Ingredients Document",
-            file_path=save_file(ingredients_file),
+            file_path=await save_file(ingredients_file),
             issue_date=date.today()
         ))
     if nutrition_file:
         company_data.legal_documents.append(ComplianceDocument(
             document_type="Nutritional Information Document",
-            file_path=save_file(nutrition_file),
+            file_path=await save_file(nutrition_file),
             issue_date=date.today()
         ))
 
     store_company_data(company_data)
-    return {"status": "success", "company_id": hash_company(company_name)}
+    company_id = hash_company(company_name)
+    # Extract, clean, chunk and embed the uploads now so compliance checks start without parsing
+    background_tasks.add_task(index_company_documents, company_id)
+    return {"status": "success", "company_id": company_id}
 
 # @app.get("/compliance/check")
 # async def check_company_compliance(company_id: str):
@@ -408,27 +484,72 @@ async def check_company_compliance(company_id: str):
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Compliance check failed: {e}")
 
-def analyze_amendments_for_company(company_id: str) -> Dict:
+def analyze_amendments_for_company(company_id: str, on_item=None) -> Dict:
     """Run the updated 5-stage prompt chain using filtered amendments."""
     company = get_company_info(company_id)
     if not company:
         raise ValueError("Company not found. Submit company data first.")
     uploads_dir = os.path.join(os.path.dirname(__file__), "data", "uploads")
-    analyzer = AmendmentAnalyzer(company_id=company_id)
+    analyzer = AmendmentAnalyzer(company_id=company_id, on_item=on_item)
     return analyzer.run_full_chain(company, uploads_dir=uploads_dir)
 
+@app.get("/compliance/runs")
+def compliance_runs(company_id: Optional[str] = None, limit: int = 50):
+    """Stored analyzer runs (newest first), optionally for one company."""
+    return list_runs(company_id)[:max(1, limit)]
+
+@app.get("/compliance/runs/{company_id}/{run_id}")
+def compliance_run(company_id: str, run_id: str, artifact: Optional[str] = None):
+    """Artifacts, spans and logs of one run, or a single artifact with ?artifact=<name>."""
+    if not os.path.exists(run_path(company_id, run_id)):
+        raise HTTPException(status_code=404, detail="Run not found")
+    if artifact:
+        data = read_artifact(company_id, run_id, artifact)
+        if data is None:
+            raise HTTPException(status_code=404, detail="Artifact not found")
+        return data
+    return read_run(company_id, run_id)
+
+@app.get("/compliance/check-stream")
+def check_company_compliance_stream(company_id: str):
+    """Run the compliance chain and stream NDJSON events as they happen.
+
+    Each amendments[] / document_compliance[] element is emitted as {"event": "item", ...} as soon
+    as the model finishes it; the last line is {"event": "result", ...} or {"event": "error", ...}.
+    """
+    if not get_company_info(company_id):
+        raise HTTPException(status_code=404, detail="Company not found. Submit company data first.")
+    events: "queue.Queue[Optional[Dict]]" = queue.Queue()
+
+    def worker():
+        try:
+            result = analyze_amendments_for_company(
+                company_id, on_item=lambda stage, item: events.put({"event": "item", "stage": stage, "item": item}))
+            events.put({"event": "result", "result": result})
+        except Exception as e:
+            events.put({"event": "error", "detail": f"Compliance check failed: {e}"})
+        finally:
+            events.put(None)
+
+    threading.Thread(target=worker, daemon=True).start()
+
+    def event_lines():
+        while True:
+            event = events.get()
+            if event is None:
+                break
+            yield json.dumps(event, ensure_ascii=False, default=str) + "\n"
+
+    return StreamingResponse(event_lines(), media_type="application/x-ndjson")
+
 @app.get("/pdf")
 def get_pdf(document_id: str):
     """Return PDF file for a given document_id from metadata store."""
     try:
-        meta = get_metadata_store()
-        match = next((m for m in meta if (m.get("document_id") == document_id)), None)
-        # If not found in FSSAI metadata, look in RBI metadata
-        if not match:
-            rbi_meta = load_rbi_metadata()
-            match = next((m for m in rbi_meta if (m.get("document_id") == document_id)), None)
-        if not match:
+        found = metadata_index.find(document_id)
+        if not found:
             raise HTTPException(status_code=404, detail="Document not found")
+        match = found[1]
         path = match.get("pdf_path")
         if not path:
             raise HTTPException(status_code=404, detail="PDF file not found")
@@ -451,6 +572,23 @@ def latest_company():
         raise HTTPException(status_code=404, detail="No companies found")
     info = get_company_info(cid)
     return {"company_id": cid, "company_info": info}
+
+@app.get("/company/list")
+def company_list(limit: int = 50, cursor: Optional[str] = None, q: str = ""):
+    """Companies, most recently updated first. Pass next_cursor back as `cursor` for the next page."""
+    try:
+        page = list_companies(limit=limit, cursor=cursor, query=q)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return page
+
+@app.get("/company/{company_id}")
+def company_detail(company_id: str):
+    """Full stored company data."""
+    model = get_company_model(company_id)
+    if model is None:
+        raise HTTPException(status_code=404, detail="Company not found")
+    return model
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=5005)
\ No newline at end of file
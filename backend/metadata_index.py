@@ -0,0 +1,207 @@
+import base64
+import bisect
+import hashlib
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from atomic_store import read_json
+
+"""In-process query index over the notification metadata stores.
+
+Each store (metadata.json, metadataRBI.json, ...) is parsed once and kept sorted newest first by
+its ISO date (`date_iso`, written at ingest), together with a lowercase search text per entry.
+The update_* ingest functions insert their new entries into the sorted snapshot; any other change
+to the file (mtime or size) rebuilds it on the next read. List endpoints and top-k "latest"
+lookups therefore walk the head of an already sorted list instead of re-reading and re-sorting
+the JSON per request.
+
+Pagination is keyset-based: the cursor encodes the (date, document_id) of the last item returned,
+so pages stay stable while new notifications are ingested.
+"""
+
+DATE_FORMATS = ("%d-%m-%Y", "%Y-%m-%d", "%d/%m/%Y")
+MAX_PAGE_SIZE = 1000
+# Fields searched by the `q` filter
+SEARCH_FIELDS = ("title", "description", "notification_number", "number")
+
+
+def iso_date(value: str) -> str:
+    """'14-08-2025' / '2025-08-14' / '14/08/2025' -> '2025-08-14'; '' when unparseable."""
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime((value or "").strip(), fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return ""
+
+
+def _encode_cursor(key: Tuple[str, str]) -> str:
+    return base64.urlsafe_b64encode(f"{key[0]}|{key[1]}".encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, str]:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    day, document_id = raw.split("|", 1)
+    return day, document_id
+
+
+def _document_id(entry: Dict) -> str:
+    return entry.get("document_id") or hashlib.md5((entry.get("pdf_url") or "").encode()).hexdigest()
+
+
+def entry_date(entry: Dict) -> str:
+    """ISO date of a metadata entry: the `date_iso` stored at ingest, else parsed from `date`."""
+    return entry.get("date_iso") or iso_date(entry.get("date", ""))
+
+
+def _search_text(entry: Dict) -> str:
+    return " ".join(str(entry.get(f) or "") for f in SEARCH_FIELDS).lower()
+
+
+class _Snapshot:
+    """One store's entries in ascending (date, document_id) order; unknown dates sort oldest."""
+
+    def __init__(self, version: str, entries: List[Dict]):
+        self.version = version
+        rows = sorted(
+            ((entry_date(e), _document_id(e), e) for e in entries if isinstance(e, dict)),
+            key=lambda r: (r[0], r[1]),
+        )
+        self.keys = [(r[0], r[1]) for r in rows]
+        self.entries = [r[2] for r in rows]
+        self.search = [_search_text(e) for e in self.entries]
+        self.by_id = {k[1]: e for k, e in zip(self.keys, self.entries)}
+
+    def extended(self, version: str, entries: List[Dict]) -> "_Snapshot":
+        """A copy with `entries` inserted in order (readers of this snapshot are unaffected)."""
+        snap = _Snapshot.__new__(_Snapshot)
+        snap.version = version
+        snap.keys, snap.entries, snap.search = list(self.keys), list(self.entries), list(self.search)
+        for entry in entries:
+            key = (entry_date(entry), _document_id(entry))
+            pos = bisect.bisect_right(snap.keys, key)
+            snap.keys.insert(pos, key)
+            snap.entries.insert(pos, entry)
+            snap.search.insert(pos, _search_text(entry))
+        snap.by_id = dict(self.by_id)
+        snap.by_id.update((_document_id(e), e) for e in entries)
+        return snap
+
+
+class MetadataIndex:
+    def __init__(self, stores: Dict[str, str]):
+        """`stores` maps a store name ("fssai", "rbi", ...) to its metadata JSON path."""
+        self.stores = stores
+        self._snapshots: Dict[str, _Snapshot] = {}
+        self._lock = threading.Lock()
+
+    def _file_version(self, store: str) -> str:
+        try:
+            st = os.stat(self.stores[store])
+            return f"{st.st_mtime_ns}-{st.st_size}"
+        except OSError:
+            return "missing"
+
+    def version(self, store: str) -> str:
+        """Changes whenever the store's file does (used for ETags)."""
+        return self._file_version(store)
+
+    def _snapshot(self, store: str) -> _Snapshot:
+        version = self._file_version(store)
+        snap = self._snapshots.get(store)
+        if snap is not None and snap.version == version:
+            return snap
+        with self._lock:
+            snap = self._snapshots.get(store)
+            if snap is not None and snap.version == version:
+                return snap
+            entries: List[Dict] = []
+            if version != "missing":
+                try:
+                    entries = read_json(self.stores[store], [])
+                except Exception as e:
+                    # Keep serving the last good snapshot rather than an empty list
+                    print(f"Warning: could not index {self.stores[store]}: {e}")
+                    if snap is not None:
+                        return snap
+            snap = _Snapshot(version, entries)
+            self._snapshots[store] = snap
+            return snap
+
+    def count(self, store: str) -> int:
+        return len(self._snapshot(store).entries)
+
+    def add(self, store: str, entries: List[Dict], total: int):
+        """Insert entries just appended to the store's file (call right after saving it; `total`
+        is the saved list's length) instead of re-reading and re-sorting the whole file. If the
+        in-memory snapshot was not in step with the file, it is dropped and rebuilt on next read."""
+        version = self._file_version(store)
+        with self._lock:
+            snap = self._snapshots.get(store)
+            if snap is None:
+                return
+            if len(snap.entries) + len(entries) != total:
+                del self._snapshots[store]
+                return
+            self._snapshots[store] = snap.extended(version, entries)
+
+    def find(self, document_id: str) -> Optional[Tuple[str, Dict]]:
+        """(store, entry) for a document id across all stores, or None."""
+        for store in self.stores:
+            entry = self._snapshot(store).by_id.get(document_id)
+            if entry is not None:
+                return store, entry
+        return None
+
+    def latest(self, store: str, k: int, source: Optional[str] = None) -> List[Dict]:
+        """The k newest entries (copies), optionally only those of one source."""
+        if k <= 0:
+            return []
+        return [dict(e) for e in self.query(store, limit=k, source=source)["items"]]
+
+    def query(self, store: str, limit: Optional[int] = None, cursor: Optional[str] = None,
+              source: Optional[str] = None, date_from: Optional[str] = None, date_to: Optional[str] = None,
+              q: str = "", fields: Optional[List[str]] = None) -> Dict:
+        """Entries newest first: {"items": [...], "next_cursor": str|None}.
+
+        `date_from`/`date_to` are inclusive ISO dates (entries without a parseable date are
+        excluded when either is set), `source` matches the entry's source field, `q` is a
+        case-insensitive substring of title/description/number, and `fields` projects each item.
+        Without `limit` every match is returned.
+        """
+        snap = self._snapshot(store)
+        limit = None if limit is None else max(1, min(int(limit), MAX_PAGE_SIZE))
+        source = (source or "").upper()
+        needle = (q or "").strip().lower()
+
+        # Walk backwards from the newest position allowed by the cursor / date_to
+        end = len(snap.keys)
+        if cursor:
+            end = bisect.bisect_left(snap.keys, _decode_cursor(cursor))
+        if date_to:
+            end = min(end, bisect.bisect_right(snap.keys, (date_to, "\uffff")))
+
+        matched: List[int] = []
+        i = end - 1
+        while i >= 0 and (limit is None or len(matched) <= limit):
+            day = snap.keys[i][0]
+            if date_from and day < date_from:
+                break
+            entry = snap.entries[i]
+            keep = not ((date_from or date_to) and not day)
+            keep = keep and (not source or (entry.get("source") or "").upper() == source)
+            keep = keep and (not needle or needle in snap.search[i])
+            if keep:
+                matched.append(i)
+            i -= 1
+
+        next_cursor = None
+        if limit is not None and len(matched) > limit:
+            matched = matched[:limit]
+            next_cursor = _encode_cursor(snap.keys[matched[-1]])
+        items = [snap.entries[j] for j in matched]
+        if fields:
+            items = [{f: e.get(f) for f in fields} for e in items]
+        return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,198 @@
+import hashlib
+import os
+import shutil
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+"""Local Tesseract OCR for scanned PDF pages and label images.
+
+OCR only runs where there is nothing else to read: PDF pages whose text layer is (nearly) empty
+and image uploads. Work is done in a bounded process pool and every result is kept in
+data/ocr_cache, so a page is only ever recognised once. PDF pages are keyed by (file sha256, page
+index, dpi, language) and looked up before the page is rendered; image uploads are keyed by a hash
+of their pixels.
+
+Configuration (environment):
+  VIGILO_OCR          "off" to disable (default: on when pytesseract and tesseract are installed)
+  VIGILO_OCR_LANG     Tesseract language(s), e.g. "eng" or "eng+hin" (default eng)
+  VIGILO_OCR_DPI      render resolution for PDF pages (default 300)
+  VIGILO_OCR_WORKERS  process pool size (default: min(2, cpu count))
+"""
+
+try:
+    import pytesseract
+    from PIL import Image, ImageOps
+except ImportError:  # optional dependency
+    pytesseract = None
+    Image = ImageOps = None
+
+# pypdfium2 (optional) and the process-wide PDFium lock
+from pdf_backends import PDFIUM_LOCK, pdfium
+from text_cache import file_sha256
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OCR_CACHE_DIR = os.path.join(BASE_DIR, "data", "ocr_cache")
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp"}
+# Pages with fewer characters than this in their text layer are treated as scanned
+MIN_TEXT_LAYER_CHARS = 25
+
+OCR_LANG = os.getenv("VIGILO_OCR_LANG", "eng")
+OCR_DPI = int(os.getenv("VIGILO_OCR_DPI", "300"))
+OCR_WORKERS = int(os.getenv("VIGILO_OCR_WORKERS", str(min(2, os.cpu_count() or 1))))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_available: Optional[bool] = None
+
+
+def ocr_available() -> bool:
+    """True when OCR is enabled and both pytesseract and the tesseract binary are present."""
+    global _available
+    if _available is None:
+        if os.getenv("VIGILO_OCR", "on").strip().lower() in ("off", "0", "false"):
+            _available = False
+        elif pytesseract is None:
+            print("Warning: pytesseract/Pillow not installed, OCR disabled")
+            _available = False
+        elif not shutil.which(getattr(pytesseract.pytesseract, "tesseract_cmd", "tesseract")):
+            print("Warning: tesseract binary not found, OCR disabled")
+            _available = False
+        else:
+            _available = True
+    return _available
+
+
+def needs_ocr(page_text: str) -> bool:
+    return len((page_text or "").strip()) < MIN_TEXT_LAYER_CHARS
+
+
+def is_image_file(path: str) -> bool:
+    return os.path.splitext(path or "")[1].lower() in IMAGE_EXTENSIONS
+
+
+# -------- worker side (runs in the process pool) --------
+
+def _cache_file(name: str) -> str:
+    return os.path.join(OCR_CACHE_DIR, name[:2], f"{name}.txt")
+
+
+def _image_cache_path(image) -> str:
+    digest = hashlib.sha256()
+    digest.update(f"{image.mode}:{image.size}:{OCR_LANG}".encode())
+    digest.update(image.tobytes())
+    return _cache_file(digest.hexdigest())
+
+
+def _page_cache_path(file_sha: str, index: int) -> str:
+    return _cache_file(hashlib.sha256(f"pdf:{file_sha}:{index}:{OCR_DPI}:{OCR_LANG}".encode()).hexdigest())
+
+
+def _read_cached(cache_path: str) -> Optional[str]:
+    if not os.path.exists(cache_path):
+        return None
+    with open(cache_path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _write_cached(cache_path: str, text: str):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, cache_path)
+
+
+def _recognise(image, cache_path: Optional[str] = None) -> str:
+    image = ImageOps.grayscale(image)
+    # Blank page: nothing darker than near-white, skip Tesseract entirely
+    if ImageOps.invert(image).point(lambda v: 255 if v > 16 else 0).getbbox() is None:
+        text = ""
+    else:
+        cache_path = cache_path or _image_cache_path(image)
+        cached = _read_cached(cache_path)
+        if cached is not None:
+            return cached
+        text = pytesseract.image_to_string(image, lang=OCR_LANG) or ""
+    if cache_path:
+        _write_cached(cache_path, text)
+    return text
+
+
+def _ocr_pdf_page(path: str, index: int, file_sha: str) -> str:
+    cache_path = _page_cache_path(file_sha, index)
+    cached = _read_cached(cache_path)
+    if cached is not None:
+        return cached
+    with PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(path)
+        try:
+            page = pdf[index]
+            try:
+                image = page.render(scale=OCR_DPI / 72).to_pil()
+            finally:
+                page.close()
+        finally:
+            pdf.close()
+    return _recognise(image, cache_path)
+
+
+def _ocr_image(path: str) -> str:
+    with Image.open(path) as image:
+        image.load()
+        return _recognise(image)
+
+
+# -------- caller side --------
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max(1, OCR_WORKERS))
+        return _pool
+
+
+def _result(future: Future, what: str) -> str:
+    try:
+        return future.result()
+    except Exception as e:
+        print(f"OCR failed for {what}: {e}")
+        return ""
+
+
+def submit_pdf_page(path: str, index: int, file_sha: Optional[str] = None) -> Optional[Future]:
+    """Queue OCR of one PDF page (0-based); None when OCR or the PDF renderer is unavailable."""
+    if not ocr_available():
+        return None
+    if pdfium is None:
+        print("Warning: pypdfium2 not installed, cannot render PDF pages for OCR")
+        return None
+    return _get_pool().submit(_ocr_pdf_page, path, index, file_sha or file_sha256(path))
+
+
+def ocr_pdf_pages(path: str, indexes: List[int]) -> Dict[int, str]:
+    """OCR several pages of one PDF in parallel; returns {index: text}."""
+    if not indexes or not ocr_available():
+        return {i: "" for i in indexes}
+    if pdfium is None:
+        print(f"Warning: pypdfium2 not installed, skipping OCR of {len(indexes)} page(s) of {path}")
+        return {i: "" for i in indexes}
+    file_sha = file_sha256(path)
+    futures = {i: submit_pdf_page(path, i, file_sha) for i in indexes}
+    return {i: _result(f, f"{path} page {i + 1}") if f else "" for i, f in futures.items()}
+
+
+def ocr_image_file(path: str) -> str:
+    """Text of an image upload (label photos, scanned certificates)."""
+    if not path or not os.path.exists(path) or not ocr_available():
+        return ""
+    return _result(_get_pool().submit(_ocr_image, path), path)
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
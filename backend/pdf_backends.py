@@ -0,0 +1,195 @@
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from io import StringIO
+from typing import Dict, Iterator, Optional
+
+import pdfplumber
+
+"""Pluggable PDF text-layer backends.
+
+pdfplumber computes full character layout for every page, which is more than plain text
+extraction needs. The default backend reads the text layer with pypdfium2; pdfminer (with box
+ordering disabled) and pdfplumber are available as alternatives. Whichever fast backend is used,
+a page whose text looks like garbage (unmapped glyphs, replacement characters, control codes) is
+re-extracted with pdfplumber, one page at a time.
+
+Select with VIGILO_PDF_BACKEND=pdfium|pdfminer|pdfplumber (default: pdfium, falling back to
+pdfminer and then pdfplumber when a library is not installed).
+
+PDFium is not thread-safe, and PDFs are read concurrently (request threads, background indexing,
+the ingest worker, batch runs). Every pypdfium2 call in the process, including OCR page rendering,
+goes through PDFIUM_LOCK; it is taken per page, not for a whole document, so readers interleave.
+"""
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # optional fast path
+    pdfium = None
+
+PDFIUM_LOCK = threading.Lock()
+
+_CID_RE = re.compile(r'\(cid:\d+\)')
+# Replacement character, private-use glyphs and control codes other than line breaks/tabs
+_BAD_CHAR_RE = re.compile('[\ufffd\ue000-\uf8ff\x00-\x08\x0b\x0c\x0e-\x1f]')
+_SPACE_RE = re.compile(r'\s')
+# Share of suspicious characters above which a page is re-extracted with pdfplumber
+GARBAGE_THRESHOLD = 0.15
+
+
+def garbage_ratio(text: str) -> float:
+    """Share of unmapped glyphs, replacement/private-use characters and control codes."""
+    if not text:
+        return 0.0
+    visible = len(text) - len(_SPACE_RE.findall(text))
+    if visible <= 0:
+        return 0.0
+    # Each "(cid:NN)" token stands for one unmapped glyph but spans ~9 characters
+    bad = len(_CID_RE.findall(text)) * 9 + len(_BAD_CHAR_RE.findall(text))
+    return min(1.0, bad / visible)
+
+
+def looks_like_garbage(text: str) -> bool:
+    return garbage_ratio(text) > GARBAGE_THRESHOLD
+
+
+class PdfTextBackend(ABC):
+    """Yield plain text per page; implementations must stop parsing when the consumer stops."""
+    name = "base"
+
+    @abstractmethod
+    def iter_pages(self, path: str, max_pages: Optional[int] = None) -> Iterator[str]:
+        ...
+
+
+class PdfplumberBackend(PdfTextBackend):
+    name = "pdfplumber"
+
+    def iter_pages(self, path: str, max_pages: Optional[int] = None) -> Iterator[str]:
+        with pdfplumber.open(path) as pdf:
+            for i, page in enumerate(pdf.pages):
+                if max_pages is not None and i >= max_pages:
+                    break
+                text = page.extract_text() or ""
+                # Drop the page's cached layout objects before moving on
+                page.close()
+                yield text
+
+    @staticmethod
+    def extract_page(pdf, index: int) -> str:
+        page = pdf.pages[index]
+        try:
+            return page.extract_text() or ""
+        finally:
+            page.close()
+
+
+class PdfiumBackend(PdfTextBackend):
+    name = "pdfium"
+
+    def iter_pages(self, path: str, max_pages: Optional[int] = None) -> Iterator[str]:
+        with PDFIUM_LOCK:
+            pdf = pdfium.PdfDocument(path)
+        try:
+            with PDFIUM_LOCK:
+                count = len(pdf) if max_pages is None else min(len(pdf), max_pages)
+            for i in range(count):
+                # Never hold the lock across the yield: the consumer may read another PDF meanwhile
+                with PDFIUM_LOCK:
+                    page = pdf[i]
+                    try:
+                        textpage = page.get_textpage()
+                        try:
+                            text = textpage.get_text_range() or ""
+                        finally:
+                            textpage.close()
+                    finally:
+                        page.close()
+                yield text.replace("\r\n", "\n").replace("\r", "\n")
+        finally:
+            with PDFIUM_LOCK:
+                pdf.close()
+
+
+class PdfminerBackend(PdfTextBackend):
+    name = "pdfminer"
+
+    def iter_pages(self, path: str, max_pages: Optional[int] = None) -> Iterator[str]:
+        from pdfminer.converter import TextConverter
+        from pdfminer.layout import LAParams
+        from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+        from pdfminer.pdfpage import PDFPage
+
+        resources = PDFResourceManager(caching=True)
+        # boxes_flow=None skips the expensive reading-order analysis but keeps line breaks
+        laparams = LAParams(boxes_flow=None)
+        with open(path, "rb") as fp:
+            for i, page in enumerate(PDFPage.get_pages(fp)):
+                if max_pages is not None and i >= max_pages:
+                    break
+                out = StringIO()
+                device = TextConverter(resources, out, laparams=laparams)
+                try:
+                    PDFPageInterpreter(resources, device).process_page(page)
+                finally:
+                    device.close()
+                yield out.getvalue().replace("\x0c", "")
+
+
+class FallbackBackend(PdfTextBackend):
+    """Use `primary` and re-extract individual garbage pages with pdfplumber."""
+
+    def __init__(self, primary: PdfTextBackend):
+        self.primary = primary
+        self.name = f"{primary.name}+pdfplumber"
+        self.stats: Dict[str, int] = {"pages": 0, "fallback_pages": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def iter_pages(self, path: str, max_pages: Optional[int] = None) -> Iterator[str]:
+        plumber = None
+        try:
+            for i, text in enumerate(self.primary.iter_pages(path, max_pages)):
+                self._count("pages")
+                if looks_like_garbage(text):
+                    if plumber is None:
+                        plumber = pdfplumber.open(path)
+                    self._count("fallback_pages")
+                    text = PdfplumberBackend.extract_page(plumber, i)
+                yield text
+        finally:
+            if plumber is not None:
+                plumber.close()
+
+
+BACKENDS = {
+    "pdfium": PdfiumBackend,
+    "pdfminer": PdfminerBackend,
+    "pdfplumber": PdfplumberBackend,
+}
+
+
+def make_backend(name: str) -> PdfTextBackend:
+    """Build a backend by name; fast backends are wrapped with the per-page pdfplumber fallback."""
+    if name == "pdfium" and pdfium is None:
+        print("Warning: pypdfium2 not installed, using pdfminer text backend")
+        name = "pdfminer"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend '{name}' (choose from {', '.join(BACKENDS)})")
+    backend = BACKENDS[name]()
+    return backend if name == "pdfplumber" else FallbackBackend(backend)
+
+
+_backend: Optional[PdfTextBackend] = None
+
+
+def get_pdf_backend() -> PdfTextBackend:
+    """Process-wide backend chosen by VIGILO_PDF_BACKEND."""
+    global _backend
+    if _backend is None:
+        _backend = make_backend(os.getenv("VIGILO_PDF_BACKEND", "pdfium").strip().lower())
+    return _backend
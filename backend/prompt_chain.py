@@ -2,12 +2,27 @@ import os
 from dotenv import load_dotenv
 from groq import Groq
 from typing import List, Dict, Optional, Tuple
+import hashlib
 import json
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from vigilo_utils import (
-    extract_text_from_file,
+    extract_english_pages,
+    extract_english_text,
+    filter_english_lines,
+    DATA_DIR,
+    embeddings,
+    search_regulations,
 )
+from run_store import RunWriter, maybe_prune_async
+from telemetry import Tracer, record_llm_call, usage_to_dict, LLM_FALLBACKS, LLM_RETRIES
+from llm_cache import build_cache
+from llm_client import GroqPool
+from json_stream import JsonArrayStream, nest_items
+from chunking import chunk_pages, format_chunks, select_evidence
+from company_docs import EVIDENCE_CHUNK_OVERLAP, EVIDENCE_CHUNK_SIZE, CompanyDocument, load_company_documents
 
 """Prompt chain for multi-stage amendment analysis and compliance checks.
 
@@ -15,12 +30,15 @@ Pipeline stages implemented:
  1A) Analyze the first 3 PDFs from backend/data/pdfs (extract and summarize amendments)
  1B) Analyze the next 3 PDFs from backend/data/pdfs (extract and summarize amendments)
   2) Filter amendments for relevance against a company's profile (from backend/data/companies)
-  3) Check compliance of the company against relevant amendments using text extracted from the
-    first 2 uploaded company PDFs (backend/data/uploads)
-  4) Same as stage 3, but for the next 3 uploaded PDFs
+  3) Check compliance of the company against relevant amendments using evidence from the first 2
+    of the company's own legal documents (pre-extracted at submission, see company_docs)
+  4) Same as stage 3, but for the next 3 legal documents plus the company's packaging labels
+    (images are OCR'd)
   5) Aggregate the results of stages 3 and 4 into a comprehensive JSON compliance report
 
-All stages write detailed JSON logs to backend/data/logs/<company_id>/<timestamp>/
+All stages append their JSON artifacts, one structured span per stage and LLM call, and
+telemetry_summary.json to a single compressed run log, backend/data/logs/<company_id>/<run_id>.jsonl.gz
+(read it back with run_store.read_run).
 """
 
 # Load environment (try project root .env.local and default env)
@@ -30,6 +48,12 @@ load_dotenv(dotenv_path=project_root_env)
 load_dotenv(dotenv_path=os.path.join(backend_dir, ".env.local"))
 API_KEY = os.getenv("GROQ_API_KEY")
 client = Groq(api_key=API_KEY) if API_KEY else None
+# Shared rate-limit-aware pool used by every LLM call in this process
+pool = GroqPool(client) if client else None
+# Duplicate a relevance-selection request that has not answered within this many seconds
+SELECT_HEDGE_AFTER_S = float(os.getenv("VIGILO_SELECT_HEDGE_AFTER", "3.0"))
+# Prompt -> response cache shared by select_relevant_amendments and every analyzer stage
+response_cache = build_cache(DATA_DIR, embed_fn=embeddings.embed_documents)
 
 def select_relevant_amendments(amendments: List[Dict], top_n: int = 3, source: str = "", 
                               company: Optional[Dict] = None, model: str = "openai/gpt-oss-20b") -> List[Dict]:
@@ -91,27 +115,42 @@ def select_relevant_amendments(amendments: List[Dict], top_n: int = 3, source: s
                     f"\n\nReturn exactly {top_n} indices as JSON array."
                 )
             
-            print(f"Calling Groq for source={source} with model={model}")
-            resp = client.chat.completions.create(
-                messages=[{"role": "user", "content": prompt}], 
-                model=model, 
-                temperature=0.1,  # Slight temperature for variety
-                max_tokens=50
-            )
-            text = resp.choices[0].message.content.strip()
+            # The variable part of the prompt: near-duplicate cache hits must agree on it exactly
+            payload = f"top_n={top_n} source={source}\n" + company_block + "\n" + "\n".join(items)
+            cached = response_cache.get(model, 0.1, prompt, payload=payload) if response_cache else None
+            if cached:
+                print(f"Cache hit for source={source} with model={model}")
+                text = cached["content"].strip()
+            else:
+                print(f"Calling Groq for source={source} with model={model}")
+                started = time.perf_counter()
+                try:
+                    resp = pool.complete(
+                        prompt,
+                        model=model, 
+                        temperature=0.1,  # Slight temperature for variety
+                        max_tokens=50,
+                        hedge_after=SELECT_HEDGE_AFTER_S,  # Tail-latency sensitive: the dashboard waits on this
+                    )
+                except Exception:
+                    record_llm_call(model, f"select_{source or 'any'}", time.perf_counter() - started, outcome="error")
+                    raise
+                record_llm_call(model, f"select_{source or 'any'}", time.perf_counter() - started, resp.usage)
+                text = resp.content.strip()
+                if response_cache and re.search(r'\[[^\]]*\]', text):
+                    response_cache.put(model, 0.1, prompt, text, usage_to_dict(resp.usage), payload=payload)
             print(f"Raw response: {text}")
             
-            import re, json as _json
             # Try to extract JSON array
             m = re.search(r'\[[^\]]*\]', text)
             if m:
                 try:
-                    arr = _json.loads(m.group(0))
+                    arr = json.loads(m.group(0))
                     if isinstance(arr, list) and len(arr) > 0:
                         selected = [amendments[i] for i in arr if 0 <= i < len(amendments)]
                         print(f"Groq returned indices: {arr} -> selected {len(selected)} items")
                         return selected[:top_n]
-                except _json.JSONDecodeError:
+                except json.JSONDecodeError:
                     print(f"Failed to parse JSON from: {text}")
             
             # If AI fails, fallback to manual selection
@@ -123,6 +162,11 @@ def select_relevant_amendments(amendments: List[Dict], top_n: int = 3, source: s
     # Fallback: return top N by date with relevance scoring
     return manual_relevance_selection(amendments, top_n, source, company)
 
+def amendment_id(amendment: Dict) -> str:
+    """Stable id of an amendment: its metadata document_id (md5 of the PDF URL, see vigilo_utils)."""
+    return amendment.get("document_id") or hashlib.md5(
+        (amendment.get("pdf_url") or amendment.get("pdf_path") or "").encode()).hexdigest()
+
 def manual_relevance_selection(amendments: List[Dict], top_n: int, source: str, company: Optional[Dict]) -> List[Dict]:
     """Manual relevance scoring fallback when AI fails"""
     scored_amendments = []
@@ -185,16 +229,36 @@ MODEL_COMPLIANCE = "openai/gpt-oss-20b"      # Stage 3/4 (evidence-rich complian
 MODEL_OPTIMIZE = "deepseek-r1-distill-llama-70b"  # Stage 5 (comprehensive aggregation & prioritization)
 MODEL_DEFAULT = "openai/gpt-oss-120b"
 
+# Characters of (English-only) source text each prompt actually uses
+AMENDMENT_CONTEXT_CHARS = 2000  # Stage 1, per amendment
+# Stage 1 prompts hold at most this many amendments (about 2000 chars each in, a few hundred
+# tokens each out), so large batch sweeps stay within the smallest agent model's context
+STAGE1_BATCH_SIZE = int(os.getenv("VIGILO_STAGE1_BATCH_SIZE", "8"))
+# Stage 1 prompts sent at once (GroqPool still caps overall concurrency)
+STAGE1_PARALLEL = int(os.getenv("VIGILO_STAGE1_PARALLEL", "4"))
+DOCUMENT_CONTEXT_CHARS = 4000   # Stage 3/4, per company document
+# Stage 3/4 evidence for uploads outside the company document store (see company_docs): scan this
+# much English text per document, cut it into clause-aware chunks and keep the ones closest to the
+# relevant amendments (with page/section labels)
+DOCUMENT_SCAN_CHARS = 4 * DOCUMENT_CONTEXT_CHARS
+# Stage 3/4: clauses of each amendment's own notification retrieved from the vector store, with
+# their [page | section] labels so findings can cite the regulation
+REGULATION_CHUNKS = 4
+REGULATION_CONTEXT_CHARS = 1500  # per amendment
+
 class AmendmentAnalyzer:
-    def __init__(self, company_id: Optional[str] = None, log_dir: Optional[str] = None):
+    def __init__(self, company_id: Optional[str] = None, run_id: Optional[str] = None, on_item=None):
+        # Optional callback(stage, item) receiving each streamed amendments[] / document_compliance[] element
+        self.on_item = on_item
         self.stage_outputs: Dict[str, List[str]] = {}
         self.current_amendments: List[Dict] = []
+        self._regulation_excerpts: Dict[str, str] = {}
         self.company_id = company_id or "unknown_company"
-        # Prepare log directory
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        default_log_dir = os.path.join(backend_dir, "data", "logs", self.company_id, ts)
-        self.log_dir = log_dir or default_log_dir
-        os.makedirs(self.log_dir, exist_ok=True)
+        # One compressed log per run: data/logs/<company_id>/<run_id>.jsonl.gz (see run_store)
+        self.run_id = run_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.run = RunWriter(self.company_id, self.run_id)
+        self.tracer = Tracer(sink=self.run.write_span)
+        maybe_prune_async()
     
     @staticmethod
     def _strip_to_json(text: str) -> str:
@@ -213,78 +277,201 @@ class AmendmentAnalyzer:
         return t
         
     def log_stage(self, stage_name: str, message: str):
-        """Log stage progress with timestamp"""
+        """Log stage progress with timestamp (printed and persisted in the run log)"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         log_entry = f"[{timestamp}] {stage_name.upper()}: {message}"
         print(log_entry)
         self.stage_outputs[stage_name] = self.stage_outputs.get(stage_name, []) + [log_entry]
+        run = getattr(self, "run", None)
+        if run is not None:
+            try:
+                run.write_log(stage_name, message)
+            except Exception as e:
+                print(f"Warning: could not persist log line for run {self.run_id}: {e}")
 
     def _write_json(self, filename: str, data: Dict):
         try:
-            path = os.path.join(self.log_dir, filename)
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            self.run.write_artifact(filename, data)
         except Exception as e:
             self.log_stage("ERROR", f"Failed writing {filename}: {e}")
 
     def call_groq(self, prompt: str, model: str = MODEL_DEFAULT, temperature: float = 0.2) -> str:
-        """Make API call to Groq with specified model. On failure, retry once with MODEL_DEFAULT."""
+        """Make API call to Groq with specified model. On failure, retry once with MODEL_DEFAULT.
+
+        Rate limits, backoff and concurrency are handled by the shared GroqPool; only errors that
+        survive its retries trigger the MODEL_DEFAULT fallback.
+
+        Each attempt is recorded as an `llm` span (model, tokens, cost, latency) under the
+        currently open stage span.
+        """
+        if client is None:
+            # Fallback: return a minimal JSON placeholder so pipeline continues
+            self.log_stage("WARN", "GROQ API key missing — using local fallback response")
+            # Heuristic: return empty amendments array wrapper
+            return json.dumps({"amendments": []})
+        stage = self.tracer.current_stage()
+        with self.tracer.span("llm", kind="llm", model=model, stage=stage, temperature=temperature,
+                              prompt_chars=len(prompt), retries=0) as span:
+            return self._with_fallback(
+                span, model, stage,
+                lambda m: self._timed_completion(span, prompt, m, temperature, stage))
+
+    def call_groq_json(self, prompt: str, model: str, key_path: Tuple[str, ...], temperature: float = 0.2):
+        """Stream a completion and parse it incrementally.
+
+        Each element of the `key_path` array (e.g. amendments[] or document_compliance[]) is handed
+        to `self.on_item(stage, item)` as soon as it is complete. If the full reply does not parse
+        (truncated stream, malformed tail) the complete elements are salvaged into
+        {key_path: items, "_salvaged": True}; with nothing to salvage JSONDecodeError is raised.
+        """
+        if client is None:
+            return json.loads(self._strip_to_json(self.call_groq(prompt, model=model, temperature=temperature)))
+        stage = self.tracer.current_stage()
+        with self.tracer.span("llm", kind="llm", model=model, stage=stage, temperature=temperature,
+                              prompt_chars=len(prompt), retries=0, streamed=True) as span:
+            parser = self._with_fallback(
+                span, model, stage,
+                lambda m: self._streamed_completion(span, prompt, m, temperature, stage, key_path))
         try:
-            if client is None:
-                # Fallback: return a minimal JSON placeholder so pipeline continues
-                self.log_stage("WARN", "GROQ API key missing — using local fallback response")
-                # Heuristic: return empty amendments array wrapper
-                return json.dumps({"amendments": []})
-            response = client.chat.completions.create(
-                messages=[{"role": "user", "content": prompt}],
-                model=model,
-                temperature=temperature
-            )
-            return response.choices[0].message.content
+            return json.loads(self._strip_to_json(parser.json_text()))
+        except json.JSONDecodeError:
+            if not parser.items:
+                raise
+            self.log_stage(stage, f"Reply truncated or malformed; salvaged {len(parser.items)} complete items")
+            result = nest_items(key_path, parser.items)
+            result["_salvaged"] = True
+            return result
+
+    def _with_fallback(self, span: Dict, model: str, stage: str, attempt):
+        """Run `attempt(model)`; if it fails for a non-default model, retry once with MODEL_DEFAULT."""
+        try:
+            return attempt(model)
         except Exception as e:
             # Attempt a single retry with default model if a non-default model was requested
-            if model != MODEL_DEFAULT and client is not None:
+            if model != MODEL_DEFAULT:
                 self.log_stage("WARN", f"Model '{model}' failed ({e}); retrying with default '{MODEL_DEFAULT}'")
+                self.tracer.add_event(span, "fallback", from_model=model, to_model=MODEL_DEFAULT, error=str(e))
+                LLM_FALLBACKS.inc(from_model=model, to_model=MODEL_DEFAULT, stage=stage)
+                LLM_RETRIES.inc(model=model, reason="fallback")
+                span["attributes"]["retries"] += 1
+                span["attributes"]["model"] = MODEL_DEFAULT
+                span["attributes"]["requested_model"] = model
                 try:
-                    response = client.chat.completions.create(
-                        messages=[{"role": "user", "content": prompt}],
-                        model=MODEL_DEFAULT,
-                        temperature=temperature
-                    )
-                    return response.choices[0].message.content
+                    return attempt(MODEL_DEFAULT)
                 except Exception as e2:
                     self.log_stage("ERROR", f"Retry with default model failed: {e2}")
                     raise
             self.log_stage("ERROR", f"Groq API call failed: {str(e)}")
             raise
+
+    def _cached(self, span: Dict, prompt: str, model: str, temperature: float) -> Optional[str]:
+        if response_cache is None:
+            return None
+        # No payload: analyzer stages only take exact hits (their prompts share long fixed text)
+        hit = response_cache.get(model, temperature, prompt)
+        span["attributes"]["cache"] = ("semantic_hit" if hit["semantic"] else "hit") if hit else "miss"
+        if hit:
+            span["attributes"]["saved_tokens"] = hit["usage"]["prompt_tokens"] + hit["usage"]["completion_tokens"]
+            return hit["content"]
+        return None
+
+    def _timed_completion(self, span: Dict, prompt: str, model: str, temperature: float, stage: str) -> str:
+        cached = self._cached(span, prompt, model, temperature)
+        if cached is not None:
+            return cached
+        started = time.perf_counter()
+        try:
+            completion = pool.complete(prompt, model=model, temperature=temperature)
+        except Exception:
+            record_llm_call(model, stage, time.perf_counter() - started, outcome="error")
+            raise
+        span["attributes"].update(record_llm_call(model, stage, time.perf_counter() - started, completion.usage))
+        span["attributes"]["retries"] += completion.attempts - 1
+        if response_cache:
+            response_cache.put(model, temperature, prompt, completion.content, usage_to_dict(completion.usage))
+        return completion.content
+
+    def _streamed_completion(self, span: Dict, prompt: str, model: str, temperature: float, stage: str,
+                             key_path: Tuple[str, ...]) -> JsonArrayStream:
+        started = time.perf_counter()
+        parser = JsonArrayStream(key_path)
+        cached = self._cached(span, prompt, model, temperature)
+        if cached is not None:
+            self._emit_items(span, stage, parser.feed(cached), started)
+            span["attributes"]["items_streamed"] = len(parser.items)
+            return parser
+        try:
+            stream = pool.stream(prompt, model=model, temperature=temperature)
+            for delta in stream:
+                self._emit_items(span, stage, parser.feed(delta), started)
+        except Exception:
+            record_llm_call(model, stage, time.perf_counter() - started, outcome="error")
+            raise
+        outcome = "truncated" if stream.truncated else "ok"
+        span["attributes"].update(record_llm_call(model, stage, time.perf_counter() - started, stream.usage, outcome=outcome))
+        span["attributes"]["retries"] += stream.attempts - 1
+        span["attributes"]["items_streamed"] = len(parser.items)
+        span["attributes"]["truncated"] = stream.truncated
+        if stream.error is not None and not parser.items:
+            # Nothing usable arrived: let the caller fall back to MODEL_DEFAULT
+            raise stream.error
+        if response_cache and not stream.truncated:
+            response_cache.put(model, temperature, prompt, stream.content, usage_to_dict(stream.usage))
+        return parser
+
+    def _emit_items(self, span: Dict, stage: str, items: List, started: float):
+        for item in items:
+            if "time_to_first_item_s" not in span["attributes"]:
+                span["attributes"]["time_to_first_item_s"] = round(time.perf_counter() - started, 4)
+            if self.on_item:
+                try:
+                    self.on_item(stage, item)
+                except Exception as e:
+                    self.log_stage("WARN", f"on_item callback failed: {e}")
     
     def _filter_hindi_content(self, text: str) -> str:
         """Filter out Hindi/Devanagari content from text, keeping only English content"""
-        if not text:
-            return ""
-        
-        # Split into lines and keep only lines with mostly English text
-        english_lines = []
-        for line in text.splitlines():
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Count Devanagari characters (Hindi)
-            devanagari_chars = re.findall(r'[\u0900-\u097F]', line)
-            devanagari_ratio = len(devanagari_chars) / max(1, len(line))
-            
-            # Count English alphabetic characters
-            english_chars = re.findall(r'[a-zA-Z]', line)
-            english_ratio = len(english_chars) / max(1, len(line))
-            
-            # Keep line if it has more English than Hindi, or if it's mostly numbers/symbols
-            if english_ratio > devanagari_ratio or (english_ratio + devanagari_ratio) < 0.3:
-                english_lines.append(line)
-        
-        return "\n".join(english_lines)
+        return filter_english_lines(text)
 
     # -------- File helpers --------
+    def _evidence_query(self) -> str:
+        return "\n".join(
+            f"{a.get('title', '')}. {a.get('summary', '')} " + " ".join(a.get("requirements", []) or [])
+            for a in self.current_amendments
+        )
+
+    def _regulation_excerpt(self, amendment: Dict) -> str:
+        """Page/section-labelled clauses of the amendment's own notification closest to its summary
+        and requirements (vector store lookup, cached for the run's Stage 3 and 4)."""
+        document_id = amendment.get("document_id")
+        if not document_id:
+            return ""
+        if document_id not in self._regulation_excerpts:
+            query = f"{amendment.get('title', '')}. {amendment.get('summary', '')} " + " ".join(
+                amendment.get("requirements", []) or [])
+            chunks = search_regulations(query, k=REGULATION_CHUNKS, document_id=document_id)
+            self._regulation_excerpts[document_id] = format_chunks(chunks)[:REGULATION_CONTEXT_CHARS]
+        return self._regulation_excerpts[document_id]
+
+    @staticmethod
+    def _document_evidence(path: str, query: str) -> str:
+        """Page-labelled evidence windows from a company document: English pages (parsed only up to
+        DOCUMENT_SCAN_CHARS), chunked at clause boundaries, ranked against the amendments and
+        merged without the splitter overlap, within DOCUMENT_CONTEXT_CHARS."""
+        pages = extract_english_pages(path, DOCUMENT_SCAN_CHARS)
+        paged = os.path.splitext(path)[1].lower() == ".pdf"
+        chunks = chunk_pages(pages, {"document_id": path}, chunk_size=EVIDENCE_CHUNK_SIZE,
+                             chunk_overlap=EVIDENCE_CHUNK_OVERLAP, paged=paged)
+        picked = select_evidence(chunks, query, DOCUMENT_CONTEXT_CHARS, embed_fn=embeddings.embed_documents)
+        return format_chunks(picked)
+
+    @staticmethod
+    def _stored_evidence(doc: CompanyDocument, query: str) -> str:
+        """Same evidence windows from the company document store: no parsing, only the query is embedded."""
+        picked = select_evidence(doc.chunks, query, DOCUMENT_CONTEXT_CHARS,
+                                 embed_fn=embeddings.embed_documents, vectors=doc.vectors)
+        return format_chunks(picked)
+
     @staticmethod
     def _first_n_pdfs_from(dir_path: str, limit: int) -> List[str]:
         try:
@@ -303,7 +490,7 @@ class AmendmentAnalyzer:
         paths = AmendmentAnalyzer._first_n_pdfs_from(dir_path, limit)
         out: List[Dict] = []
         for p in paths:
-            text = extract_text_from_file(p)
+            text = extract_english_text(p, AMENDMENT_CONTEXT_CHARS)
             out.append({
                 "title": os.path.basename(p),
                 "date": "",
@@ -323,8 +510,9 @@ class AmendmentAnalyzer:
             content = a.get('content', '')
             # Filter out Hindi content
             filtered_content = self._filter_hindi_content(content)
+            heading = f"[ID: {a['document_id']}] {a['title']}" if a.get("document_id") else a['title']
             filtered_amendment_texts.append(
-                f"### {a['title']}\nDate: {a['date']}\n{filtered_content[:2000]}..."
+                f"### {heading}\nDate: {a['date']}\n{filtered_content[:AMENDMENT_CONTEXT_CHARS]}..."
             )
 
         amendment_texts = "\n\n".join(filtered_amendment_texts)
@@ -343,12 +531,13 @@ class AmendmentAnalyzer:
             "     - Provide both normalized date (YYYY-MM-DD) when possible and raw snippet\n"
             "   - Affected business types (manufacturer/distributor/etc.)\n"
             "   - Potential impact level (High/Medium/Low)\n"
-            "2. Maintain original amendment titles for reference.\n"
+            "2. Maintain original amendment titles for reference, and copy each amendment's ID (from its heading) into \"id\".\n"
             "3. Prefer extracting dates directly from text like \"effective from\", \"not later than\", \"within X days\" (normalize relative deadlines assuming current month-end if exact date missing).\n"
             "4. Output strict JSON only in this format:\n"
             "{\n"
             "  \"amendments\": [\n"
             "    {\n"
+            "      \"id\": \"ID from the amendment heading\",\n"
             "      \"title\": \"Original title\",\n"
             "      \"summary\": \"Brief purpose\",\n"
             "      \"requirements\": [\"list of specific, quotable requirements\"],\n"
@@ -375,26 +564,47 @@ class AmendmentAnalyzer:
                     "details": "",
                     "deadlines": [],
                     "affected_businesses": [],
-                    "impact": "Medium"
+                    "impact": "Medium",
+                    "document_id": a.get("document_id", ""),
                 })
             self._write_json(f"{stage_label.lower().replace(' ', '_')}_amendment_summaries.json", {"amendments": summaries})
             return summaries
 
-        response = self.call_groq(prompt, model=model)
-        self.log_stage(stage_label, "Received amendment analysis")
         try:
-            result = json.loads(self._strip_to_json(response))
+            result = self.call_groq_json(prompt, model, ("amendments",))
+            self.log_stage(stage_label, "Received amendment analysis")
             if isinstance(result, list):
                 amendments_out = result
                 result = {"amendments": amendments_out}
             else:
                 amendments_out = result.get("amendments", [])
+            self._attach_document_ids(amendments, amendments_out)
             self._write_json(f"{stage_label.lower().replace(' ', '_')}_amendment_summaries.json", result)
             return amendments_out
         except json.JSONDecodeError:
             self.log_stage("ERROR", f"Failed to parse amendment analysis JSON for {stage_label}")
             raise
 
+    @staticmethod
+    def _attach_document_ids(inputs: List[Dict], summaries: List[Dict]):
+        """Set each summary's `document_id` from its input amendment: by the echoed id, else by
+        exact title, else by position when the model returned one summary per input in order."""
+        ids = {a.get("document_id") for a in inputs if a.get("document_id")}
+        by_title = {}
+        for a in inputs:
+            by_title.setdefault(a.get("title", ""), a.get("document_id", ""))
+        same_length = len(summaries) == len(inputs)
+        for i, summary in enumerate(summaries):
+            if not isinstance(summary, dict):
+                continue
+            echoed = str(summary.pop("id", "") or "").strip()
+            if echoed in ids:
+                summary["document_id"] = echoed
+            elif summary.get("title") in by_title:
+                summary["document_id"] = by_title[summary["title"]]
+            elif same_length:
+                summary["document_id"] = inputs[i].get("document_id", "")
+
     def filter_by_company_profile(self, company_data: Dict) -> List[Dict]:
         """Stage 2: Filter amendments relevant to company's basic profile"""
         # Normalize company_data to a dict and guard against missing keys
@@ -414,7 +624,8 @@ class AmendmentAnalyzer:
         self.log_stage("STAGE 2", f"Filtering for {cname}")
         
         amendments_text = "\n\n".join([
-            f"### {a.get('title','Untitled')}\n{a.get('summary','')}\nAffects: {', '.join(a.get('affected_businesses') or [])}"
+            f"### [ID: {a.get('document_id', '')}] {a.get('title','Untitled')}\n{a.get('summary','')}\n"
+            f"Affects: {', '.join(a.get('affected_businesses') or [])}"
             for a in self.current_amendments
         ])
         
@@ -439,7 +650,8 @@ class AmendmentAnalyzer:
    - 'potential_impact': Brief note (what area would be affected and why).
    - 'assumed_product_categories': if not explicit, infer likely categories.
 4. Maintain all original amendment data (including any 'deadlines' you extracted).
-5. Output strict JSON in the same format with added fields only.
+5. Include "id" with the exact value shown in the amendment's [ID: ...] heading.
+6. Output strict JSON in the same format with added fields only.
 """
         
         if client is None:
@@ -451,14 +663,15 @@ class AmendmentAnalyzer:
             self._write_json("stage2_relevant_amendments.json", {"amendments": filtered})
             return filtered
 
-        response = self.call_groq(prompt, model=MODEL_DETAILS)
         try:
-            result = json.loads(self._strip_to_json(response))
+            result = self.call_groq_json(prompt, MODEL_DETAILS, ("amendments",))
             if isinstance(result, list):
                 amendments_out = result
                 result = {"amendments": amendments_out}
             else:
                 amendments_out = result.get("amendments", [])
+            # Stage 3/4 look regulation text up by document_id, which the model does not reliably keep
+            self._attach_document_ids(self.current_amendments, amendments_out)
             self.log_stage("STAGE 2", f"Filtered to {len(amendments_out)} potentially relevant amendments")
             self.current_amendments = amendments_out
             self._write_json("stage2_relevant_amendments.json", result)
@@ -478,22 +691,27 @@ class AmendmentAnalyzer:
             filtered_docs.append((fn, filtered_txt))
 
         docs_block = "\n\n".join([
-            f"### {fn}\n{(txt or '')[:4000]}" for fn, txt in filtered_docs
+            f"### {fn}\n{(txt or '')[:DOCUMENT_CONTEXT_CHARS]}" for fn, txt in filtered_docs
         ])
     
-        amendments_text = "\n\n".join([
-            f"### {a['title']}\nSummary: {a.get('summary','')}\nRequirements:\n- " + "\n- ".join(a.get('requirements', []) or [])
-            for a in self.current_amendments
-        ])
+        amendment_blocks = []
+        for a in self.current_amendments:
+            block = f"### {a['title']}\nSummary: {a.get('summary','')}\nRequirements:\n- " + "\n- ".join(a.get('requirements', []) or [])
+            excerpt = self._regulation_excerpt(a)
+            if excerpt:
+                block += f"\nRegulation text:\n{excerpt}"
+            amendment_blocks.append(block)
+        amendments_text = "\n\n".join(amendment_blocks)
 
         prompt = (
             "You are a compliance auditor and persuasive report writer.\n\n"
             "Given the relevant regulatory amendments and the company's submitted documents, assess compliance.\n\n"
-            "Amendments:\n" + amendments_text + "\n\n"
-            "Company Documents (text extracts):\n" + docs_block + "\n\n"
+            "Amendments (regulation text excerpts are prefixed with their [page | section]):\n" + amendments_text + "\n\n"
+            "Company Documents (relevant excerpts, each prefixed with its [page | section]):\n" + docs_block + "\n\n"
             "Instructions:\n"
             "1. For each amendment, evaluate whether the documents demonstrate compliance.\n"
-            "2. Extract brief quotes with page indicators or surrounding context (e.g., \"...\") that show current practices; provide at least 2-3 evidence items if available.\n"
+            "2. Extract brief quotes that show current practices and cite the bracketed page/section indicator that precedes each excerpt (e.g., \"...\" [p. 3 | Regulation 2.3.1]); provide at least 2-3 evidence items if available.\n"
+            "   Cite the amendment clause each finding rests on the same way, from its regulation text excerpts, in \"regulation_refs\".\n"
             "3. If non-compliant or unclear, specify exactly what is missing and provide step-by-step corrective actions (who, what, artifacts, sign-offs).\n"
             "4. Capture any explicit deadlines found in either the amendment text or company documents. Avoid \"Unknown\" when phrases like \"within 30 days\" or \"by 31st March\" exist—normalize to YYYY-MM-DD when possible; otherwise include raw text.\n"
             "5. Classify urgency realistically (Critical/High/Medium/Low) based on deadline proximity and risk.\n"
@@ -504,7 +722,8 @@ class AmendmentAnalyzer:
             "      \"amendment_title\": \"...\",\n"
             "      \"status\": \"compliant|non_compliant|unclear\",\n"
             "      \"current_practices\": [\"what company appears to be doing now\"],\n"
-            "      \"evidence\": [\"brief quotes + page/context\"],\n"
+            "      \"evidence\": [\"brief quote [p. N | section]\"],\n"
+            "      \"regulation_refs\": [\"amendment clause [p. N | section]\"],\n"
             "      \"gaps\": [\"what is the company having right now which is wrong\"],\n"
             "      \"actions\": [\"specific, step-by-step corrective tasks\"],\n"
             "      \"last_date\": \"YYYY-MM-DD or Unknown\",\n"
@@ -524,6 +743,7 @@ class AmendmentAnalyzer:
                         "status": "unclear",
                         "current_practices": [],
                         "evidence": [],
+                        "regulation_refs": [],
                         "gaps": [],
                         "actions": [],
                         "last_date": "Unknown",
@@ -536,9 +756,8 @@ class AmendmentAnalyzer:
             self._write_json(f"{stage_name.lower()}_doc_compliance.json", result)
             return result
 
-        response = self.call_groq(prompt, model=MODEL_COMPLIANCE)
         try:
-            result = json.loads(self._strip_to_json(response))
+            result = self.call_groq_json(prompt, MODEL_COMPLIANCE, ("document_compliance",))
             if isinstance(result, list):
                 result = {"document_compliance": result}
             self._write_json(f"{stage_name.lower()}_doc_compliance.json", result)
@@ -650,9 +869,8 @@ class AmendmentAnalyzer:
             self._write_json("stage5_final_report.json", report)
             return report
 
-        response = self.call_groq(prompt, model=MODEL_OPTIMIZE)
         try:
-            result = json.loads(self._strip_to_json(response))
+            result = self.call_groq_json(prompt, MODEL_OPTIMIZE, ("compliance_report", "by_amendment"))
             if isinstance(result, list):
                 result = {"compliance_report": {"by_amendment": result}}
             # Ensure required fields exist for frontend consumption
@@ -703,112 +921,155 @@ class AmendmentAnalyzer:
             self.log_stage("ERROR", "Failed to parse final report JSON")
             raise
 
-    def run_full_chain(self, company_data: Dict, uploads_dir: str) -> Dict:
-        """Execute the required 5-stage pipeline using filtered amendments from filtered_amms folder."""
-        self.log_stage("START", f"Beginning analysis for {company_data.get('name','Company')}")
+    def amendment_inputs(self, filtered_amendments: List[Dict]) -> List[Dict]:
+        """Turn filtered amendment metadata into Stage 1 inputs with English-only text."""
+        amendments = []
+        for amendment in filtered_amendments:
+            pdf_path = amendment.get("pdf_path")
+            if pdf_path and os.path.exists(pdf_path):
+                # English-only text, parsing pages only until the Stage 1 budget is met
+                text = extract_english_text(pdf_path, AMENDMENT_CONTEXT_CHARS)
+                amendments.append({
+                    "title": amendment.get("title", "Untitled"),
+                    "date": amendment.get("date", ""),
+                    "content": text or "",
+                    "source_path": pdf_path,
+                    "source": amendment.get("source", "Unknown"),
+                    "document_id": amendment_id(amendment),
+                })
+            else:
+                self.log_stage("WARNING", f"PDF path not found for amendment: {amendment.get('title')}")
+        return amendments
 
-        # Load filtered amendments from backend/data/filtered_amms/
-        from vigilo_utils import get_latest_filtered_amendments
-        filtered_amendments = get_latest_filtered_amendments()
+    def load_amendments(self) -> List[Dict]:
+        """Load the filtered amendments (falling back to the raw PDFs directory) as Stage 1 inputs."""
+        with self.tracer.span("LOAD AMENDMENTS"):
+            # This company's current filtered set (see filtered_store)
+            from vigilo_utils import get_latest_filtered_amendments
+            filtered_amendments = get_latest_filtered_amendments(self.company_id)
         
-        if not filtered_amendments:
-            self.log_stage("WARNING", "No filtered amendments found. Falling back to raw PDFs directory.")
-            # Fallback to original behavior
-            pdfs_dir = os.path.join(backend_dir, "data", "pdfs")
-            amendments = self._load_pdf_dicts_from_dir(pdfs_dir, limit=6)
-        else:
-            self.log_stage("INFO", f"Loaded {len(filtered_amendments)} filtered amendments")
-            # Extract text from the PDF paths in filtered amendments
-            amendments = []
-            for amendment in filtered_amendments:
-                pdf_path = amendment.get("pdf_path")
-                if pdf_path and os.path.exists(pdf_path):
-                    text = extract_text_from_file(pdf_path)
-                    # Filter out Hindi content
-                    text = self._filter_hindi_content(text)
-                    amendments.append({
-                        "title": amendment.get("title", "Untitled"),
-                        "date": amendment.get("date", ""),
-                        "content": text or "",
-                        "source_path": pdf_path,
-                        "source": amendment.get("source", "Unknown"),
-                        "document_id": amendment.get("document_id", "")
-                    })
-                else:
-                    self.log_stage("WARNING", f"PDF path not found for amendment: {amendment.get('title')}")
+            if not filtered_amendments:
+                self.log_stage("WARNING", "No filtered amendments found. Falling back to raw PDFs directory.")
+                # Fallback to original behavior
+                pdfs_dir = os.path.join(backend_dir, "data", "pdfs")
+                amendments = self._load_pdf_dicts_from_dir(pdfs_dir, limit=6)
+            else:
+                self.log_stage("INFO", f"Loaded {len(filtered_amendments)} filtered amendments")
+                amendments = self.amendment_inputs(filtered_amendments)
 
         self._write_json("inputs_amendments.json", {"amendments": amendments})
+        return amendments
 
-        # Split into 3 agents for analysis
-        agent_count = 3
-        amendments_per_agent = len(amendments) // agent_count
-        remainder = len(amendments) % agent_count
-        
-        agent_batches = []
+    def analyze_amendments(self, amendments: List[Dict]) -> List[Dict]:
+        """Stage 1: summarize amendments with three agents (one model each). Inputs are split
+        evenly across the agents, and into more prompts of at most STAGE1_BATCH_SIZE amendments
+        (agents taking turns) when there are more than three prompts' worth."""
+        agent_models = [MODEL_ANALYSIS_A, MODEL_ANALYSIS_B, "openai/gpt-oss-20b"]  # Third agent
+        agent_count = len(agent_models)
+        batch_count = max(agent_count, -(-len(amendments) // max(1, STAGE1_BATCH_SIZE)))
+        amendments_per_batch = len(amendments) // batch_count
+        remainder = len(amendments) % batch_count
+
+        batches = []
         start = 0
-        for i in range(agent_count):
-            end = start + amendments_per_agent + (1 if i < remainder else 0)
-            agent_batches.append(amendments[start:end])
+        for i in range(batch_count):
+            end = start + amendments_per_batch + (1 if i < remainder else 0)
+            if end > start:
+                label = f"STAGE 1-AGENT{i % agent_count + 1}"
+                if batch_count > agent_count:
+                    label += f"-BATCH{i + 1}"
+                batches.append((label, agent_models[i % agent_count], amendments[start:end]))
             start = end
 
-        # Stage 1: Three agents analyzing amendments in parallel
-        analyzed_batches = []
-        agent_models = [MODEL_ANALYSIS_A, MODEL_ANALYSIS_B, "openai/gpt-oss-20b"]  # Third agent
-        
-        for i, batch in enumerate(agent_batches):
-            if not batch:
-                continue
-                
-            stage_label = f"STAGE 1-AGENT{i+1}"
+        def run(label: str, model: str, batch: List[Dict]) -> List[Dict]:
             try:
-                analyzed = self.analyze_amendments_batch(batch, stage_label=stage_label, model=agent_models[i])
-                analyzed_batches.extend(analyzed)
+                with self.tracer.span(label, amendments=len(batch)):
+                    return self.analyze_amendments_batch(batch, stage_label=label, model=model)
             except Exception as e:
-                self.log_stage(stage_label, f"Error: {e}. Proceeding with naive summaries.")
+                self.log_stage(label, f"Error: {e}. Proceeding with naive summaries.")
                 naive_batch = [{
                     "title": a.get("title", "Untitled"),
                     "summary": (a.get("content", "")[:200] + "...") if a.get("content") else a.get("title", ""),
                     "requirements": [],
                     "affected_businesses": [],
-                    "impact": "Medium"
+                    "impact": "Medium",
+                    "document_id": a.get("document_id", ""),
                 } for a in batch]
-                analyzed_batches.extend(naive_batch)
-                self._write_json(f"stage_1_agent{i+1}_summaries.json", {"amendments": naive_batch})
+                name = label.lower().replace(" ", "_").replace("-", "_")
+                self._write_json(f"{name}_summaries.json", {"amendments": naive_batch})
+                return naive_batch
+
+        # Prompts run in parallel; summaries are merged back in input order
+        analyzed_batches = []
+        with ThreadPoolExecutor(max_workers=max(1, min(STAGE1_PARALLEL, len(batches) or 1))) as executor:
+            for analyzed in executor.map(lambda b: run(*b), batches):
+                analyzed_batches.extend(analyzed)
 
-        self.current_amendments = analyzed_batches
         self._write_json("stage1_combined_summaries.json", {"amendments": analyzed_batches})
+        return analyzed_batches
+
+    def run_full_chain(self, company_data: Dict, uploads_dir: str,
+                       analyzed_amendments: Optional[List[Dict]] = None) -> Dict:
+        """Execute the required 5-stage pipeline using the company's filtered amendments.
+        Batch runs pass `analyzed_amendments` (Stage 1 output shared across companies) to skip Stage 1."""
+        self.log_stage("START", f"Beginning analysis for {company_data.get('name','Company')}")
+
+        if analyzed_amendments is None:
+            amendments = self.load_amendments()
+            self.current_amendments = self.analyze_amendments(amendments)
+            amendments_count = len(amendments)
+        else:
+            self.log_stage("STAGE 1", f"Using {len(analyzed_amendments)} shared amendment summaries")
+            self.current_amendments = list(analyzed_amendments)
+            amendments_count = len(analyzed_amendments)
+            self._write_json("stage1_combined_summaries.json", {"amendments": self.current_amendments, "shared": True})
 
         # Stage 2: Filter by company profile
         try:
-            self.filter_by_company_profile(company_data)
+            with self.tracer.span("STAGE 2", amendments=len(self.current_amendments)):
+                self.filter_by_company_profile(company_data)
         except Exception as e:
             self.log_stage("STAGE 2", f"Error: {e}. Keeping all amendments as relevant.")
             self._write_json("stage2_relevant_amendments.json", {"amendments": self.current_amendments})
 
-        # Prepare company documents from uploads_dir
-        upload_paths = AmendmentAnalyzer._first_n_pdfs_from(uploads_dir, limit=5)
-        upload_texts: List[Tuple[str, str]] = []
-        for p in upload_paths:
-            text = extract_text_from_file(p) or ""
-            # Filter out Hindi content from company documents too
-            text = self._filter_hindi_content(text)
-            upload_texts.append((os.path.basename(p), text))
-        
-        self._write_json("inputs_company_uploads.json", {"files": [u[0] for u in upload_texts]})
+        with self.tracer.span("LOAD UPLOADS") as span:
+            query = self._evidence_query()
+            upload_texts: List[Tuple[str, str]] = []
+            # Packaging label photos/scans (OCR'd, cached by image hash) are checked in Stage 4
+            label_texts: List[Tuple[str, str]] = []
+            # The company's own legal documents and labels, pre-extracted at submission time
+            stored_docs = load_company_documents(self.company_id) if self.company_id else []
+            span["attributes"]["source"] = "company_store" if stored_docs else "uploads_dir"
+            for doc in stored_docs:
+                if doc.kind == "legal" and len(upload_texts) < 5:
+                    upload_texts.append((doc.name, self._stored_evidence(doc, query)))
+                elif doc.kind == "label":
+                    text = self._stored_evidence(doc, query)
+                    if text:
+                        label_texts.append((doc.name, text))
+            if not stored_docs:
+                # No submitted documents on record (e.g. the demo below): first PDFs in uploads_dir
+                for p in AmendmentAnalyzer._first_n_pdfs_from(uploads_dir, limit=5):
+                    upload_texts.append((os.path.basename(p), self._document_evidence(p, query)))
+
+        self._write_json("inputs_company_uploads.json", {"files": [u[0] for u in upload_texts],
+                                                         "labels": [l[0] for l in label_texts]})
 
         # Stage 3: first 2 documents
         first2 = upload_texts[:2]
         try:
-            stage3_res = self.check_documents_against_amendments(first2, stage_name="STAGE 3")
+            with self.tracer.span("STAGE 3", documents=len(first2)):
+                stage3_res = self.check_documents_against_amendments(first2, stage_name="STAGE 3")
         except Exception as e:
             self.log_stage("STAGE 3", f"Error: {e}. Using empty compliance list.")
             stage3_res = {"document_compliance": []}
             self._write_json("stage3_doc_compliance.json", stage3_res)
 
         # Stage 4: next 3 documents
-        next3 = upload_texts[2:5]
+        next3 = upload_texts[2:5] + label_texts
         try:
-            stage4_res = self.check_documents_against_amendments(next3, stage_name="STAGE 4")
+            with self.tracer.span("STAGE 4", documents=len(next3)):
+                stage4_res = self.check_documents_against_amendments(next3, stage_name="STAGE 4")
         except Exception as e:
             self.log_stage("STAGE 4", f"Error: {e}. Using empty compliance list.")
             stage4_res = {"document_compliance": []}
@@ -816,7 +1077,8 @@ class AmendmentAnalyzer:
 
         # Stage 5: aggregate
         try:
-            final_report = self.aggregate_reports(stage3_res, stage4_res)
+            with self.tracer.span("STAGE 5"):
+                final_report = self.aggregate_reports(stage3_res, stage4_res)
         except Exception as e:
             self.log_stage("STAGE 5", f"Error: {e}. Building heuristic final report.")
             combined = (stage3_res.get("document_compliance", []) or []) + (stage4_res.get("document_compliance", []) or [])
@@ -831,13 +1093,17 @@ class AmendmentAnalyzer:
             self._write_json("stage5_final_report.json", final_report)
 
         self._write_json("analysis_steps.json", self.stage_outputs)
+        telemetry = self.tracer.summary()
+        self._write_json("telemetry_summary.json", telemetry)
         self.log_stage("COMPLETE", "Analysis finished successfully")
 
         return {
-            "logs_dir": self.log_dir,
+            "run_id": self.run_id,
+            "run_log": self.run.path,
             "analysis_steps": self.stage_outputs,
-            "amendments_count": len(amendments),
+            "amendments_count": amendments_count,
             "final_report": final_report,
+            "telemetry": telemetry,
         }
 
 # Example Usage
@@ -0,0 +1,396 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from atomic_store import read_json, write_json
+
+"""Quantized, memory-mapped vector index (alternative to Chroma's in-RAM float32 HNSW).
+
+Selected with VIGILO_VECTOR_ENGINE=int8|binary (default chroma). Per collection, under
+<persist_dir>/quantized/<collection>/g<generation>/:
+
+  codes.bin     int8 codes, one byte per dimension with a per-vector scale (int8), or sign bits
+                packed eight dimensions per byte (binary)
+  scales.f32    per-vector int8 scale
+  norms.f32     squared L2 norm per vector
+  vectors.f32   full-precision vectors, only read for re-ranking
+  rows.sqlite3  id, text and metadata per row position (deleted rows are simply absent)
+
+All arrays are memory-mapped, so only the codes (about 1/4 of float32 for int8, 1/32 for binary)
+need to stay resident; a search scans them for k * oversample candidates and re-ranks those with
+exact squared L2 distances from vectors.f32, the same metric as the Chroma collections.
+
+Writes append rows and delete superseded ones from rows.sqlite3. persist() compacts into a new
+generation once dead rows pass COMPACT_DEAD_RATIO; <collection>/CURRENT names the live
+generation, and the previous one is kept so readers still holding it keep working until they
+reopen (after the writer's persist marker, see worker_role.SharedVectorStore).
+
+The store implements the part of the LangChain vector-store / Chroma collection interface that
+VectorRegistry uses, so it plugs in behind the same registry.
+
+Configuration (environment):
+  VIGILO_VECTOR_ENGINE      chroma (default), int8 or binary
+  VIGILO_VECTOR_OVERSAMPLE  candidates re-ranked per result (default 8 for int8, 32 for binary)
+"""
+
+try:
+    import numpy as np
+except ImportError:  # optional: only the quantized engines need it
+    np = None
+
+MODES = ("int8", "binary")
+DEFAULT_OVERSAMPLE = {"int8": 8, "binary": 32}
+# Rows scored per block when scanning codes
+SCAN_BLOCK = 65536
+COMPACT_DEAD_RATIO = 0.2
+FILTER_CACHE_SIZE = 64
+SEED_BATCH = 1000
+_OPS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+
+def _where_sql(where: Optional[Dict]) -> Tuple[str, list]:
+    """Chroma `where` clause -> SQL over the JSON metadata column."""
+    if not where:
+        return "1", []
+    clauses, params = [], []
+    for key, cond in where.items():
+        if key in ("$and", "$or"):
+            parts = [_where_sql(c) for c in cond]
+            clauses.append("(" + f" {key[1:].upper()} ".join(p[0] for p in parts) + ")")
+            params.extend(v for p in parts for v in p[1])
+            continue
+        column = "json_extract(metadata, ?)"
+        if not isinstance(cond, dict):
+            cond = {"$eq": cond}
+        for op, value in cond.items():
+            if op in ("$in", "$nin"):
+                marks = ",".join("?" * len(value)) or "NULL"
+                clauses.append(f"{column} {'IN' if op == '$in' else 'NOT IN'} ({marks})")
+                params.extend([f"$.{key}", *value])
+            else:
+                clauses.append(f"{column} {_OPS[op]} ?")
+                params.extend([f"$.{key}", value])
+    return " AND ".join(clauses) or "1", params
+
+
+class QuantizedCollection:
+    """Rows of one collection; method names and results follow chromadb's Collection."""
+
+    def __init__(self, directory: str, mode: str = "int8"):
+        if np is None:
+            raise RuntimeError("the quantized vector engine needs numpy")
+        if mode not in MODES:
+            raise ValueError(f"unknown quantization mode {mode!r} (expected one of {MODES})")
+        self.directory = directory
+        self.mode = mode
+        self._lock = threading.RLock()
+        self._maps: Dict[str, object] = {}
+        self._filter_cache: Dict[str, object] = {}
+        self.generation = int((read_json(os.path.join(directory, "CURRENT"), {}) or {}).get("generation", 0))
+        manifest = read_json(os.path.join(self._gen_dir(), "manifest.json"), {}) or {}
+        self.dim = manifest.get("dim")
+        if manifest.get("mode", mode) != mode:
+            raise ValueError(f"{directory} holds a {manifest['mode']} index, not {mode}")
+
+    # -------- files --------
+
+    def _gen_dir(self, generation: Optional[int] = None) -> str:
+        return os.path.join(self.directory, f"g{self.generation if generation is None else generation}")
+
+    def _path(self, name: str, generation: Optional[int] = None) -> str:
+        return os.path.join(self._gen_dir(generation), name)
+
+    @contextmanager
+    def _connect(self, generation: Optional[int] = None):
+        conn = sqlite3.connect(self._path("rows.sqlite3", generation), timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _init_generation(self, generation: int, dim: int):
+        os.makedirs(self._gen_dir(generation), exist_ok=True)
+        for name in ("codes.bin", "scales.f32", "norms.f32", "vectors.f32"):
+            open(self._path(name, generation), "ab").close()
+        with self._connect(generation) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS rows ("
+                         " pos INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, document TEXT, metadata TEXT)")
+        write_json(self._path("manifest.json", generation), {"dim": dim, "mode": self.mode})
+
+    def _code_width(self) -> int:
+        return self.dim if self.mode == "int8" else (self.dim + 7) // 8
+
+    def _file_rows(self) -> int:
+        try:
+            return os.path.getsize(self._path("norms.f32")) // 4
+        except OSError:
+            return 0
+
+    def _arrays(self) -> Tuple[int, Dict[str, object]]:
+        """(row count, memory maps), remapped when the files have grown."""
+        n = self._file_rows() if self.dim else 0
+        if self._maps.get("n") != n:
+            maps: Dict[str, object] = {"n": n}
+            if n:
+                code_dtype = np.int8 if self.mode == "int8" else np.uint8
+                maps["codes"] = np.memmap(self._path("codes.bin"), dtype=code_dtype, mode="r", shape=(n, self._code_width()))
+                maps["norms"] = np.memmap(self._path("norms.f32"), dtype=np.float32, mode="r", shape=(n,))
+                maps["vectors"] = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r", shape=(n, self.dim))
+                if self.mode == "int8":
+                    maps["scales"] = np.memmap(self._path("scales.f32"), dtype=np.float32, mode="r", shape=(n,))
+            self._maps = maps
+        return n, self._maps
+
+    def _quantize(self, vectors) -> Tuple[object, object]:
+        if self.mode == "binary":
+            return np.packbits(vectors > 0, axis=1), None
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def _changed(self):
+        self._filter_cache = {}
+
+    # -------- chromadb Collection interface --------
+
+    def count(self) -> int:
+        if not self.dim:
+            return 0
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+
+    def upsert(self, ids: Sequence[str], embeddings, documents: Optional[Sequence[str]] = None,
+               metadatas: Optional[Sequence[Dict]] = None):
+        if not ids:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        with self._lock:
+            if not self.dim:
+                self.dim = int(vectors.shape[1])
+                self._init_generation(self.generation, self.dim)
+                write_json(os.path.join(self.directory, "CURRENT"), {"generation": self.generation})
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"embedding dimension {vectors.shape[1]} != index dimension {self.dim}")
+            codes, scales = self._quantize(vectors)
+            start = self._file_rows()
+            # Arrays first: rows appended without a table entry (crash in between) are just dead rows
+            for name, data in (("codes.bin", codes), ("scales.f32", scales), ("vectors.f32", vectors),
+                               ("norms.f32", (vectors * vectors).sum(axis=1).astype(np.float32))):
+                if data is None:
+                    continue
+                with open(self._path(name), "ab") as f:
+                    f.write(np.ascontiguousarray(data).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+            rows = [(start + i, chunk_id, (documents or [None] * len(ids))[i],
+                     json.dumps((metadatas or [None] * len(ids))[i] or {}, ensure_ascii=False))
+                    for i, chunk_id in enumerate(ids)]
+            with self._connect() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany("INSERT OR REPLACE INTO rows (pos, id, document, metadata) VALUES (?,?,?,?)", rows)
+                conn.execute("COMMIT")
+            self._changed()
+
+    add = upsert
+
+    def delete(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict] = None):
+        if not self.dim or (ids is None and where is None):
+            return
+        sql, params = _where_sql(where)
+        if ids is not None:
+            if not ids:
+                return
+            sql += f" AND id IN ({','.join('?' * len(ids))})"
+            params = [*params, *ids]
+        with self._lock, self._connect() as conn:
+            conn.execute(f"DELETE FROM rows WHERE {sql}", params)
+        self._changed()
+
+    def get(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict] = None,
+            include: Sequence[str] = ("metadatas", "documents"), limit: Optional[int] = None,
+            offset: Optional[int] = None) -> Dict:
+        result: Dict[str, list] = {"ids": [], "embeddings": [], "documents": [], "metadatas": []}
+        if not self.dim:
+            return result
+        sql, params = _where_sql(where)
+        if ids is not None:
+            sql += f" AND id IN ({','.join('?' * len(ids)) or 'NULL'})"
+            params = [*params, *ids]
+        sql = f"SELECT pos, id, document, metadata FROM rows WHERE {sql} ORDER BY pos"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params = [*params, -1 if limit is None else limit, offset or 0]
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        result["ids"] = [r[1] for r in rows]
+        if "documents" in include:
+            result["documents"] = [r[2] for r in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [json.loads(r[3] or "{}") for r in rows]
+        if "embeddings" in include and rows:
+            _, maps = self._arrays()
+            result["embeddings"] = [v.tolist() for v in maps["vectors"][[r[0] for r in rows]]]
+        return result
+
+    # -------- search --------
+
+    def _positions(self, where: Optional[Dict], n: int):
+        """Sorted live row positions matching `where` (cached until the next write)."""
+        key = json.dumps(where, sort_keys=True)
+        cached = self._filter_cache.get(key)
+        if cached is not None and cached[0] == n:
+            return cached[1]
+        sql, params = _where_sql(where)
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT pos FROM rows WHERE pos < ? AND {sql} ORDER BY pos", [n, *params]).fetchall()
+        positions = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        if len(self._filter_cache) >= FILTER_CACHE_SIZE:
+            self._filter_cache = {}
+        self._filter_cache[key] = (n, positions)
+        return positions
+
+    def _approx_distances(self, maps: Dict, rows, query) -> object:
+        """Quantized distance proxy for `rows` (a slice or position array); smaller is closer."""
+        codes = maps["codes"][rows]
+        if self.mode == "binary":
+            q_bits = np.packbits(query > 0)
+            return np.unpackbits(np.bitwise_xor(codes, q_bits), axis=1).sum(axis=1, dtype=np.int32).astype(np.float32)
+        # ||x - q||^2 = ||x||^2 - 2 x.q + ||q||^2, with x.q estimated from the int8 codes
+        return maps["norms"][rows] - 2.0 * maps["scales"][rows] * (codes.astype(np.float32) @ query)
+
+    def search(self, embedding: Sequence[float], k: int, where: Optional[Dict] = None,
+               oversample: Optional[int] = None) -> List[Tuple[int, float]]:
+        """(row position, squared L2 distance) of the k nearest rows, exact after re-ranking."""
+        n, maps = self._arrays()
+        if not n or k <= 0:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        positions = self._positions(where, n)
+        if not positions.size:
+            return []
+        wanted = max(k, k * (oversample or DEFAULT_OVERSAMPLE[self.mode]))
+        if positions.size <= wanted:
+            candidates = positions
+        else:
+            full = positions.size == n
+            approx = np.empty(positions.size, dtype=np.float32)
+            for start in range(0, positions.size, SCAN_BLOCK):
+                stop = min(start + SCAN_BLOCK, positions.size)
+                rows = slice(start, stop) if full else positions[start:stop]
+                approx[start:stop] = self._approx_distances(maps, rows, query)
+            candidates = np.sort(positions[np.argpartition(approx, wanted - 1)[:wanted]])
+        diff = maps["vectors"][candidates] - query
+        exact = np.einsum("ij,ij->i", diff, diff)
+        order = np.argsort(exact)[:k]
+        return [(int(candidates[i]), float(exact[i])) for i in order]
+
+    def rows_at(self, positions: Sequence[int]) -> Dict[int, Tuple[str, str, Dict]]:
+        """pos -> (id, text, metadata)"""
+        if not positions:
+            return {}
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT pos, id, document, metadata FROM rows WHERE pos IN"
+                                f" ({','.join('?' * len(positions))})", list(positions)).fetchall()
+        return {r[0]: (r[1], r[2] or "", json.loads(r[3] or "{}")) for r in rows}
+
+    # -------- maintenance --------
+
+    def dead_ratio(self) -> float:
+        total = self._file_rows() if self.dim else 0
+        return 1.0 - self.count() / total if total else 0.0
+
+    def compact(self):
+        """Rewrite live rows into a new generation and switch CURRENT to it."""
+        with self._lock:
+            if not self.dim:
+                return
+            n, maps = self._arrays()
+            new_gen = self.generation + 1
+            shutil.rmtree(self._gen_dir(new_gen), ignore_errors=True)
+            self._init_generation(new_gen, self.dim)
+            with self._connect() as conn:
+                rows = conn.execute("SELECT pos, id, document, metadata FROM rows WHERE pos < ? ORDER BY pos",
+                                    (n,)).fetchall()
+            names = ["codes", "norms", "vectors"] + (["scales"] if self.mode == "int8" else [])
+            files = {"codes": "codes.bin", "norms": "norms.f32", "vectors": "vectors.f32", "scales": "scales.f32"}
+            for name in names:
+                with open(self._path(files[name], new_gen), "wb") as f:
+                    for start in range(0, len(rows), SCAN_BLOCK):
+                        block = [r[0] for r in rows[start:start + SCAN_BLOCK]]
+                        f.write(np.ascontiguousarray(maps[name][block]).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+            with self._connect(new_gen) as conn:
+                conn.execute("BEGIN")
+                conn.executemany("INSERT INTO rows (pos, id, document, metadata) VALUES (?,?,?,?)",
+                                 [(i, r[1], r[2], r[3]) for i, r in enumerate(rows)])
+                conn.execute("COMMIT")
+            write_json(os.path.join(self.directory, "CURRENT"), {"generation": new_gen})
+            old = self.generation
+            self.generation, self._maps = new_gen, {}
+            self._changed()
+            # Keep the previous generation for readers that have not reopened yet
+            for entry in os.listdir(self.directory):
+                if entry.startswith("g") and entry[1:].isdigit() and int(entry[1:]) < old:
+                    shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
+            print(f"Quantized index {os.path.basename(self.directory)}: compacted {n} -> {len(rows)} rows")
+
+
+class QuantizedVectorStore:
+    """LangChain-style vector store over a QuantizedCollection (the subset VectorRegistry uses)."""
+
+    def __init__(self, collection_name: str, persist_directory: str, embedding_function, mode: str = "int8",
+                 oversample: Optional[int] = None, seed: Optional[Callable[[], object]] = None):
+        """`seed` returns a chromadb collection to import (with its stored embeddings) while this
+        index is still empty, e.g. the Chroma collection of the same name when switching engines."""
+        self.embeddings = embedding_function
+        self.oversample = oversample
+        self._collection = QuantizedCollection(os.path.join(persist_directory, "quantized", collection_name), mode)
+        if seed is not None and not self._collection.count():
+            self._import(seed)
+
+    def _import(self, seed: Callable[[], object]):
+        try:
+            source = seed()
+            total = source.count()
+        except Exception as e:
+            print(f"Quantized index: nothing to import ({e})")
+            return
+        for offset in range(0, total, SEED_BATCH):
+            batch = source.get(include=["embeddings", "documents", "metadatas"], limit=SEED_BATCH, offset=offset)
+            self._collection.upsert(batch["ids"], batch["embeddings"], batch["documents"], batch["metadatas"])
+        if total:
+            print(f"Quantized index {os.path.basename(self._collection.directory)}: imported {total} vectors")
+
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None) -> List[str]:
+        if not documents:
+            return []
+        ids = ids or [f"{d.metadata.get('document_id', '')}:{d.metadata.get('chunk', i)}" for i, d in enumerate(documents)]
+        texts = [d.page_content for d in documents]
+        self._collection.upsert(ids, self.embeddings.embed_documents(texts), texts, [d.metadata for d in documents])
+        return ids
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[Dict] = None,
+                                     **kwargs) -> List[Tuple[Document, float]]:
+        hits = self._collection.search(self.embeddings.embed_query(query), k, where=filter, oversample=self.oversample)
+        rows = self._collection.rows_at([pos for pos, _ in hits])
+        return [(Document(page_content=rows[pos][1], metadata=rows[pos][2]), distance)
+                for pos, distance in hits if pos in rows]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict] = None, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs):
+        self._collection.delete(ids=ids)
+
+    def persist(self):
+        if self._collection.dead_ratio() > COMPACT_DEAD_RATIO:
+            self._collection.compact()
@@ -0,0 +1,236 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+"""Compressed run-artifact store for analyzer runs.
+
+Each run is one gzip JSONL file, data/logs/<company_id>/<run_id>.jsonl.gz. Every record (stage
+artifact, trace span, log line) is appended as its own gzip member, so the file is always readable
+up to the last completed write, even after a crash. Large strings inside artifacts (amendment
+texts, document excerpts) are replaced by {"$blob": sha256} references into a shared content-hash
+store, data/logs/_blobs, so text repeated across runs is stored once.
+
+Retention (environment): runs older than VIGILO_LOG_RETENTION_DAYS (default 30), or beyond the
+newest VIGILO_LOG_KEEP_RUNS per company (default 50), are deleted; blobs no longer referenced by
+any run are then garbage-collected. Pruning runs at most once per VIGILO_LOG_PRUNE_INTERVAL
+seconds (default 3600) per process, in a background thread.
+"""
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOG_ROOT = os.path.join(BASE_DIR, "data", "logs")
+BLOB_DIR = os.path.join(LOG_ROOT, "_blobs")
+RUN_SUFFIX = ".jsonl.gz"
+# Strings at least this long are moved to the blob store
+BLOB_MIN_CHARS = 2048
+
+RETENTION_DAYS = float(os.getenv("VIGILO_LOG_RETENTION_DAYS", "30"))
+KEEP_RUNS = int(os.getenv("VIGILO_LOG_KEEP_RUNS", "50"))
+PRUNE_INTERVAL_S = float(os.getenv("VIGILO_LOG_PRUNE_INTERVAL", "3600"))
+
+_prune_lock = threading.Lock()
+_last_prune = 0.0
+
+
+def _blob_path(sha: str) -> str:
+    return os.path.join(BLOB_DIR, sha[:2], f"{sha}.gz")
+
+
+def put_blob(text: str) -> str:
+    """Store `text` once under its sha256; returns the hash."""
+    data = text.encode("utf-8")
+    sha = hashlib.sha256(data).hexdigest()
+    path = _blob_path(sha)
+    try:
+        # Reused blob: refresh its mtime, since pruning spares recently touched blobs that a run
+        # may be about to reference
+        os.utime(path)
+        return sha
+    except OSError:
+        pass  # not stored yet (or pruned just now)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with gzip.open(tmp, "wb", compresslevel=6) as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return sha
+
+
+def get_blob(sha: str) -> Optional[str]:
+    try:
+        with gzip.open(_blob_path(sha), "rb") as f:
+            return f.read().decode("utf-8")
+    except OSError:
+        return None
+
+
+def _externalize(value: Any, refs: set) -> Any:
+    if isinstance(value, str):
+        if len(value) >= BLOB_MIN_CHARS:
+            sha = put_blob(value)
+            refs.add(sha)
+            return {"$blob": sha}
+        return value
+    if isinstance(value, dict):
+        return {k: _externalize(v, refs) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_externalize(v, refs) for v in value]
+    return value
+
+
+def _resolve(value: Any) -> Any:
+    if isinstance(value, dict):
+        if len(value) == 1 and "$blob" in value:
+            return get_blob(value["$blob"])
+        return {k: _resolve(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_resolve(v) for v in value]
+    return value
+
+
+class RunWriter:
+    """Append-only writer for one run's records."""
+
+    def __init__(self, company_id: str, run_id: str, root: str = LOG_ROOT):
+        self.company_id = company_id
+        self.run_id = run_id
+        self.path = os.path.join(root, company_id, f"{run_id}{RUN_SUFFIX}")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._append({"type": "run", "company_id": company_id, "run_id": run_id})
+
+    def _append(self, record: Dict):
+        record.setdefault("time", time.time())
+        line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        with self._lock:
+            with open(self.path, "ab") as f:
+                f.write(gzip.compress(line, compresslevel=6))
+
+    def write_artifact(self, name: str, data: Any):
+        refs: set = set()
+        body = _externalize(data, refs)
+        self._append({"type": "artifact", "name": name, "data": body, "blobs": sorted(refs)})
+
+    def write_span(self, span: Dict):
+        self._append({"type": "span", "span": span})
+
+    def write_log(self, stage: str, message: str):
+        self._append({"type": "log", "stage": stage, "message": message})
+
+
+# -------- reader API --------
+
+def run_path(company_id: str, run_id: str, root: str = LOG_ROOT) -> str:
+    return os.path.join(root, company_id, f"{run_id}{RUN_SUFFIX}")
+
+
+def iter_records(path: str) -> Iterator[Dict]:
+    """Records of a run file in write order; a torn final write (crash) is ignored."""
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    except (EOFError, gzip.BadGzipFile, json.JSONDecodeError) as e:
+        print(f"Warning: run log {path} is truncated: {e}")
+
+
+def list_runs(company_id: Optional[str] = None, root: str = LOG_ROOT) -> List[Dict]:
+    """[{company_id, run_id, path, bytes, modified}] newest first."""
+    runs = []
+    if company_id:
+        companies = [company_id]
+    elif os.path.isdir(root):
+        companies = [d for d in os.listdir(root) if not d.startswith("_") and os.path.isdir(os.path.join(root, d))]
+    else:
+        companies = []
+    for cid in companies:
+        company_dir = os.path.join(root, cid)
+        if not os.path.isdir(company_dir):
+            continue
+        for entry in os.scandir(company_dir):
+            if entry.is_file() and entry.name.endswith(RUN_SUFFIX):
+                st = entry.stat()
+                runs.append({"company_id": cid, "run_id": entry.name[:-len(RUN_SUFFIX)], "path": entry.path,
+                             "bytes": st.st_size, "modified": st.st_mtime})
+    runs.sort(key=lambda r: r["modified"], reverse=True)
+    return runs
+
+
+def read_run(company_id: str, run_id: str, resolve_blobs: bool = True, root: str = LOG_ROOT) -> Dict:
+    """{"artifacts": {name: data}, "spans": [...], "logs": [...]} for one run (later artifacts with
+    the same name replace earlier ones)."""
+    out: Dict = {"company_id": company_id, "run_id": run_id, "artifacts": {}, "spans": [], "logs": []}
+    for record in iter_records(run_path(company_id, run_id, root)):
+        kind = record.get("type")
+        if kind == "artifact":
+            out["artifacts"][record["name"]] = _resolve(record["data"]) if resolve_blobs else record["data"]
+        elif kind == "span":
+            out["spans"].append(record["span"])
+        elif kind == "log":
+            out["logs"].append(record)
+    return out
+
+
+def read_artifact(company_id: str, run_id: str, name: str, root: str = LOG_ROOT) -> Optional[Any]:
+    """Latest version of one artifact (e.g. "stage1_combined_summaries.json") from a run, or None."""
+    found = None
+    for record in iter_records(run_path(company_id, run_id, root)):
+        if record.get("type") == "artifact" and record.get("name") == name:
+            found = record["data"]
+    return _resolve(found) if found is not None else None
+
+
+# -------- retention --------
+
+def prune_runs(retention_days: float = RETENTION_DAYS, keep_runs: int = KEEP_RUNS, root: str = LOG_ROOT) -> Dict:
+    """Delete expired/excess runs, then blobs no run references any more."""
+    cutoff = time.time() - retention_days * 86400
+    removed_runs = 0
+    per_company: Dict[str, int] = {}
+    for run in list_runs(root=root):
+        per_company[run["company_id"]] = per_company.get(run["company_id"], 0) + 1
+        if run["modified"] < cutoff or per_company[run["company_id"]] > keep_runs:
+            try:
+                os.remove(run["path"])
+                removed_runs += 1
+            except OSError:
+                pass
+
+    referenced = set()
+    for run in list_runs(root=root):
+        for record in iter_records(run["path"]):
+            referenced.update(record.get("blobs") or [])
+    removed_blobs = 0
+    blob_dir = os.path.join(root, "_blobs")
+    if os.path.isdir(blob_dir):
+        for dirpath, _, files in os.walk(blob_dir):
+            for fname in files:
+                path = os.path.join(dirpath, fname)
+                # Skip blobs written or reused in the last hour: a run may be about to reference them
+                if fname.endswith(".gz") and fname[:-3] not in referenced and os.path.getmtime(path) < time.time() - 3600:
+                    os.remove(path)
+                    removed_blobs += 1
+    if removed_runs or removed_blobs:
+        print(f"Run store: pruned {removed_runs} run(s) and {removed_blobs} blob(s)")
+    return {"runs": removed_runs, "blobs": removed_blobs}
+
+
+def maybe_prune_async():
+    """Start a background prune if none ran in the last PRUNE_INTERVAL_S seconds."""
+    global _last_prune
+    with _prune_lock:
+        if time.time() - _last_prune < PRUNE_INTERVAL_S:
+            return
+        _last_prune = time.time()
+
+    def _run():
+        try:
+            prune_runs()
+        except Exception as e:
+            print(f"Warning: run store pruning failed: {e}")
+
+    threading.Thread(target=_run, name="run-store-prune", daemon=True).start()
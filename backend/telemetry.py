@@ -0,0 +1,264 @@
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+"""Structured spans and Prometheus metrics for the prompt chain.
+
+Every AmendmentAnalyzer run owns a Tracer that appends one record per finished span
+(stage or LLM call) to the run's compressed log (see run_store). The same measurements are
+aggregated into a process-wide registry that main.py exposes at /metrics in the Prometheus
+text exposition format.
+"""
+
+# Approximate Groq list prices in USD per 1M tokens: (prompt, completion)
+MODEL_PRICING: Dict[str, Tuple[float, float]] = {
+    "openai/gpt-oss-20b": (0.10, 0.50),
+    "openai/gpt-oss-120b": (0.15, 0.75),
+    "gemma2-9b-it": (0.20, 0.20),
+    "deepseek-r1-distill-llama-70b": (0.75, 0.99),
+}
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0, 160.0)
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Return the estimated USD cost of a call, 0.0 for models without a known price."""
+    price_in, price_out = MODEL_PRICING.get(model, (0.0, 0.0))
+    return (prompt_tokens * price_in + completion_tokens * price_out) / 1_000_000
+
+
+def usage_to_dict(usage) -> Dict[str, int]:
+    """Normalize a Groq `response.usage` object (or dict) into plain token counts."""
+    if usage is None:
+        return {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    get = usage.get if isinstance(usage, dict) else (lambda k, d=0: getattr(usage, k, d))
+    prompt_tokens = int(get("prompt_tokens", 0) or 0)
+    completion_tokens = int(get("completion_tokens", 0) or 0)
+    total_tokens = int(get("total_tokens", 0) or (prompt_tokens + completion_tokens))
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": total_tokens}
+
+
+# -------- Metrics registry --------
+
+def _label_key(labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = [(k, v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for k, v in pairs]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        # key -> (bucket counts, sum, count)
+        self._values: Dict[Tuple, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            entry = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                for bound, c in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', str(bound)))} {c}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+STAGE_DURATION = Histogram("vigilo_stage_duration_seconds", "Wall time of prompt chain stages")
+LLM_LATENCY = Histogram("vigilo_llm_request_duration_seconds", "Latency of individual LLM calls")
+LLM_REQUESTS = Counter("vigilo_llm_requests_total", "LLM calls by model, stage and outcome")
+LLM_TOKENS = Counter("vigilo_llm_tokens_total", "LLM tokens consumed by model, stage and kind")
+LLM_COST = Counter("vigilo_llm_cost_usd_total", "Estimated LLM spend in USD by model and stage")
+LLM_RETRIES = Counter("vigilo_llm_retries_total", "LLM call retries by model and reason")
+LLM_FALLBACKS = Counter("vigilo_llm_fallbacks_total", "Fallbacks from a stage model to MODEL_DEFAULT")
+LLM_THROTTLES = Counter("vigilo_llm_throttled_total", "HTTP 429 responses received per model")
+LLM_HEDGES = Counter("vigilo_llm_hedged_requests_total", "Hedged duplicate requests by model and winner")
+LLM_CONCURRENCY = Gauge("vigilo_llm_concurrency_limit", "Current AIMD concurrency limit of the Groq pool")
+LLM_TOKENS_AVAILABLE = Gauge("vigilo_llm_bucket_tokens", "Tokens left in the per-model rate-limit bucket")
+
+REGISTRY: List = [STAGE_DURATION, LLM_LATENCY, LLM_REQUESTS, LLM_TOKENS, LLM_COST, LLM_RETRIES, LLM_FALLBACKS,
+                  LLM_THROTTLES, LLM_HEDGES, LLM_CONCURRENCY, LLM_TOKENS_AVAILABLE]
+
+
+def render_metrics() -> str:
+    """Render every registered metric in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def record_llm_call(model: str, stage: str, latency: float, usage=None, outcome: str = "ok") -> Dict[str, float]:
+    """Feed one finished LLM call into the metrics registry and return its token/cost attributes."""
+    tokens = usage_to_dict(usage)
+    cost = estimate_cost(model, tokens["prompt_tokens"], tokens["completion_tokens"])
+    LLM_LATENCY.observe(latency, model=model, stage=stage)
+    LLM_REQUESTS.inc(model=model, stage=stage, outcome=outcome)
+    LLM_TOKENS.inc(tokens["prompt_tokens"], model=model, stage=stage, kind="prompt")
+    LLM_TOKENS.inc(tokens["completion_tokens"], model=model, stage=stage, kind="completion")
+    LLM_COST.inc(cost, model=model, stage=stage)
+    return {**tokens, "cost_usd": cost}
+
+
+# -------- Spans --------
+
+class Tracer:
+    """Collect spans for one analyzer run and pass each finished span to `sink` (the run store)."""
+
+    def __init__(self, sink: Optional[Callable[[Dict], None]] = None, trace_id: Optional[str] = None):
+        self.sink = sink
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.spans: List[Dict] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self) -> List[Dict]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def current_stage(self) -> str:
+        """Name of the innermost open stage span on this thread, or 'unscoped'."""
+        for span in reversed(self._stack()):
+            if span["kind"] == "stage":
+                return span["name"]
+        return "unscoped"
+
+    @contextmanager
+    def span(self, name: str, kind: str = "stage", **attributes):
+        stack = self._stack()
+        span = {
+            "trace_id": self.trace_id,
+            "span_id": uuid.uuid4().hex[:16],
+            "parent_id": stack[-1]["span_id"] if stack else None,
+            "name": name,
+            "kind": kind,
+            "start": time.time(),
+            "attributes": dict(attributes),
+            "events": [],
+            "status": "ok",
+        }
+        stack.append(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span["status"] = "error"
+            span["attributes"]["error"] = str(e)
+            raise
+        finally:
+            span["duration_s"] = round(time.perf_counter() - started, 4)
+            stack.pop()
+            if kind == "stage":
+                STAGE_DURATION.observe(span["duration_s"], stage=name)
+            self._finish(span)
+
+    @staticmethod
+    def add_event(span: Dict, name: str, **attributes):
+        span["events"].append({"name": name, "time": time.time(), **attributes})
+
+    def _finish(self, span: Dict):
+        with self._lock:
+            self.spans.append(span)
+        if not self.sink:
+            return
+        try:
+            self.sink(span)
+        except Exception as e:
+            print(f"Warning: could not write span {span['name']}: {e}")
+
+    def summary(self) -> Dict:
+        """Aggregate finished spans per stage and per model (latency, tokens, cost, retries)."""
+        stages: Dict[str, Dict] = {}
+        models: Dict[str, Dict] = {}
+        with self._lock:
+            spans = list(self.spans)
+        by_id = {s["span_id"]: s for s in spans}
+        for s in spans:
+            if s["kind"] == "stage":
+                st = stages.setdefault(s["name"], {"duration_s": 0.0, "llm_calls": 0, "prompt_tokens": 0,
+                                                   "completion_tokens": 0, "cost_usd": 0.0})
+                st["duration_s"] = round(st["duration_s"] + s["duration_s"], 4)
+            elif s["kind"] == "llm":
+                a = s["attributes"]
+                model = a.get("model", "unknown")
+                m = models.setdefault(model, {"calls": 0, "latency_s": 0.0, "prompt_tokens": 0,
+                                              "completion_tokens": 0, "cost_usd": 0.0,
+                                              "retries": 0, "fallbacks": 0, "errors": 0})
+                m["calls"] += 1
+                m["latency_s"] = round(m["latency_s"] + s["duration_s"], 4)
+                m["prompt_tokens"] += a.get("prompt_tokens", 0)
+                m["completion_tokens"] += a.get("completion_tokens", 0)
+                m["cost_usd"] += a.get("cost_usd", 0.0)
+                m["retries"] += a.get("retries", 0)
+                m["fallbacks"] += sum(1 for e in s["events"] if e["name"] == "fallback")
+                m["errors"] += s["status"] == "error"
+                parent = by_id.get(s["parent_id"])
+                if parent and parent["kind"] == "stage":
+                    st = stages.setdefault(parent["name"], {"duration_s": 0.0, "llm_calls": 0, "prompt_tokens": 0,
+                                                            "completion_tokens": 0, "cost_usd": 0.0})
+                    st["llm_calls"] += 1
+                    st["prompt_tokens"] += a.get("prompt_tokens", 0)
+                    st["completion_tokens"] += a.get("completion_tokens", 0)
+                    st["cost_usd"] += a.get("cost_usd", 0.0)
+        return {"trace_id": self.trace_id, "stages": stages, "models": models}
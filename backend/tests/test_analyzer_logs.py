@@ -0,0 +1,20 @@
+import pytest
+
+pytest.importorskip("groq")
+pytest.importorskip("langchain_community")
+pytest.importorskip("sentence_transformers")
+
+import prompt_chain  # noqa: E402
+from run_store import RunWriter, read_run  # noqa: E402
+
+
+def test_stage_logs_are_persisted_in_the_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(prompt_chain, "maybe_prune_async", lambda: None)
+    monkeypatch.setattr(prompt_chain, "RunWriter", lambda c, r: RunWriter(c, r, root=str(tmp_path)))
+    analyzer = prompt_chain.AmendmentAnalyzer("acme", "run1")
+    analyzer.log_stage("STAGE 2", "Filtering for Acme")
+    analyzer.log_stage("WARNING", "No filtered amendments found")
+
+    logs = read_run("acme", "run1", root=str(tmp_path))["logs"]
+    assert [(r["stage"], r["message"]) for r in logs] == [("STAGE 2", "Filtering for Acme"),
+                                                          ("WARNING", "No filtered amendments found")]
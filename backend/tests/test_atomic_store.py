@@ -0,0 +1,85 @@
+import hashlib
+import json
+import threading
+
+import pytest
+
+from atomic_store import CorruptStoreError, read_json, recover, update_json, write_json
+
+
+def _journal(path, tmp, data):
+    with open(f"{path}.journal", "w") as f:
+        json.dump({"tmp": str(tmp), "sha256": hashlib.sha256(data).hexdigest()}, f)
+
+
+def test_write_and_read_round_trip(tmp_path):
+    path = str(tmp_path / "store.json")
+    assert read_json(path, []) == []
+    write_json(path, [{"a": 1}])
+    assert read_json(path, []) == [{"a": 1}]
+    assert not (tmp_path / "store.json.journal").exists()
+
+
+def test_complete_interrupted_write_is_rolled_forward(tmp_path):
+    path = tmp_path / "store.json"
+    path.write_text("[1]")
+    data = b"[1, 2]"
+    tmp = tmp_path / "store.json.123.tmp"
+    tmp.write_bytes(data)
+    _journal(path, tmp, data)
+
+    assert read_json(str(path)) == [1, 2]
+    assert not tmp.exists() and not (tmp_path / "store.json.journal").exists()
+
+
+def test_incomplete_interrupted_write_is_discarded(tmp_path):
+    path = tmp_path / "store.json"
+    path.write_text("[1]")
+    tmp = tmp_path / "store.json.123.tmp"
+    tmp.write_bytes(b"[1, 2")
+    _journal(path, tmp, b"[1, 2]")
+
+    assert recover(str(path)) is False
+    assert read_json(str(path)) == [1]
+    assert not tmp.exists() and not (tmp_path / "store.json.journal").exists()
+
+
+def test_unreadable_journal_is_dropped(tmp_path):
+    path = tmp_path / "store.json"
+    path.write_text("[1]")
+    (tmp_path / "store.json.journal").write_text("{not json")
+
+    assert read_json(str(path)) == [1]
+    assert not (tmp_path / "store.json.journal").exists()
+
+
+def test_corrupt_file_raises_instead_of_returning_default(tmp_path):
+    path = tmp_path / "store.json"
+    path.write_text('[{"a": 1}, {"a"')
+    with pytest.raises(CorruptStoreError):
+        read_json(str(path), [])
+    with pytest.raises(CorruptStoreError):
+        update_json(str(path), lambda entries: entries + [{"a": 2}], [])
+    # The damaged file is left for inspection, not overwritten
+    assert path.read_text() == '[{"a": 1}, {"a"'
+
+
+def test_empty_file_reads_as_default(tmp_path):
+    path = tmp_path / "store.json"
+    path.write_text("  \n")
+    assert read_json(str(path), {"x": 1}) == {"x": 1}
+
+
+def test_concurrent_updates_do_not_lose_entries(tmp_path):
+    path = str(tmp_path / "store.json")
+
+    def worker(n):
+        for i in range(20):
+            update_json(path, lambda entries: entries + [f"{n}-{i}"], [])
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(read_json(path)) == 80
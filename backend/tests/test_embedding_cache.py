@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+
+import embedding_cache
+from embedding_cache import CachedEmbeddings
+
+
+class _Model:
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [[float(len(t)), 1.0, 0.5, 0.25] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_repeated_texts_reach_the_model_once(tmp_path):
+    model = _Model()
+    cache = CachedEmbeddings(model, "m", str(tmp_path / "e.sqlite3"))
+    first = cache.embed_documents(["a", "bb", "a"])
+    second = cache.embed_documents(["bb", "a"])
+
+    assert model.calls == 1
+    assert second == [first[1], first[0]]
+
+
+def test_eviction_keeps_store_under_budget(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "MEMORY_ITEMS", 1)
+    row = 4 * 2 + embedding_cache.ROW_OVERHEAD
+    cache = CachedEmbeddings(_Model(), "m", str(tmp_path / "e.sqlite3"), max_bytes=10 * row)
+    for i in range(30):
+        cache.embed_documents([f"text {i}"])
+
+    stored = cache.stats()["store"]["entries"]
+    assert 0 < stored <= 10
+    assert cache._approx_bytes == stored * row
@@ -0,0 +1,116 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import ingest_scheduler
+from ingest_scheduler import IngestScheduler
+
+
+def _scheduler(tmp_path, jobs=None):
+    jobs = jobs or {"RBI": lambda: 1, "GST": lambda: 2}
+    return IngestScheduler(jobs, str(tmp_path / "runs.sqlite3"), schedule=False)
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_enqueue_deduplicates_queued_source(tmp_path):
+    sched = _scheduler(tmp_path)
+    first = sched.enqueue("RBI")
+    second = sched.enqueue("RBI")
+    other = sched.enqueue("GST")
+
+    assert first["deduplicated"] is False
+    assert second["deduplicated"] is True and second["run_id"] == first["run_id"]
+    assert other["deduplicated"] is False and other["run_id"] != first["run_id"]
+
+
+def test_enqueue_min_gap_returns_recent_finished_run(tmp_path):
+    sched = _scheduler(tmp_path)
+    run = sched.enqueue("RBI")
+    sched._execute(sched._claim_next())
+
+    assert sched.enqueue("RBI", min_gap_s=3600)["run_id"] == run["run_id"]
+    assert sched.enqueue("RBI")["deduplicated"] is False
+
+
+def test_enqueue_unknown_source(tmp_path):
+    with pytest.raises(KeyError):
+        _scheduler(tmp_path).enqueue("FSSAI")
+
+
+@pytest.mark.skipif(ingest_scheduler.fcntl is None, reason="leader lock needs flock")
+def test_standby_takes_over_and_abandons_running_runs(tmp_path):
+    leader, standby = _scheduler(tmp_path), _scheduler(tmp_path)
+    assert leader._try_lead()
+    assert not standby._try_lead()
+    leader.enqueue("RBI")
+    stuck = leader._claim_next()
+
+    # The leader dies mid-run: its lock goes away with it
+    leader._release_leadership()
+    assert standby._try_lead()
+    standby._become_leader()
+
+    assert standby.history("RBI", 1)[0]["run_id"] == stuck["run_id"]
+    assert standby.history("RBI", 1)[0]["status"] == "abandoned"
+    standby._release_leadership()
+
+
+def test_worker_survives_database_errors(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest_scheduler, "POLL_S", 0.01)
+    done = threading.Event()
+    sched = _scheduler(tmp_path, {"RBI": lambda: done.set() or 1})
+    real_claim, failures = sched._claim_next, []
+
+    def flaky_claim():
+        if not failures:
+            failures.append(1)
+            raise sqlite3.OperationalError("database is locked")
+        return real_claim()
+
+    sched._claim_next = flaky_claim
+    sched.enqueue("RBI")
+    sched.start()
+    try:
+        assert done.wait(5)
+        assert _wait_for(lambda: sched.history("RBI", 1)[0]["status"] == "ok")
+        assert failures and sched._thread.is_alive()
+    finally:
+        sched.stop()
+
+
+@pytest.mark.skipif(ingest_scheduler.fcntl is None, reason="leader lock needs flock")
+def test_worker_exit_releases_leadership(tmp_path):
+    sched, standby = _scheduler(tmp_path), _scheduler(tmp_path)
+    sched.start()
+    assert _wait_for(lambda: sched.is_leader)
+    thread = sched._thread
+    with sched._cond:
+        sched._stopping = True
+        sched._cond.notify_all()
+    thread.join(5)
+
+    assert not sched.is_leader
+    assert standby._try_lead()
+    standby._release_leadership()
+
+
+def test_zero_interval_job_is_trigger_only(tmp_path):
+    sched = IngestScheduler({"RBI": lambda: 1, "LOCAL": lambda: 3}, str(tmp_path / "runs.sqlite3"),
+                            schedule=True, intervals={"LOCAL": 0})
+    next_due = sched._become_leader()
+
+    assert set(next_due) == {"RBI"}
+    run = sched.enqueue("LOCAL", "http")
+    sched._execute(sched._claim_next())
+    last = sched.history("LOCAL", 1)[0]
+    assert (last["run_id"], last["status"], last["new_entries"]) == (run["run_id"], "ok", 3)
@@ -0,0 +1,46 @@
+from json_stream import JsonArrayStream, nest_items
+
+
+def _feed_chars(stream, text):
+    items = []
+    for c in text:
+        items.extend(stream.feed(c))
+    return items
+
+
+def test_items_are_emitted_as_soon_as_complete():
+    stream = JsonArrayStream(("amendments",))
+    assert stream.feed('{"amendments": [{"title": "A", "n": 1},') == [{"title": "A", "n": 1}]
+    assert stream.feed(' {"title": "B"') == []
+    assert stream.feed('}]}') == [{"title": "B"}]
+    assert stream.finished
+
+
+def test_char_by_char_with_nested_arrays_and_escapes():
+    text = '{"amendments": [{"t": "a \\"q\\" ]", "refs": [1, 2]}, {"t": "b"}], "other": [9]}'
+    stream = JsonArrayStream(("amendments",))
+    assert _feed_chars(stream, text) == [{"t": 'a "q" ]', "refs": [1, 2]}, {"t": "b"}]
+
+
+def test_nested_key_path_ignores_other_arrays():
+    text = '{"summary": [0], "compliance_report": {"by_amendment": [{"id": 1}, {"id": 2}]}}'
+    stream = JsonArrayStream(("compliance_report", "by_amendment"), accept_root_array=False)
+    assert stream.feed(text) == [{"id": 1}, {"id": 2}]
+
+
+def test_root_array_scalars_prose_and_think_preamble():
+    stream = JsonArrayStream(("amendments",))
+    text = "<think>pick [7] maybe</think>Here you go:\n```json\n[2, 0, 5]\n```"
+    assert _feed_chars(stream, text) == [2, 0, 5]
+    assert not stream.json_text().startswith("<think>")
+
+
+def test_truncated_reply_keeps_complete_items():
+    stream = JsonArrayStream(("amendments",))
+    stream.feed('{"amendments": [{"title": "A"}, {"title": "B", "desc": "cut of')
+    assert stream.items == [{"title": "A"}]
+    assert not stream.finished
+
+
+def test_nest_items():
+    assert nest_items(("a", "b"), [1]) == {"a": {"b": [1]}}
@@ -0,0 +1,85 @@
+import time
+
+import llm_cache
+from llm_cache import LLMResponseCache
+
+HEADER = "You are a compliance expert. " * 80
+FOOTER = " Return JSON only." * 100
+
+
+def _embed(texts):
+    # Bag-of-letters vectors: prompts with the same long header/footer windows look identical
+    return [[float(t.lower().count(c)) for c in "abcdefghijklmnopqrstuvwxyz"] for t in texts]
+
+
+def _cache(tmp_path, **kwargs):
+    return LLMResponseCache(str(tmp_path / "cache.sqlite3"), embed_fn=_embed, **kwargs)
+
+
+def test_exact_hit_and_miss(tmp_path):
+    cache = _cache(tmp_path)
+    assert cache.get("m", 0.2, "prompt") is None
+    cache.put("m", 0.2, "prompt", "answer", {"prompt_tokens": 10, "completion_tokens": 3})
+    hit = cache.get("m", 0.2, "prompt")
+    assert hit == {"content": "answer", "usage": {"prompt_tokens": 10, "completion_tokens": 3}, "semantic": False}
+    assert cache.get("m", 0.3, "prompt") is None
+    assert cache.get("other", 0.2, "prompt") is None
+    stats = cache.stats()
+    assert stats["session"]["hits"] == 1 and stats["session"]["misses"] == 3
+
+
+def test_semantic_hit_requires_same_payload(tmp_path):
+    cache = _cache(tmp_path)
+    company_a, company_b = "Company: Acme Foods", "Company: Zenith Spices"
+    cache.put("m", 0.2, HEADER + company_a + FOOTER, "answer for A", payload=company_a)
+
+    # Different company behind the same header/footer windows: never a semantic hit
+    assert cache.get("m", 0.2, HEADER + company_b + FOOTER, payload=company_b) is None
+    # Same payload, reworded template: semantic hit
+    hit = cache.get("m", 0.2, HEADER + company_a + FOOTER + " ", payload=company_a)
+    assert hit is not None and hit["semantic"] and hit["content"] == "answer for A"
+
+
+def test_no_semantic_lookup_without_payload(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put("m", 0.2, HEADER + "x" + FOOTER, "answer")
+    assert cache.get("m", 0.2, HEADER + "y" + FOOTER) is None
+
+
+def test_expired_entries_are_ignored(tmp_path):
+    cache = _cache(tmp_path, ttl_s=0.05)
+    cache.put("m", 0.2, "prompt", "answer")
+    time.sleep(0.1)
+    assert cache.get("m", 0.2, "prompt") is None
+
+
+def test_lru_eviction_keeps_recent_entries(tmp_path):
+    cache = _cache(tmp_path, max_bytes=3000)
+    for i in range(10):
+        cache.put("m", 0.2, f"prompt {i}", "x" * 500)
+        time.sleep(0.001)
+    assert cache.get("m", 0.2, "prompt 0") is None
+    assert cache.get("m", 0.2, "prompt 9") is not None
+    assert cache.stats()["store"]["bytes"] <= 3000
+
+
+def test_size_is_tracked_without_rescanning(tmp_path):
+    cache = _cache(tmp_path, max_bytes=10 ** 6)
+    for i in range(5):
+        cache.put("m", 0.2, f"prompt {i}", "x" * 100)
+    assert cache._approx_bytes == cache.stats()["store"]["bytes"] == 500
+
+    # A new process starts from the stored total
+    assert _cache(tmp_path, max_bytes=10 ** 6)._approx_bytes == 500
+
+
+def test_resync_purges_expired_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "SIZE_RESYNC_WRITES", 3)
+    cache = _cache(tmp_path, ttl_s=0.05)
+    cache.put("m", 0.2, "old", "x" * 100)
+    time.sleep(0.1)
+    cache.put("m", 0.2, "new 1", "y" * 100)
+    cache.put("m", 0.2, "new 2", "z" * 100)
+
+    assert cache.stats()["store"]["entries"] == 2
+    assert cache._approx_bytes == 200
@@ -0,0 +1,65 @@
+import threading
+import time
+
+from llm_client import GroqPool
+
+
+class _Raw:
+    def __init__(self, content):
+        self.headers = {}
+        self._content = content
+
+    def parse(self):
+        message = type("Message", (), {"content": self._content})
+        choice = type("Choice", (), {"message": message})
+        return type("Response", (), {"choices": [choice], "usage": None})
+
+
+class _Client:
+    """Fake Groq client: the n-th request sleeps delays[n] seconds before answering."""
+
+    def __init__(self, delays):
+        self.delays = list(delays)
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.chat = self
+        self.completions = self
+        self.with_raw_response = self
+
+    def create(self, **kwargs):
+        with self._lock:
+            n = self.calls
+            self.calls += 1
+        time.sleep(self.delays[min(n, len(self.delays) - 1)])
+        return _Raw(f"reply {n}")
+
+
+def test_hedge_wins_and_loser_slot_is_released():
+    pool = GroqPool(_Client([1.0, 0.0]))
+    result = pool.complete("prompt", "m", hedge_after=0.1)
+    assert result.hedged and result.content == "reply 1"
+    # The slow primary is still in flight but no longer holds a concurrency slot
+    assert pool.limiter.in_flight == 0
+
+
+def test_no_hedge_when_primary_is_fast():
+    client = _Client([0.0])
+    result = GroqPool(client).complete("prompt", "m", hedge_after=0.5)
+    assert not result.hedged and client.calls == 1
+
+
+def test_hedge_timer_starts_after_slot_is_acquired():
+    client = _Client([0.3, 0.0])
+    pool = GroqPool(client, initial_concurrency=1, max_concurrency=1)
+    pool.limiter.acquire()  # someone else holds the only slot for a while
+    threading.Timer(0.5, pool.limiter.release).start()
+    result = pool.complete("prompt", "m", hedge_after=0.4)
+    # 0.5s of queueing did not count: the primary answered 0.3s after it was sent
+    assert not result.hedged and client.calls == 1
+
+
+def test_no_hedge_when_limiter_is_saturated():
+    client = _Client([0.4, 0.0])
+    pool = GroqPool(client, initial_concurrency=1, max_concurrency=1)
+    result = pool.complete("prompt", "m", hedge_after=0.1)
+    assert not result.hedged and client.calls == 1
@@ -0,0 +1,75 @@
+import json
+
+from metadata_index import MetadataIndex, iso_date
+
+
+def _entries(n):
+    return [{"document_id": f"d{i:02d}", "title": f"Notice {i}", "date": f"{1 + i % 28:02d}-0{1 + i % 3}-2025",
+             "source": "RBI" if i % 2 else "FSSAI"} for i in range(n)]
+
+
+def _index(tmp_path, entries):
+    path = tmp_path / "metadata.json"
+    path.write_text(json.dumps(entries))
+    return MetadataIndex({"fssai": str(path)}), path
+
+
+def _page_through(index, **kwargs):
+    seen, cursor = [], None
+    while True:
+        page = index.query("fssai", cursor=cursor, **kwargs)
+        seen.extend(e["document_id"] for e in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return seen
+
+
+def test_iso_date_formats():
+    assert iso_date("14-08-2025") == iso_date("2025-08-14") == iso_date("14/08/2025") == "2025-08-14"
+    assert iso_date("August 2025") == ""
+
+
+def test_cursor_pages_cover_everything_newest_first(tmp_path):
+    entries = _entries(25)
+    index, _ = _index(tmp_path, entries)
+    everything = [e["document_id"] for e in index.query("fssai")["items"]]
+
+    assert _page_through(index, limit=4) == everything
+    assert len(everything) == 25
+    dates = [iso_date(e["date"]) for e in index.query("fssai")["items"]]
+    assert dates == sorted(dates, reverse=True)
+
+
+def test_cursor_is_stable_across_new_ingest(tmp_path):
+    entries = _entries(10)
+    index, path = _index(tmp_path, entries)
+    first = index.query("fssai", limit=3)
+
+    newer = {"document_id": "new", "title": "Newest", "date": "01-12-2025", "source": "RBI"}
+    path.write_text(json.dumps(entries + [newer]))
+    index.add("fssai", [newer], 11)
+    second = index.query("fssai", limit=3, cursor=first["next_cursor"])
+
+    expected = [e["document_id"] for e in index.query("fssai")["items"]][4:7]
+    assert [e["document_id"] for e in second["items"]] == expected
+    assert index.latest("fssai", 1)[0]["document_id"] == "new"
+
+
+def test_filters_and_projection(tmp_path):
+    index, _ = _index(tmp_path, _entries(12))
+    rbi = index.query("fssai", source="rbi", fields=["document_id", "source"])["items"]
+    assert rbi and all(set(e) == {"document_id", "source"} and e["source"] == "RBI" for e in rbi)
+
+    window = index.query("fssai", date_from="2025-02-01", date_to="2025-02-28")["items"]
+    assert window and all("2025-02-01" <= iso_date(e["date"]) <= "2025-02-28" for e in window)
+
+    assert [e["document_id"] for e in index.query("fssai", q="notice 11")["items"]] == ["d11"]
+    assert _page_through(index, limit=2, source="RBI") == [e["document_id"] for e in rbi]
+
+
+def test_file_change_rebuilds_snapshot(tmp_path):
+    index, path = _index(tmp_path, _entries(3))
+    assert index.count("fssai") == 3
+    path.write_text(json.dumps(_entries(5)))
+    assert index.count("fssai") == 5
+    assert index.latest("fssai", 5)[-1]["document_id"] == "d00"
@@ -0,0 +1,54 @@
+from concurrent.futures import Future
+
+import pytest
+
+pytest.importorskip("pdfplumber")
+
+import ocr  # noqa: E402
+import text_cache  # noqa: E402
+
+
+def test_pdf_page_cache_hit_skips_render(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr, "OCR_CACHE_DIR", str(tmp_path))
+    # A cache hit must not need the renderer at all
+    monkeypatch.setattr(ocr, "pdfium", None)
+    ocr._write_cached(ocr._page_cache_path("abc", 3), "cached page text")
+
+    assert ocr._ocr_pdf_page("missing.pdf", 3, "abc") == "cached page text"
+
+
+def test_page_cache_key_depends_on_file_page_and_dpi(monkeypatch):
+    key = ocr._page_cache_path("abc", 0)
+    assert key != ocr._page_cache_path("abd", 0)
+    assert key != ocr._page_cache_path("abc", 1)
+    monkeypatch.setattr(ocr, "OCR_DPI", 150)
+    assert key != ocr._page_cache_path("abc", 0)
+
+
+class _Pool:
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args):
+        self.calls.append(args)
+        future = Future()
+        future.set_result(f"page {args[1]}")
+        return future
+
+
+def test_pdf_is_hashed_once_across_batches(tmp_path, monkeypatch):
+    pdf = tmp_path / "scan.pdf"
+    pdf.write_bytes(b"%PDF-1.4 scanned gazette")
+    pool, hashes = _Pool(), []
+    real_sha256 = text_cache.hashlib.sha256
+    monkeypatch.setattr(text_cache.hashlib, "sha256", lambda *a: hashes.append(1) or real_sha256(*a))
+    monkeypatch.setattr(ocr, "_available", True)
+    monkeypatch.setattr(ocr, "pdfium", object())
+    monkeypatch.setattr(ocr, "_get_pool", lambda: pool)
+
+    # vigilo_utils OCRs a scanned PDF a few pages at a time
+    assert ocr.ocr_pdf_pages(str(pdf), [0, 1]) == {0: "page 0", 1: "page 1"}
+    assert ocr.ocr_pdf_pages(str(pdf), [2, 3]) == {2: "page 2", 3: "page 3"}
+
+    assert len(hashes) == 1
+    assert {args[2] for args in pool.calls} == {text_cache.file_sha256(str(pdf))}
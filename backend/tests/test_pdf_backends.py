@@ -0,0 +1,42 @@
+import glob
+import os
+import threading
+
+import pytest
+
+pytest.importorskip("pdfplumber")
+
+import pdf_backends  # noqa: E402
+from pdf_backends import FallbackBackend, PdfTextBackend, make_backend  # noqa: E402
+
+PDFS = sorted(glob.glob(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                     "data", "dgft-pdfs", "*.pdf")))[:4]
+
+
+def test_base_backend_is_abstract():
+    with pytest.raises(TypeError):
+        PdfTextBackend()
+
+
+@pytest.mark.skipif(pdf_backends.pdfium is None or not PDFS, reason="needs pypdfium2 and the DGFT sample PDFs")
+def test_concurrent_reads_match_serial_reads():
+    backend = make_backend("pdfium")
+    expected = {path: list(backend.iter_pages(path)) for path in PDFS}
+    results, errors = {}, []
+
+    def read(n):
+        try:
+            for path in PDFS[n % len(PDFS):] + PDFS[:n % len(PDFS)]:
+                assert list(backend.iter_pages(path)) == expected[path]
+            results[n] = True
+        except Exception as e:  # surfaced below; assertion errors in threads are otherwise lost
+            errors.append(e)
+
+    threads = [threading.Thread(target=read, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors and len(results) == 8
+    assert isinstance(backend, FallbackBackend)
+    assert backend.stats["pages"] == 9 * sum(len(pages) for pages in expected.values())
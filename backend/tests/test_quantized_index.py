@@ -0,0 +1,99 @@
+import os
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("langchain_core")
+
+from quantized_index import QuantizedCollection
+
+DIM = 32
+
+
+def _vectors(n, seed=7):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((n, DIM)).astype(np.float32)
+
+
+def _filled(tmp_path, mode, n=400):
+    coll = QuantizedCollection(str(tmp_path / mode), mode)
+    vectors = _vectors(n)
+    ids = [f"doc{i % 20}:{i}" for i in range(n)]
+    metadatas = [{"document_id": f"doc{i % 20}", "source": "RBI" if i % 2 else "FSSAI", "chunk": i} for i in range(n)]
+    coll.upsert(ids, vectors, [f"text {i}" for i in range(n)], metadatas)
+    return coll, vectors, ids
+
+
+def _exact(vectors, query, k, rows=None):
+    rows = np.arange(len(vectors)) if rows is None else np.asarray(rows)
+    dist = ((vectors[rows] - query) ** 2).sum(axis=1)
+    return set(rows[np.argsort(dist)[:k]].tolist())
+
+
+@pytest.mark.parametrize("mode,min_recall", [("int8", 0.95), ("binary", 0.8)])
+def test_recall_against_exact_search(tmp_path, mode, min_recall):
+    coll, vectors, _ = _filled(tmp_path, mode)
+    queries = _vectors(20, seed=11)
+    found = 0
+    for query in queries:
+        hits = coll.search(query, 10)
+        found += len({pos for pos, _ in hits} & _exact(vectors, query, 10))
+        # Distances are exact after re-ranking, and sorted
+        distances = [d for _, d in hits]
+        assert distances == sorted(distances)
+        assert distances[0] == pytest.approx(float(((vectors[hits[0][0]] - query) ** 2).sum()), rel=1e-4)
+    assert found / (10 * len(queries)) >= min_recall
+
+
+def test_where_filters(tmp_path):
+    coll, vectors, _ = _filled(tmp_path, "int8")
+    query = _vectors(1, seed=3)[0]
+
+    rbi = [pos for pos, _ in coll.search(query, 5, where={"source": "RBI"})]
+    assert rbi and all(pos % 2 for pos in rbi)
+    assert set(rbi) == _exact(vectors, query, 5, rows=range(1, len(vectors), 2))
+
+    both = coll.search(query, 50, where={"$and": [{"source": "FSSAI"}, {"document_id": {"$in": ["doc2", "doc4"]}}]})
+    assert both and all(pos % 20 in (2, 4) for pos, _ in both)
+
+    assert coll.get(where={"chunk": {"$gte": 395}})["ids"] == [f"doc{i % 20}:{i}" for i in range(395, 400)]
+    assert coll.search(query, 5, where={"source": "GST"}) == []
+
+
+def test_upsert_replaces_and_delete_by_where(tmp_path):
+    coll, vectors, ids = _filled(tmp_path, "int8", n=40)
+    coll.upsert([ids[0]], vectors[1:2], ["replaced"], [{"document_id": "doc0", "source": "FSSAI"}])
+    assert coll.count() == 40
+    assert coll.get(ids=[ids[0]])["documents"] == ["replaced"]
+
+    coll.delete(where={"document_id": "doc3"})
+    assert coll.count() == 38
+    assert not coll.get(where={"document_id": "doc3"})["ids"]
+
+
+def test_compaction_keeps_live_rows_and_results(tmp_path):
+    coll, vectors, ids = _filled(tmp_path, "int8", n=200)
+    dead = random.Random(1).sample(ids, 80)
+    coll.delete(ids=dead)
+    assert coll.dead_ratio() == pytest.approx(0.4)
+    query = _vectors(1, seed=5)[0]
+    before = [(coll.rows_at([p])[p][0], d) for p, d in coll.search(query, 10)]
+
+    coll.compact()
+
+    assert coll.dead_ratio() == 0.0
+    assert coll.count() == 120
+    after = [(coll.rows_at([p])[p][0], d) for p, d in coll.search(query, 10)]
+    assert [i for i, _ in after] == [i for i, _ in before]
+    assert [d for _, d in after] == pytest.approx([d for _, d in before])
+    # A fresh reader follows CURRENT to the new generation
+    reopened = QuantizedCollection(coll.directory, "int8")
+    assert reopened.generation == coll.generation == 1 and reopened.count() == 120
+    assert os.path.isdir(os.path.join(coll.directory, "g0"))
+
+
+def test_mode_mismatch_is_rejected(tmp_path):
+    coll, _, _ = _filled(tmp_path, "int8", n=5)
+    with pytest.raises(ValueError):
+        QuantizedCollection(coll.directory, "binary")
@@ -0,0 +1,38 @@
+import os
+import time
+
+import run_store
+
+
+def test_reused_blob_survives_prune(tmp_path, monkeypatch):
+    monkeypatch.setattr(run_store, "BLOB_DIR", str(tmp_path / "_blobs"))
+    sha = run_store.put_blob("x" * 5000)
+    path = run_store._blob_path(sha)
+    stale = time.time() - 2 * 3600
+    os.utime(path, (stale, stale))
+
+    # A new run reuses the blob before writing the record that references it
+    assert run_store.put_blob("x" * 5000) == sha
+    assert run_store.prune_runs(root=str(tmp_path))["blobs"] == 0
+    assert run_store.get_blob(sha) == "x" * 5000
+
+
+def test_unreferenced_stale_blob_is_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(run_store, "BLOB_DIR", str(tmp_path / "_blobs"))
+    sha = run_store.put_blob("y" * 5000)
+    stale = time.time() - 2 * 3600
+    os.utime(run_store._blob_path(sha), (stale, stale))
+    assert run_store.prune_runs(root=str(tmp_path))["blobs"] == 1
+    assert run_store.get_blob(sha) is None
+
+
+def test_log_lines_are_read_back_in_order(tmp_path):
+    writer = run_store.RunWriter("acme", "run1", root=str(tmp_path))
+    writer.write_log("STAGE 1", "Starting analysis of 3 amendments")
+    writer.write_log("STAGE 2", "Filtered to 1 potentially relevant amendments")
+
+    logs = run_store.read_run("acme", "run1", root=str(tmp_path))["logs"]
+    assert [(r["stage"], r["message"]) for r in logs] == [
+        ("STAGE 1", "Starting analysis of 3 amendments"),
+        ("STAGE 2", "Filtered to 1 potentially relevant amendments"),
+    ]
@@ -0,0 +1,59 @@
+import pytest
+
+pytest.importorskip("groq")
+pytest.importorskip("langchain_community")
+pytest.importorskip("sentence_transformers")
+
+import prompt_chain  # noqa: E402
+from llm_cache import LLMResponseCache  # noqa: E402
+
+
+class _Response:
+    content = "[2, 0]"
+    usage = {"prompt_tokens": 120, "completion_tokens": 6}
+
+
+class _Pool:
+    def __init__(self):
+        self.calls = 0
+
+    def complete(self, prompt, **kwargs):
+        self.calls += 1
+        return _Response()
+
+
+AMENDMENTS = [{"title": "Labelling"}, {"title": "Additives"}, {"title": "Packaging"}]
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    pool = _Pool()
+    monkeypatch.setattr(prompt_chain, "client", object())
+    monkeypatch.setattr(prompt_chain, "pool", pool)
+    monkeypatch.setattr(prompt_chain, "response_cache", LLMResponseCache(str(tmp_path / "cache.sqlite3")))
+    monkeypatch.setattr(prompt_chain, "manual_relevance_selection",
+                        lambda *a, **k: pytest.fail("fell back to manual selection"))
+    return pool
+
+
+def test_cache_miss_returns_llm_selection(pool):
+    assert prompt_chain.select_relevant_amendments(AMENDMENTS, top_n=2, source="FSSAI") == [AMENDMENTS[2], AMENDMENTS[0]]
+    assert pool.calls == 1
+
+
+def test_cache_hit_skips_llm(pool):
+    first = prompt_chain.select_relevant_amendments(AMENDMENTS, top_n=2, source="FSSAI")
+    second = prompt_chain.select_relevant_amendments(AMENDMENTS, top_n=2, source="FSSAI")
+    assert first == second
+    assert pool.calls == 1
+
+
+def test_semantic_cache_does_not_cross_top_n_or_source(pool, tmp_path, monkeypatch):
+    # Every prompt embeds identically, so only the payload check keeps these requests apart
+    semantic = LLMResponseCache(str(tmp_path / "semantic.sqlite3"), embed_fn=lambda texts: [[1.0, 0.0]] * len(texts))
+    monkeypatch.setattr(prompt_chain, "response_cache", semantic)
+    prompt_chain.select_relevant_amendments(AMENDMENTS, top_n=2, source="FSSAI")
+    prompt_chain.select_relevant_amendments(AMENDMENTS, top_n=1, source="FSSAI")
+    prompt_chain.select_relevant_amendments(AMENDMENTS, top_n=2, source="DGFT")
+    assert pool.calls == 3
+    assert semantic.stats()["session"]["semantic_hits"] == 0
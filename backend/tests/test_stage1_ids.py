@@ -0,0 +1,99 @@
+import pytest
+
+pytest.importorskip("groq")
+pytest.importorskip("langchain_community")
+pytest.importorskip("sentence_transformers")
+
+from prompt_chain import AmendmentAnalyzer, amendment_id  # noqa: E402
+
+INPUTS = [{"title": "Labelling amendment", "document_id": "a" * 32},
+          {"title": "Additives amendment", "document_id": "b" * 32}]
+
+
+def test_echoed_id_wins_over_rewritten_title():
+    summaries = [{"id": "b" * 32, "title": "Food additives (rewritten)"},
+                 {"id": "a" * 32, "title": "Labels"}]
+    AmendmentAnalyzer._attach_document_ids(INPUTS, summaries)
+    assert [s["document_id"] for s in summaries] == ["b" * 32, "a" * 32]
+    assert all("id" not in s for s in summaries)
+
+
+def test_title_then_position_fallback():
+    summaries = [{"title": "Something else"}, {"title": "Additives amendment"}]
+    AmendmentAnalyzer._attach_document_ids(INPUTS, summaries)
+    assert [s["document_id"] for s in summaries] == ["a" * 32, "b" * 32]
+
+
+def test_unmatched_summary_gets_no_id():
+    summaries = [{"title": "Unknown"}]
+    AmendmentAnalyzer._attach_document_ids(INPUTS, summaries)
+    assert "document_id" not in summaries[0]
+
+
+def test_amendment_id_falls_back_to_pdf_url_hash():
+    assert amendment_id({"document_id": "x"}) == "x"
+    assert len(amendment_id({"pdf_url": "https://example.org/a.pdf"})) == 32
+
+
+def test_stage2_output_without_ids_gets_them_back(tmp_path, monkeypatch):
+    import prompt_chain
+    from run_store import RunWriter
+
+    monkeypatch.setattr(prompt_chain, "client", object())
+    monkeypatch.setattr(prompt_chain, "maybe_prune_async", lambda: None)
+    monkeypatch.setattr(prompt_chain, "RunWriter", lambda c, r: RunWriter(c, r, root=str(tmp_path)))
+    analyzer = AmendmentAnalyzer("acme", "run1")
+    analyzer.current_amendments = [dict(a, summary="...") for a in INPUTS]
+    prompts = []
+
+    def stage2_reply(prompt, model, key_path, temperature=0.2):
+        prompts.append(prompt)
+        # Models drop fields they were not asked to keep; only the second amendment is relevant
+        return {"amendments": [{"title": "Additives amendment", "relevance_reason": "uses additives"}]}
+
+    analyzer.call_groq_json = stage2_reply
+    out = analyzer.filter_by_company_profile({"name": "Acme", "business_type": "bakery"})
+
+    assert f"[ID: {'b' * 32}] Additives amendment" in prompts[0]
+    assert out == analyzer.current_amendments
+    assert [a["document_id"] for a in out] == ["b" * 32]
+
+
+def test_large_stage1_is_split_into_bounded_prompts(tmp_path, monkeypatch):
+    import prompt_chain
+    from run_store import RunWriter
+
+    monkeypatch.setattr(prompt_chain, "maybe_prune_async", lambda: None)
+    monkeypatch.setattr(prompt_chain, "RunWriter", lambda c, r: RunWriter(c, r, root=str(tmp_path)))
+    analyzer = AmendmentAnalyzer("batch", "run1")
+    inputs = [{"title": f"A{i}", "document_id": f"{i:032d}"} for i in range(50)]
+    prompts = []
+
+    def batch_reply(batch, stage_label, model):
+        prompts.append((stage_label, model, len(batch)))
+        if stage_label.endswith("BATCH3"):
+            raise RuntimeError("context length exceeded")
+        return [{"title": a["title"], "document_id": a["document_id"]} for a in batch]
+
+    analyzer.analyze_amendments_batch = batch_reply
+    out = analyzer.analyze_amendments(inputs)
+
+    assert max(size for _, _, size in prompts) <= prompt_chain.STAGE1_BATCH_SIZE
+    assert sum(size for _, _, size in prompts) == 50
+    assert len({model for _, model, _ in prompts}) > 1
+    # Input order survives parallel prompts, and a failed prompt falls back to naive summaries
+    assert [a["document_id"] for a in out] == [a["document_id"] for a in inputs]
+
+
+def test_small_stage1_keeps_three_agents(tmp_path, monkeypatch):
+    import prompt_chain
+    from run_store import RunWriter
+
+    monkeypatch.setattr(prompt_chain, "maybe_prune_async", lambda: None)
+    monkeypatch.setattr(prompt_chain, "RunWriter", lambda c, r: RunWriter(c, r, root=str(tmp_path)))
+    analyzer = AmendmentAnalyzer("acme", "run1")
+    labels = []
+    analyzer.analyze_amendments_batch = lambda batch, stage_label, model: labels.append(stage_label) or batch
+
+    assert analyzer.analyze_amendments(INPUTS) == INPUTS
+    assert sorted(labels) == ["STAGE 1-AGENT1", "STAGE 1-AGENT2"]
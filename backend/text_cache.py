@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+"""Extracted-text cache keyed by file content hash.
+
+Uploads are parsed (and OCR'd) once, in the background right after /company/submit, and the page
+texts are stored under data/text_cache/<sha256>.json. Readers look a file up by its content hash,
+so renamed or re-uploaded copies of the same document share one entry.
+"""
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEXT_CACHE_DIR = os.path.join(BASE_DIR, "data", "text_cache")
+HASH_CHUNK_BYTES = 1024 * 1024
+
+_hash_memo: Dict[Tuple[str, int, int], str] = {}
+_hash_lock = threading.Lock()
+
+
+def file_sha256(path: str) -> str:
+    """Content hash of a file, memoised per (path, size, mtime)."""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _hash_lock:
+        if memo_key in _hash_memo:
+            return _hash_memo[memo_key]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(block)
+    sha = digest.hexdigest()
+    with _hash_lock:
+        _hash_memo[memo_key] = sha
+    return sha
+
+
+def _entry_path(sha: str) -> str:
+    return os.path.join(TEXT_CACHE_DIR, f"{sha}.json")
+
+
+def load_pages(sha: str) -> Optional[List[str]]:
+    """Cached page texts for a content hash, or None when not extracted yet."""
+    path = _entry_path(sha)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("pages")
+    except Exception as e:
+        print(f"Warning: unreadable text cache entry {path}: {e}")
+        return None
+
+
+def save_pages(sha: str, pages: List[str], source_path: str = ""):
+    os.makedirs(TEXT_CACHE_DIR, exist_ok=True)
+    path = _entry_path(sha)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"sha256": sha, "source": os.path.basename(source_path), "created": time.time(),
+                   "pages": pages}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def cached_pages_for(path: str) -> Optional[List[str]]:
+    """Cached page texts for the file at `path`, or None."""
+    try:
+        return load_pages(file_sha256(path))
+    except OSError:
+        return None
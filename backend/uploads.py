@@ -0,0 +1,62 @@
+import glob
+import hashlib
+import os
+import re
+import uuid
+
+import aiofiles
+from fastapi import UploadFile
+
+"""Streaming storage for /company/submit uploads.
+
+Each upload is copied to disk in fixed-size chunks with async file I/O (never held in memory as a
+whole) and hashed while it streams. Files are stored as uploads/<sha256>_<name>, so identical
+content is stored once and different files that share a name no longer overwrite each other.
+"""
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+UPLOAD_DIR = os.path.join(BASE_DIR, "data", "uploads")
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+_UNSAFE_NAME_RE = re.compile(r'[^A-Za-z0-9._ -]+')
+
+
+def safe_filename(name: str) -> str:
+    """Basename of a client-supplied filename with path separators and odd characters removed."""
+    name = os.path.basename((name or "").replace("\\", "/")).strip()
+    name = _UNSAFE_NAME_RE.sub("_", name).strip(". ")
+    return name[:120] or "upload"
+
+
+def find_by_hash(sha: str) -> str:
+    """Path of an already stored upload with this content hash, or ''."""
+    matches = sorted(glob.glob(os.path.join(UPLOAD_DIR, f"{glob.escape(sha)}_*")))
+    return matches[0] if matches else ""
+
+
+async def save_upload(file: UploadFile) -> str:
+    """Stream `file` to UPLOAD_DIR, returning the stored path (an existing one for duplicate content)."""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    tmp = os.path.join(UPLOAD_DIR, f".incoming-{uuid.uuid4().hex}")
+    digest = hashlib.sha256()
+    try:
+        async with aiofiles.open(tmp, "wb") as out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                await out.write(chunk)
+        sha = digest.hexdigest()
+        existing = find_by_hash(sha)
+        if existing:
+            os.remove(tmp)
+            return existing
+        path = os.path.join(UPLOAD_DIR, f"{sha}_{safe_filename(file.filename)}")
+        os.replace(tmp, path)
+        return path
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    finally:
+        await file.close()
@@ -0,0 +1,58 @@
+"""Vector store maintenance.
+
+Usage (from backend/):
+    python vector_gc.py --report     # index-health report (read-only)
+    python vector_gc.py --dry-run    # what compaction would delete / re-key
+    python vector_gc.py              # compact: drop orphaned and duplicate chunks, re-key legacy ids
+
+Compaction is queued as a VECTOR_GC run on the ingest queue, so it is executed by the ingestion
+writer between ingests. If no writer is running, this process takes the writer role for the run.
+"""
+import argparse
+import json
+import sys
+import time
+
+from ingest_scheduler import IngestScheduler
+from ingest_worker import INGEST_DB, INGEST_JOBS
+from vigilo_utils import compact_vector_db, vector_health
+
+
+def _wait_for(scheduler: IngestScheduler, run_id: int, timeout: float) -> dict:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        run = next((r for r in scheduler.history("VECTOR_GC", 20) if r["run_id"] == run_id), None)
+        if run and run["finished_at"]:
+            return run
+        time.sleep(1)
+    return {"run_id": run_id, "status": "timeout"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vector store health report and compaction")
+    parser.add_argument("--report", action="store_true", help="print the index-health report and exit")
+    parser.add_argument("--dry-run", action="store_true", help="report what compaction would change")
+    parser.add_argument("--timeout", type=float, default=3600, help="seconds to wait for the compaction run")
+    args = parser.parse_args()
+
+    if args.report:
+        print(json.dumps(vector_health(), indent=2))
+        return
+    if args.dry_run:
+        print(f"{compact_vector_db(dry_run=True)} chunk(s) would be removed")
+        return
+
+    scheduler = IngestScheduler(INGEST_JOBS, db_path=INGEST_DB, schedule=False)
+    run = scheduler.enqueue("VECTOR_GC", trigger="cli")
+    print(f"Vector GC run {run['run_id']} {'already ' + run['status'] if run['deduplicated'] else 'queued'}")
+    scheduler.start()
+    try:
+        run = _wait_for(scheduler, run["run_id"], args.timeout)
+    finally:
+        scheduler.stop()
+    print(json.dumps(run, indent=2))
+    sys.exit(0 if run.get("status") == "ok" else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import os
+import re
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+
+from atomic_store import read_json, write_json
+from worker_role import SharedVectorStore
+
+"""Per-source vector collections.
+
+Each regulator source (FSSAI, RBI, DGFT, GST, LOCAL) has its own Chroma collection,
+notifications_<source>, under one absolute persist directory (VIGILO_VECTOR_DB_DIR, default
+backend/data/vector_db). Source-restricted search only touches that source's HNSW index, and the
+indexes stay small as each corpus grows. Unrestricted search queries every collection and merges
+the hits by distance (same embedding model and metric everywhere).
+
+Chunk ids are deterministic, "<document_id>:<chunk index>", and adding a document replaces all of
+its previous chunks, so re-ingesting a changed PDF or ingesting the same URL twice never leaves
+stale or duplicate vectors. gc() drops chunks of documents no longer in the metadata stores and
+re-keys chunks stored under the old random ids; health() reports what gc() would find.
+
+Chunks carry a numeric `date_num` (YYYYMMDD) next to the display date so searches can filter by
+date range inside the collection.
+
+The registry file <persist_dir>/collections.json records the persist directory, embedding model
+and collection per source. On first start of a writer process, chunks in the old single
+"fssai_notifications" collection are copied, with their stored embeddings, into the per-source
+collections.
+"""
+
+SOURCES = ("FSSAI", "RBI", "DGFT", "GST", "LOCAL")
+CHUNK_ID = re.compile(r"^[0-9a-f]{32}:\d+$")
+SCAN_BATCH = 2000
+LEGACY_COLLECTION = "fssai_notifications"
+MIGRATION_BATCH = 1000
+
+
+def collection_name(source: str) -> str:
+    return f"notifications_{source.lower()}"
+
+
+def chunk_id(metadata: Dict) -> str:
+    return f"{metadata.get('document_id', '')}:{int(metadata.get('chunk') or 0)}"
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for dirpath, _, files in os.walk(path):
+        for fname in files:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, fname))
+            except OSError:
+                pass
+    return total
+
+
+def date_num(iso: str) -> int:
+    """'2025-08-14' -> 20250814; 0 when unknown."""
+    digits = (iso or "").replace("-", "")
+    return int(digits) if len(digits) == 8 and digits.isdigit() else 0
+
+
+def date_filter(date_from: Optional[str] = None, date_to: Optional[str] = None) -> Optional[Dict]:
+    """Chroma `where` clause for an inclusive ISO date range, or None."""
+    clauses = []
+    if date_from:
+        clauses.append({"date_num": {"$gte": date_num(date_from)}})
+    if date_to:
+        clauses.append({"date_num": {"$lte": date_num(date_to)}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+class VectorRegistry:
+    def __init__(self, persist_dir: str, open_collection: Callable[[str, str], object], writable: bool,
+                 embedding_model: str = "", engine: str = "chroma"):
+        """`open_collection(name, persist_dir)` returns a LangChain vector store for one collection
+        (Chroma, or a quantized_index.QuantizedVectorStore; `engine` is recorded in the registry file)."""
+        self.persist_dir = os.path.abspath(persist_dir)
+        self.writable = writable
+        self.embedding_model = embedding_model
+        self.engine = engine
+        self._open = open_collection
+        self._stores: Dict[str, SharedVectorStore] = {}
+        os.makedirs(self.persist_dir, exist_ok=True)
+        self.registry_path = os.path.join(self.persist_dir, "collections.json")
+        if writable:
+            self._write_registry()
+            self._migrate_legacy()
+
+    def _write_registry(self, **extra):
+        current = {}
+        try:
+            current = read_json(self.registry_path, {}) or {}
+        except Exception as e:
+            print(f"Warning: rewriting unreadable vector registry: {e}")
+        current.update({
+            "persist_directory": self.persist_dir,
+            "embedding_model": self.embedding_model,
+            "engine": self.engine,
+            "collections": {s: collection_name(s) for s in SOURCES},
+            "updated": time.time(),
+            **extra,
+        })
+        write_json(self.registry_path, current)
+
+    def describe(self) -> Dict:
+        return read_json(self.registry_path, {}) or {}
+
+    def store(self, source: str) -> SharedVectorStore:
+        source = (source or "LOCAL").upper()
+        if source not in self._stores:
+            name = collection_name(source)
+            self._stores[source] = SharedVectorStore(lambda: self._open(name, self.persist_dir), self.persist_dir,
+                                                     writable=self.writable)
+        return self._stores[source]
+
+    # -------- writes --------
+
+    def add_documents(self, documents: List[Document]):
+        """Upsert chunks into their source's collection (metadata["source"]) under deterministic
+        ids, stamping `date_num`. Each document's previously stored chunks are replaced."""
+        by_document: Dict[Tuple[str, str], List[Document]] = {}
+        for doc in documents:
+            doc.metadata["date_num"] = date_num(doc.metadata.get("date_iso", ""))
+            source = (doc.metadata.get("source") or "LOCAL").upper()
+            by_document.setdefault((source, doc.metadata.get("document_id", "")), []).append(doc)
+        for (source, document_id), docs in by_document.items():
+            store = self.store(source)
+            if document_id:
+                store._collection.delete(where={"document_id": document_id})
+            store.add_documents(docs, ids=[chunk_id(d.metadata) for d in docs])
+
+    def persist(self):
+        for store in self._stores.values():
+            store.persist()
+
+    def _migrate_legacy(self):
+        if self.describe().get("legacy_migrated"):
+            return
+        try:
+            legacy = self._open(LEGACY_COLLECTION, self.persist_dir)._collection
+            total = legacy.count()
+        except Exception as e:
+            print(f"Vector registry: no legacy collection to migrate ({e})")
+            total = 0
+        moved = 0
+        for offset in range(0, total, MIGRATION_BATCH):
+            batch = legacy.get(include=["embeddings", "documents", "metadatas"], limit=MIGRATION_BATCH, offset=offset)
+            grouped: Dict[str, Tuple[list, list, list, list]] = {}
+            for i, legacy_id in enumerate(batch["ids"]):
+                meta = dict(batch["metadatas"][i] or {})
+                meta.setdefault("date_num", date_num(meta.get("date_iso", "")))
+                ids, vecs, docs, metas = grouped.setdefault((meta.get("source") or "LOCAL").upper(), ([], [], [], []))
+                ids.append(legacy_id)
+                vecs.append(batch["embeddings"][i])
+                docs.append(batch["documents"][i])
+                metas.append(meta)
+            for source, (ids, vecs, docs, metas) in grouped.items():
+                self.store(source)._collection.upsert(ids=ids, embeddings=vecs, documents=docs, metadatas=metas)
+                moved += len(ids)
+        if total:
+            self.persist()
+            print(f"Vector registry: migrated {moved} chunk(s) from '{LEGACY_COLLECTION}' into per-source collections")
+        self._write_registry(legacy_migrated=True)
+
+    # -------- reads --------
+
+    def search(self, query: str, k: int = 8, source: Optional[str] = None, date_from: Optional[str] = None,
+               date_to: Optional[str] = None, document_id: Optional[str] = None) -> List[Document]:
+        """Top-k chunks for `query`, from one source's collection or merged across all of them
+        (only chunks of `document_id` when given)."""
+        where = date_filter(date_from, date_to)
+        if document_id:
+            where = {"document_id": document_id} if where is None else {"$and": [{"document_id": document_id}, where]}
+        kwargs = {"filter": where} if where else {}
+        sources = [source.upper()] if source else list(SOURCES)
+        hits: List[Tuple[Document, float]] = []
+        for s in sources:
+            try:
+                hits.extend(self.store(s).similarity_search_with_score(query, k=k, **kwargs))
+            except Exception as e:
+                print(f"Vector search in {collection_name(s)} failed: {e}")
+        hits.sort(key=lambda h: h[1])
+        return [doc for doc, _ in hits[:k]]
+
+    # -------- maintenance --------
+
+    def _scan(self, source: str, include: Iterable[str] = ("metadatas",)) -> Iterable[Dict]:
+        collection = self.store(source)._collection
+        offset = 0
+        while True:
+            batch = collection.get(include=list(include), limit=SCAN_BATCH, offset=offset)
+            if not batch["ids"]:
+                return
+            yield batch
+            offset += len(batch["ids"])
+
+    def _classify(self, source: str, known_ids: Set[str]) -> Dict:
+        """Chunk ids of one collection by problem: dangling (document not in any metadata store),
+        duplicate (same document chunk stored again) and legacy (random id, first copy)."""
+        seen: Dict[str, str] = {}
+        total, documents = 0, set()
+        dangling, duplicates = [], []
+        legacy: Set[str] = set()
+        for batch in self._scan(source):
+            for chunk, meta in zip(batch["ids"], batch["metadatas"]):
+                meta = meta or {}
+                total += 1
+                document_id = meta.get("document_id", "")
+                documents.add(document_id)
+                if document_id not in known_ids:
+                    dangling.append(chunk)
+                    continue
+                key = chunk_id(meta)
+                if key in seen:
+                    # Keep the copy stored under the deterministic id
+                    if chunk == key:
+                        duplicates.append(seen[key])
+                        legacy.discard(seen[key])
+                        seen[key] = chunk
+                    else:
+                        duplicates.append(chunk)
+                    continue
+                seen[key] = chunk
+                if not CHUNK_ID.match(chunk):
+                    legacy.add(chunk)
+        return {"total": total, "documents": len(documents), "dangling": dangling,
+                "duplicates": duplicates, "legacy": sorted(legacy)}
+
+    def health(self, known_ids: Set[str], sample: int = 20) -> Dict:
+        """Index-health report: per collection chunk/document counts, dangling and duplicate chunks,
+        chunks still under legacy ids, plus the persist directory's size on disk."""
+        collections = {}
+        for source in SOURCES:
+            try:
+                c = self._classify(source, known_ids)
+            except Exception as e:
+                collections[source] = {"error": str(e)}
+                continue
+            collections[source] = {
+                "collection": collection_name(source),
+                "chunks": c["total"],
+                "documents": c["documents"],
+                "dangling_chunks": len(c["dangling"]),
+                "dangling_ids": c["dangling"][:sample],
+                "duplicate_chunks": len(c["duplicates"]),
+                "duplicate_ratio": round(len(c["duplicates"]) / c["total"], 4) if c["total"] else 0.0,
+                "legacy_id_chunks": len(c["legacy"]),
+            }
+        return {"persist_directory": self.persist_dir, "size_bytes": _dir_size(self.persist_dir),
+                "collections": collections}
+
+    def gc(self, known_ids: Set[str], dry_run: bool = False) -> Dict:
+        """Delete dangling and duplicate chunks and move legacy-id chunks to their deterministic ids
+        (stored embeddings are reused). Returns per-source counts."""
+        if not known_ids:
+            raise ValueError("refusing to garbage-collect against an empty set of known documents")
+        result = {}
+        for source in SOURCES:
+            c = self._classify(source, known_ids)
+            result[source] = {"deleted_dangling": len(c["dangling"]), "deleted_duplicates": len(c["duplicates"]),
+                              "rekeyed": len(c["legacy"])}
+            if dry_run:
+                continue
+            collection = self.store(source)._collection
+            for i in range(0, len(c["legacy"]), SCAN_BATCH):
+                batch = collection.get(ids=c["legacy"][i:i + SCAN_BATCH], include=["embeddings", "documents", "metadatas"])
+                collection.upsert(ids=[chunk_id(m or {}) for m in batch["metadatas"]], embeddings=batch["embeddings"],
+                                  documents=batch["documents"], metadatas=batch["metadatas"])
+            doomed = c["dangling"] + c["duplicates"] + c["legacy"]
+            for i in range(0, len(doomed), SCAN_BATCH):
+                collection.delete(ids=doomed[i:i + SCAN_BATCH])
+        if not dry_run:
+            self.persist()
+        print(f"Vector GC{' (dry run)' if dry_run else ''}: " + ", ".join(
+            f"{s} -{r['deleted_dangling'] + r['deleted_duplicates']} ~{r['rekeyed']}" for s, r in result.items()))
+        return result
@@ -1,18 +1,28 @@
 import os
 import requests
 from bs4 import BeautifulSoup
-import pdfplumber
+from pdf_backends import get_pdf_backend
+from chunking import chunk_pages, merge_overlapping_chunks
+from company_registry import CompanyRegistry
+from filtered_store import FilteredAmendmentStore
+from metadata_index import MetadataIndex, iso_date
+from atomic_store import read_json, update_json, write_json
+from embedding_cache import build_embedding_cache
+from worker_role import is_writer
+from quantized_index import QuantizedVectorStore
+from vector_registry import VectorRegistry
+from text_cache import cached_pages_for, file_sha256, load_pages, save_pages
+from ocr import OCR_WORKERS, is_image_file, needs_ocr, ocr_available, ocr_image_file, ocr_pdf_pages
 from datetime import datetime, time
 from typing import List, Dict
 import hashlib
 import json
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import Chroma
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_core.documents import Document
 import re
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Iterable, Iterator, NamedTuple, Set, Tuple
 from datetime import date
 
 class CompanyInfo(BaseModel):
@@ -54,7 +64,7 @@ class CompanyData(BaseModel):
 
 
 # Configuration (absolute paths under backend/data)
-BASE_DIR = os.path.dirname(__file__)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 PDF_DIR = os.path.join(DATA_DIR, "pdfs")
 METADATA_FILE = os.path.join(DATA_DIR, "metadata.json")
@@ -63,12 +73,33 @@ os.makedirs(DATA_DIR, exist_ok=True)
 RBI_PDF_DIR = os.path.join(DATA_DIR, "rbi-pdf")
 os.makedirs(RBI_PDF_DIR, exist_ok=True)
 
-# Initialize vector stores
-embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-vector_store = Chroma(
-    collection_name="fssai_notifications",
-    embedding_function=embeddings,
-    persist_directory="data/vector_db"
+# Initialize vector stores: one collection per source (read-only in web workers; see worker_role)
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# Every embedding user (vector store, evidence selection, company documents, LLM cache) goes through
+# the persistent cache, so the model only sees text it has not embedded before
+embeddings = build_embedding_cache(HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL), EMBEDDING_MODEL, DATA_DIR)
+VECTOR_DB_DIR = os.path.abspath(os.getenv("VIGILO_VECTOR_DB_DIR", os.path.join(DATA_DIR, "vector_db")))
+# chroma (float32 HNSW in RAM) or the memory-mapped int8/binary index of quantized_index
+VECTOR_ENGINE = os.getenv("VIGILO_VECTOR_ENGINE", "chroma").strip().lower()
+
+def _open_chroma(name: str, persist_dir: str) -> Chroma:
+    return Chroma(collection_name=name, embedding_function=embeddings, persist_directory=persist_dir)
+
+def _open_collection(name: str, persist_dir: str):
+    if VECTOR_ENGINE == "chroma":
+        return _open_chroma(name, persist_dir)
+    oversample = os.getenv("VIGILO_VECTOR_OVERSAMPLE")
+    # The writer imports an existing Chroma collection the first time the quantized one is opened
+    seed = (lambda: _open_chroma(name, persist_dir)._collection) if is_writer() else None
+    return QuantizedVectorStore(name, persist_dir, embeddings, mode=VECTOR_ENGINE,
+                                oversample=int(oversample) if oversample else None, seed=seed)
+
+vector_registry = VectorRegistry(
+    VECTOR_DB_DIR,
+    _open_collection,
+    writable=is_writer(),
+    embedding_model=EMBEDDING_MODEL,
+    engine=VECTOR_ENGINE,
 )
 
 # Company data stored as JSON only (no vector DB per requirements)
@@ -78,34 +109,60 @@ METADATA_DGFT_FILE = os.path.join(DATA_DIR, "metadataDGFT.json")
 
 METADATA_GST_FILE = os.path.join(DATA_DIR, "metadataGST.json")
 
+# Sorted, filterable view of the metadata stores for the list endpoints
+metadata_index = MetadataIndex({
+    "fssai": METADATA_FILE,
+    "rbi": METADATA_RBI_FILE,
+    "dgft": METADATA_DGFT_FILE,
+    "gst": METADATA_GST_FILE,
+})
+
+# Per-company filtered amendment sets with version history (replaces filtered_amms/ snapshots)
+filtered_store = FilteredAmendmentStore(
+    os.path.join(DATA_DIR, "filtered_amendments.sqlite3"),
+    legacy_dir=os.path.join(DATA_DIR, "filtered_amms"),
+)
+
+# Index of company JSON files (latest/listing queries) with an in-process parsed-data cache
+company_registry = CompanyRegistry(
+    os.path.join(DATA_DIR, "companies"),
+    os.path.join(DATA_DIR, "companies.sqlite3"),
+    model_cls=CompanyData,
+)
+
 def load_rbi_metadata() -> List[Dict]:
-    """Load RBI-specific metadata"""
-    if os.path.exists(METADATA_RBI_FILE):
-        try:
-            with open(METADATA_RBI_FILE, 'r') as f:
-                content = f.read().strip()
-                if not content:  # Handle empty file
-                    return []
-                return json.loads(content)
-        except (json.JSONDecodeError, Exception) as e:
-            print(f"Warning: Error loading RBI metadata, creating fresh: {e}")
-            return []
-    return []
+    """Load RBI-specific metadata ([] if missing; a damaged file raises CorruptStoreError)"""
+    return read_json(METADATA_RBI_FILE, [])
 
 def save_rbi_metadata(metadata: List[Dict]):
-    """Save RBI-specific metadata"""
-    with open(METADATA_RBI_FILE, 'w') as f:
-        json.dump(metadata, f, indent=2)
+    """Save RBI-specific metadata (atomic, under the file lock)"""
+    write_json(METADATA_RBI_FILE, metadata)
 
 def load_metadata() -> List[Dict]:
-    if os.path.exists(METADATA_FILE):
-        with open(METADATA_FILE, 'r') as f:
-            return json.load(f)
-    return []
+    return read_json(METADATA_FILE, [])
 
 def save_metadata(metadata: List[Dict]):
-    with open(METADATA_FILE, 'w') as f:
-        json.dump(metadata, f, indent=2)
+    write_json(METADATA_FILE, metadata)
+
+def _append_metadata(store: str, path: str, entries: List[Dict]) -> int:
+    """Append newly ingested entries to a metadata file. The file is re-read under its lock, so
+    entries another worker saved meanwhile are kept; entries whose pdf_url is already stored are
+    skipped. Returns the number appended."""
+    added: List[Dict] = []
+
+    def merge(current: List[Dict]) -> List[Dict]:
+        known = {m.get("pdf_url") for m in current}
+        for m in entries:
+            if m.get("pdf_url") not in known:
+                known.add(m.get("pdf_url"))
+                added.append(m)
+        merged = current + added
+        _ensure_iso_dates(merged)
+        return merged
+
+    merged = update_json(path, merge, default=[])
+    metadata_index.add(store, added, len(merged))
+    return len(added)
 
 def get_pdf_filename(url: str, title: str) -> str:
     """Generate consistent PDF filename from URL and title"""
@@ -344,43 +401,197 @@ def download_pdf(url: str, filename: str, target_dir: str = PDF_DIR) -> str:
             return ""
     return path
 
-def extract_text_from_pdf(path: str) -> str:
-    """Extract text from PDF with error handling"""
-    if not os.path.exists(path):
-        return ""
-        
-    text = ""
+# Descriptions/excerpts only need the opening of a notification, not a 90-page gazette
+DESCRIPTION_PAGE_BUDGET = 3
+
+
+def iter_pdf_pages(path: str, max_pages: Optional[int] = None, max_chars: Optional[int] = None) -> Iterator[str]:
+    """Yield the text of each page lazily using the configured text backend (see pdf_backends;
+    VIGILO_PDF_BACKEND). Pages without a text layer are OCR'd (see ocr); if OCR is unavailable
+    they yield an empty string.
+    Parsing stops as soon as `max_pages` pages or `max_chars` characters have been produced,
+    so later pages are never laid out.
+    """
+    if not path or not os.path.exists(path):
+        return
+    produced = 0
+    # Consecutive pages without a text layer are OCR'd together so the pool works in parallel
+    scanned: List[int] = []
     try:
-        with pdfplumber.open(path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
+        for index, page_text in enumerate(get_pdf_backend().iter_pages(path, max_pages=max_pages)):
+            if needs_ocr(page_text) and ocr_available():
+                scanned.append(index)
+                if len(scanned) < OCR_WORKERS:
+                    continue
+                ready = _ocr_batch(path, scanned)
+            else:
+                ready = _ocr_batch(path, scanned) + [page_text]
+            scanned = []
+            for text in ready:
+                yield text
+                produced += len(text)
+                if max_chars is not None and produced >= max_chars:
+                    return
+        for text in _ocr_batch(path, scanned):
+            yield text
     except Exception as e:
         print(f"Error extracting text from {path}: {e}")
-    return text.strip()
 
-def extract_text_from_file(path: str) -> str:
+
+def _ocr_batch(path: str, indexes: List[int]) -> List[str]:
+    if not indexes:
+        return []
+    texts = ocr_pdf_pages(path, indexes)
+    return [texts[i] for i in indexes]
+
+
+def extract_text_from_pdf(path: str, max_pages: Optional[int] = None, max_chars: Optional[int] = None) -> str:
+    """Extract text from PDF with error handling.
+    With a page or character budget only the pages needed to satisfy it are parsed.
+    """
+    text = join_pages(iter_pdf_pages(path, max_pages, max_chars))
+    return text[:max_chars] if max_chars is not None else text
+
+def extract_pdf_pages(path: str, max_pages: Optional[int] = None) -> List[str]:
+    """Text of every page in order (empty strings kept so list index + 1 is the page number)."""
+    return list(iter_pdf_pages(path, max_pages))
+
+def join_pages(pages: Iterable[str]) -> str:
+    return "\n".join(t for t in pages if t).strip()
+
+def extract_document_pages(path: str) -> List[str]:
+    """Full page texts of any supported file, read from (or stored in) the content-hash text cache"""
+    if not path or not os.path.exists(path):
+        return []
+    sha = file_sha256(path)
+    pages = load_pages(sha)
+    if pages is None:
+        if os.path.splitext(path)[1].lower() == ".pdf":
+            pages = extract_pdf_pages(path)
+        else:
+            pages = [extract_text_from_file(path)]
+        save_pages(sha, pages, source_path=path)
+    return pages
+
+
+def extract_text_from_file(path: str, max_pages: Optional[int] = None, max_chars: Optional[int] = None) -> str:
     """Best-effort text extraction for different file types.
-    - PDF: use pdfplumber
+    - PDF: configured text backend (optionally limited to a page/character budget)
     - TXT: read as text
+    - Images: Tesseract OCR (cached by image hash)
     - Others: return empty string
     """
     if not path or not os.path.exists(path):
         return ""
     ext = os.path.splitext(path)[1].lower()
     if ext == ".pdf":
-        return extract_text_from_pdf(path)
+        return extract_text_from_pdf(path, max_pages=max_pages, max_chars=max_chars)
     if ext in [".txt", ".md", ".csv"]:
         try:
             with open(path, "r", encoding="utf-8", errors="ignore") as f:
-                return f.read()
+                return f.read() if max_chars is None else f.read(max_chars)
         except Exception:
             return ""
-    # Image/Docx OCR not implemented in this basic version
+    if is_image_file(path):
+        text = ocr_image_file(path)
+        return text if max_chars is None else text[:max_chars]
+    # Docx extraction not implemented in this basic version
     return ""
 
 
+def extract_english_pages(path: str, max_chars: int) -> List[str]:
+    """English-only text per page (index + 1 is the page number), parsing PDF pages only until
+    the filtered text reaches `max_chars` (bilingual gazettes lose roughly half of each page).
+    Files already in the text cache are not parsed at all. Non-PDF files come back as a single page."""
+    if not path or not os.path.exists(path):
+        return []
+    cached = cached_pages_for(path)
+    if cached is None and os.path.splitext(path)[1].lower() != ".pdf":
+        return [filter_english_lines(extract_text_from_file(path))[:max_chars]]
+    pages: List[str] = []
+    produced = 0
+    for page_text in cached if cached is not None else iter_pdf_pages(path):
+        english = filter_english_lines(page_text)
+        pages.append(english)
+        if english:
+            produced += len(english) + 1
+        if produced >= max_chars:
+            break
+    return pages
+
+
+def extract_english_text(path: str, max_chars: int) -> str:
+    """Return up to `max_chars` of English-only text (see extract_english_pages)."""
+    return join_pages(extract_english_pages(path, max_chars))[:max_chars]
+
+
+# Script classification: str.translate maps every character through this table in C, turning
+# Devanagari into "\x01", ASCII letters into "\x02" and leaving everything else (including
+# whitespace and line breaks) in place, so the classified text stays aligned with the original
+# and per-line counts are just str.count calls. Code points past the table are left unchanged.
+_SCRIPT_DEVANAGARI = "\x01"
+_SCRIPT_LATIN = "\x02"
+
+
+def _build_script_table() -> str:
+    table = []
+    for cp in range(0x0980):
+        c = chr(cp)
+        if 0x0900 <= cp <= 0x097F:
+            table.append(_SCRIPT_DEVANAGARI)
+        elif c.isascii() and c.isalpha():
+            table.append(_SCRIPT_LATIN)
+        elif c in (_SCRIPT_DEVANAGARI, _SCRIPT_LATIN):
+            table.append("\x00")
+        else:
+            table.append(c)
+    return "".join(table)
+
+
+_SCRIPT_TABLE = _build_script_table()
+
+
+class ScriptLine(NamedTuple):
+    text: str          # stripped line
+    devanagari: float  # share of Devanagari characters
+    latin: float       # share of ASCII letters
+
+
+def classify_script_lines(text: str) -> List[ScriptLine]:
+    """Classify every non-empty line of `text` in a single translate pass."""
+    if not text:
+        return []
+    out: List[ScriptLine] = []
+    for line, classes in zip(text.splitlines(), text.translate(_SCRIPT_TABLE).splitlines()):
+        line = line.strip()
+        if not line:
+            continue
+        classes = classes.strip()
+        n = len(line)
+        out.append(ScriptLine(line, classes.count(_SCRIPT_DEVANAGARI) / n, classes.count(_SCRIPT_LATIN) / n))
+    return out
+
+
+def iter_script_lines(text: str) -> Iterator[ScriptLine]:
+    """Like classify_script_lines, translating one line at a time so callers that stop early
+    (excerpts) do not classify the whole document."""
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        classes = line.translate(_SCRIPT_TABLE)
+        n = len(line)
+        yield ScriptLine(line, classes.count(_SCRIPT_DEVANAGARI) / n, classes.count(_SCRIPT_LATIN) / n)
+
+
+def filter_english_lines(text: str) -> str:
+    """Keep lines with more English than Hindi, or lines that are mostly numbers/symbols."""
+    return "\n".join(
+        sl.text for sl in classify_script_lines(text)
+        if sl.latin > sl.devanagari or (sl.latin + sl.devanagari) < 0.3
+    )
+
+
 def extract_excerpt(text: str, max_lines: int = 7) -> str:
     """Return the first `max_lines` non-empty lines from `text` as a single string.
     Filters out non-English text and excessive formatting.
@@ -388,24 +599,15 @@ def extract_excerpt(text: str, max_lines: int = 7) -> str:
     if not text:
         return ""
     
-    # Split into lines and clean
     lines = []
-    for line in text.splitlines():
-        line = line.strip()
-        if not line:
-            continue
-        
+    for sl in iter_script_lines(text):
         # Filter out lines that are mostly non-English (Hindi/Devanagari characters)
-        devanagari_chars = re.findall(r'[\u0900-\u097F]', line)
-        if len(devanagari_chars) / max(1, len(line)) > 0.3:  # More than 30% Devanagari
+        if sl.devanagari > 0.3:  # More than 30% Devanagari
             continue
-            
         # Filter out lines that are mostly numbers/special chars
-        alpha_chars = re.findall(r'[a-zA-Z]', line)
-        if len(alpha_chars) / max(1, len(line)) < 0.2:  # Less than 20% alphabetic
+        if sl.latin < 0.2:  # Less than 20% alphabetic
             continue
-            
-        lines.append(line)
+        lines.append(sl.text)
         if len(lines) >= max_lines:
             break
     
@@ -413,20 +615,22 @@ def extract_excerpt(text: str, max_lines: int = 7) -> str:
     return " ".join(lines[:max_lines])
 
 def chunk_text(text: str, metadata: Dict) -> List[Document]:
-    """Split text into chunks with metadata"""
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len
-    )
-    
-    chunks = text_splitter.split_text(text)
-    documents = []
-    for i, chunk in enumerate(chunks):
-        doc_metadata = metadata.copy()
-        doc_metadata["chunk"] = i
-        documents.append(Document(page_content=chunk, metadata=doc_metadata))
-    return documents
+    """Split page-less text into clause-aware chunks with metadata (see chunking.chunk_pages
+    for PDFs, which also records page numbers)"""
+    return chunk_pages([text], metadata, paged=False)
+
+def search_regulations(query: str, k: int = 8, source: Optional[str] = None,
+                       date_from: Optional[str] = None, date_to: Optional[str] = None,
+                       document_id: Optional[str] = None) -> List[Document]:
+    """Similarity search over ingested notifications (only `source`'s collection when given,
+    optionally within an ISO date range or one notification); overlapping chunks of the same page
+    are merged so the splitter overlap is not repeated in prompts."""
+    try:
+        return merge_overlapping_chunks(vector_registry.search(query, k=k, source=source, date_from=date_from,
+                                                               date_to=date_to, document_id=document_id))
+    except Exception as e:
+        print(f"Vector search failed: {e}")
+        return []
 
 def update_vector_db() -> int:
     """Update vector DB with new notifications"""
@@ -457,7 +661,9 @@ def update_vector_db() -> int:
             continue
             
         print("Extracting text from PDF")
-        text = extract_text_from_pdf(pdf_path)
+        pages = extract_pdf_pages(pdf_path)
+        cache_ingested_pages(pdf_path, pages)
+        text = join_pages(pages)
         if not text:
             print("No text extracted")
             continue
@@ -469,6 +675,7 @@ def update_vector_db() -> int:
         metadata = {
             "title": notification["title"],
             "date": notification["date"],
+            "date_iso": iso_date(notification["date"]),
             "source": notification["source"],
             "pdf_url": notification["pdf_url"],
             "pdf_path": pdf_path,
@@ -477,8 +684,8 @@ def update_vector_db() -> int:
         }
         
         print("Chunking text and adding to vector store")
-        documents = chunk_text(text, sanitize_metadata(metadata))
-        vector_store.add_documents(documents)
+        documents = chunk_pages(pages, sanitize_metadata(metadata))
+        vector_registry.add_documents(documents)
         
         # Update metadata
         existing_metadata.append(metadata)
@@ -487,8 +694,8 @@ def update_vector_db() -> int:
     
     if new_count > 0:
         print(f"Saving {new_count} new entries")
-        save_metadata(existing_metadata)
-        vector_store.persist()
+        _append_metadata("fssai", METADATA_FILE, existing_metadata[-new_count:])
+        vector_registry.persist()
     
     return new_count
 
@@ -497,11 +704,12 @@ def extract_description(text: str, max_sentences: int = 3) -> str:
     if not text:
         return ""
     
-    # Split into sentences
+    # Split into sentences; the classified copy splits identically since ".!?" map to themselves
     sentences = re.split(r'[.!?]+', text)
+    sentence_classes = re.split(r'[.!?]+', text.translate(_SCRIPT_TABLE))
     meaningful_sentences = []
     
-    for sentence in sentences:
+    for sentence, classes in zip(sentences, sentence_classes):
         sentence = sentence.strip()
         if not sentence:
             continue
@@ -511,8 +719,7 @@ def extract_description(text: str, max_sentences: int = 3) -> str:
             continue
             
         # Filter out non-English sentences
-        devanagari_chars = re.findall(r'[\u0900-\u097F]', sentence)
-        if len(devanagari_chars) / max(1, len(sentence)) > 0.2:
+        if classes.strip().count(_SCRIPT_DEVANAGARI) / len(sentence) > 0.2:
             continue
             
         # Look for sentences that seem like regulatory content
@@ -546,11 +753,14 @@ def update_rbi_only() -> int:
         if not pdf_path:
             continue
             
-        text = extract_text_from_pdf(pdf_path)
+        pages = extract_pdf_pages(pdf_path)
+        cache_ingested_pages(pdf_path, pages)
+        text = join_pages(pages)
         
         metadata = {
             "title": notification["title"],
             "date": notification["date"],
+            "date_iso": iso_date(notification["date"]),
             "source": notification["source"],
             "pdf_url": notification["pdf_url"],
             "pdf_path": pdf_path,
@@ -560,15 +770,15 @@ def update_rbi_only() -> int:
         
         # Only add to vector store if text was extracted, but always save metadata
         if text:
-            documents = chunk_text(text, sanitize_metadata(metadata))
-            vector_store.add_documents(documents)
+            documents = chunk_pages(pages, sanitize_metadata(metadata))
+            vector_registry.add_documents(documents)
         existing_rbi_metadata.append(metadata)
         new_count += 1
     
     if new_count > 0:
         print(f"Saving {new_count} new RBI entries")
-        save_rbi_metadata(existing_rbi_metadata)
-        vector_store.persist()
+        _append_metadata("rbi", METADATA_RBI_FILE, existing_rbi_metadata[-new_count:])
+        vector_registry.persist()
     
     return new_count
 
@@ -577,47 +787,66 @@ def get_metadata_store() -> List[Dict]:
     """Get all stored metadata"""
     return load_metadata()
 
-def _parse_date(d: str) -> datetime:
-    # Try common formats used in scraping (e.g., "14-08-2025")
-    for fmt in ("%d-%m-%Y", "%Y-%m-%d", "%d/%m/%Y"):
-        try:
-            return datetime.strptime(d, fmt)
-        except Exception:
-            continue
-    return datetime.min
+def _ensure_iso_dates(metadata: List[Dict]):
+    """Add `date_iso` to entries ingested before it existed (saved back with the next write)"""
+    for m in metadata:
+        if "date_iso" not in m:
+            m["date_iso"] = iso_date(m.get("date", ""))
 
-def get_latest_amendments(limit: int = 6) -> List[Dict]:
-    """Return latest amendments with full text content by reading stored PDFs.
-    Output: [{title, date, content, id}]
+def cache_ingested_pages(pdf_path: str, pages: List[str]):
+    """Keep the page texts extracted at ingest in the text cache, so readers never re-parse the PDF"""
+    try:
+        save_pages(file_sha256(pdf_path), pages, source_path=pdf_path)
+    except Exception as e:
+        print(f"Warning: could not cache text of {pdf_path}: {e}")
+
+# Excerpts of cached documents by content hash (the cache entry itself holds every page)
+_excerpt_memo: Dict[str, str] = {}
+
+def cached_excerpt(path: str) -> str:
+    """Short English excerpt of an ingested document from the text cache; "" if not cached yet"""
+    if not path or not os.path.exists(path):
+        return ""
+    sha = file_sha256(path)
+    if sha not in _excerpt_memo:
+        pages = load_pages(sha)
+        if pages is None:
+            return ""
+        _excerpt_memo[sha] = extract_excerpt(join_pages(pages[:2]))
+    return _excerpt_memo[sha]
+
+def amendment_text_pages(document_id: str) -> Optional[List[str]]:
+    """Full page texts of an ingested amendment (cached at ingest; extracted and cached once for
+    older entries), or None for an unknown document"""
+    found = metadata_index.find(document_id)
+    if found is None:
+        return None
+    return extract_document_pages(found[1].get("pdf_path", ""))
+
+def _amendment_summary(m: Dict, source: str, include_content: bool) -> Dict:
+    item = {
+        "title": m.get("title", ""),
+        "date": m.get("date", "Unknown"),
+        "description": m.get("description", ""),
+        "excerpt": cached_excerpt(m.get("pdf_path", "")),
+        "id": m.get("document_id") or hashlib.md5(m.get("pdf_url", "").encode()).hexdigest(),
+        "source": source,
+    }
+    if include_content:
+        item["content"] = join_pages(extract_document_pages(m.get("pdf_path", "")))
+    return item
+
+def get_latest_amendments(limit: int = 6, include_content: bool = False) -> List[Dict]:
+    """Return latest amendments (newest first) with description and excerpt.
+    Output: [{title, date, description, excerpt, id, source}], plus `content` (full text from the
+    text cache) when include_content is set.
     """
-    meta = load_metadata()
-    # Sort by parsed date descending; unknown at end
-    meta_sorted = sorted(meta, key=lambda m: _parse_date(m.get("date", "")), reverse=True)
-    results: List[Dict] = []
-    for m in meta_sorted[:limit]:
-        content = extract_text_from_pdf(m.get("pdf_path", ""))
-        results.append({
-            "title": m.get("title", ""),
-            "date": m.get("date", "Unknown"),
-            "content": content,
-            "id": m.get("document_id") or hashlib.md5(m.get("pdf_url", "").encode()).hexdigest()
-        })
-    return results
-def get_latest_rbi_amendments(limit: int = 6) -> List[Dict]:
-    """Return latest RBI amendments only"""
-    meta = load_rbi_metadata()
-    meta_sorted = sorted(meta, key=lambda m: _parse_date(m.get("date", "")), reverse=True)
-    results: List[Dict] = []
-    for m in meta_sorted[:limit]:
-        content = extract_text_from_pdf(m.get("pdf_path", ""))
-        results.append({
-            "title": m.get("title", ""),
-            "date": m.get("date", "Unknown"),
-            "content": content,
-            "id": m.get("document_id"),
-            "source": "RBI"
-        })
-    return results
+    return [_amendment_summary(m, m.get("source", "FSSAI"), include_content)
+            for m in metadata_index.latest("fssai", limit)]
+
+def get_latest_rbi_amendments(limit: int = 6, include_content: bool = False) -> List[Dict]:
+    """Return latest RBI amendments only (see get_latest_amendments)"""
+    return [_amendment_summary(m, "RBI", include_content) for m in metadata_index.latest("rbi", limit)]
 
 
 def get_latest_by_sources(counts: Dict[str, int]) -> List[Dict]:
@@ -628,9 +857,7 @@ def get_latest_by_sources(counts: Dict[str, int]) -> List[Dict]:
     out: List[Dict] = []
     # FSSAI uses general metadata file
     if counts.get("FSSAI", 0) > 0:
-        meta = load_metadata()
-        meta_sorted = sorted([m for m in meta if m.get("source") == "FSSAI"], key=lambda m: _parse_date(m.get("date", "")), reverse=True)
-        for m in meta_sorted[: counts.get("FSSAI")]:
+        for m in metadata_index.latest("fssai", counts["FSSAI"], source="FSSAI"):
             out.append({
                 "title": m.get("title", ""),
                 "date": m.get("date", "Unknown"),
@@ -643,9 +870,7 @@ def get_latest_by_sources(counts: Dict[str, int]) -> List[Dict]:
             })
 
     if counts.get("DGFT", 0) > 0:
-        meta = load_dgft_metadata()
-        meta_sorted = sorted(meta, key=lambda m: _parse_date(m.get("date", "")), reverse=True)
-        for m in meta_sorted[: counts.get("DGFT")]:
+        for m in metadata_index.latest("dgft", counts["DGFT"]):
             out.append({
                 "title": m.get("title", ""),
                 "date": m.get("date", "Unknown"),
@@ -658,9 +883,7 @@ def get_latest_by_sources(counts: Dict[str, int]) -> List[Dict]:
             })
 
     if counts.get("GST", 0) > 0:
-        meta = load_gst_metadata()
-        meta_sorted = sorted(meta, key=lambda m: _parse_date(m.get("date", "")), reverse=True)
-        for m in meta_sorted[: counts.get("GST")]:
+        for m in metadata_index.latest("gst", counts["GST"]):
             out.append({
                 "title": m.get("title", ""),
                 "date": m.get("date", "Unknown"),
@@ -675,15 +898,8 @@ def get_latest_by_sources(counts: Dict[str, int]) -> List[Dict]:
     return out
 
 def _load_company_json(company_id: str) -> Optional[Dict]:
-    """Load complete company JSON data"""
-    path = os.path.join(DATA_DIR, "companies", f"{company_id}.json")
-    if os.path.exists(path):
-        with open(path, "r") as f:
-            try:
-                return json.load(f)
-            except Exception:
-                return None
-    return None
+    """Load complete company JSON data (cached by the company registry; treat as read-only)"""
+    return company_registry.get(company_id)
 
 
 def sanitize_metadata(d: Dict) -> Dict:
@@ -751,6 +967,26 @@ def get_company_documents(company_id: str) -> List[str]:
             docs.append(d["file_path"])
     return docs
 
+def get_company_legal_documents(company_id: str) -> List[Tuple[str, str]]:
+    """Return [(document type, file path)] for a company's legal documents in submission order"""
+    data = _load_company_json(company_id) or {}
+    docs = []
+    for d in data.get("legal_documents", []) or []:
+        if d.get("file_path") and os.path.exists(d["file_path"]):
+            docs.append((d.get("document_type") or "Document", d["file_path"]))
+    return docs
+
+def get_company_label_paths(company_id: str) -> List[Tuple[str, str]]:
+    """Return [(label name, file path)] for the stored front/back packaging labels of a company"""
+    data = _load_company_json(company_id) or {}
+    labels = []
+    for i, p in enumerate(data.get("packaging", []) or []):
+        for side in ("front", "back"):
+            path = p.get(f"label_{side}_url")
+            if path and os.path.exists(path):
+                labels.append((f"Label {side} ({i + 1}): {os.path.basename(path)}", path))
+    return labels
+
 def ingest_local_pdfs_from(dir_path: str) -> int:
     """Ingest all PDFs from a local directory as amendments with today's date.
     Returns number of new entries added.
@@ -772,21 +1008,24 @@ def ingest_local_pdfs_from(dir_path: str) -> int:
         metadata = {
             "title": title,
             "date": datetime.now().strftime("%Y-%m-%d"),
+            "date_iso": datetime.now().strftime("%Y-%m-%d"),
             "source": "LOCAL",
             "pdf_url": pseudo_url,
             "pdf_path": fpath,
             "document_id": hashlib.md5(pseudo_url.encode()).hexdigest(),
         }
-        text = extract_text_from_pdf(fpath)
+        pages = extract_pdf_pages(fpath)
+        cache_ingested_pages(fpath, pages)
+        text = join_pages(pages)
         if not text:
             continue
-        docs = chunk_text(text, metadata)
-        vector_store.add_documents(docs)
+        docs = chunk_pages(pages, metadata)
+        vector_registry.add_documents(docs)
         existing.append(metadata)
         new_count += 1
     if new_count:
-        save_metadata(existing)
-        vector_store.persist()
+        _append_metadata("fssai", METADATA_FILE, existing[-new_count:])
+        vector_registry.persist()
     return new_count
 
 def store_company_data(company_data: CompanyData):
@@ -798,34 +1037,23 @@ def hash_company(name: str) -> str:
     return hashlib.md5(name.encode()).hexdigest()
 
 def save_company_json(company_data: CompanyData):
-    """Store complete structured data for retrieval under backend/data/companies"""
-    path = os.path.join(DATA_DIR, "companies", f"{hash_company(company_data.company_info.company_name)}.json")
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, 'w') as f:
-        f.write(company_data.model_dump_json(indent=2))
+    """Store complete structured data for retrieval under backend/data/companies (indexed by the registry)"""
+    company_registry.save(hash_company(company_data.company_info.company_name), company_data.model_dump_json(indent=2))
+
+def get_company_model(company_id: str) -> Optional[CompanyData]:
+    """Return the company's validated CompanyData (cached in process until the company is saved again)"""
+    return company_registry.get_model(company_id)
+
+def list_companies(limit: int = 50, cursor: Optional[str] = None, query: str = "") -> Dict:
+    """Page through companies, most recently updated first (see CompanyRegistry.list)"""
+    return company_registry.list(limit=limit, cursor=cursor, query=query)
 
 def get_latest_company_id() -> Optional[str]:
-    """Return the company_id (filename without .json) of the most recently modified company file.
+    """Return the company_id of the most recently saved company (registry index on updated_at).
     If none found, return None.
     """
-    companies_dir = os.path.join(DATA_DIR, "companies")
-    if not os.path.isdir(companies_dir):
-        return None
-    latest_id: Optional[str] = None
-    latest_mtime: float = -1.0
     try:
-        for fname in os.listdir(companies_dir):
-            if not fname.endswith(".json"):
-                continue
-            fpath = os.path.join(companies_dir, fname)
-            try:
-                mtime = os.path.getmtime(fpath)
-                if mtime > latest_mtime:
-                    latest_mtime = mtime
-                    latest_id = os.path.splitext(fname)[0]
-            except Exception:
-                continue
-        return latest_id
+        return company_registry.latest_id()
     except Exception:
         return None
 
@@ -937,13 +1165,16 @@ def update_dgft_only(target_pdf_dir: str = None) -> int:
         if not pdf_path:
             continue
 
-        text = extract_text_from_pdf(pdf_path)
+        pages = extract_pdf_pages(pdf_path)
+        cache_ingested_pages(pdf_path, pages)
+        text = join_pages(pages)
         metadata = {
             "title": f"DGFT Notification {n.get('number')} / {n.get('year')}",
             "number": n.get("number"),
             "year": n.get("year"),
             "description": n.get("description"),
             "date": n.get("date") or "Unknown",
+            "date_iso": iso_date(n.get("date") or ""),
             "source": "DGFT",
             "pdf_url": pdf_url,
             "pdf_path": pdf_path,
@@ -952,35 +1183,25 @@ def update_dgft_only(target_pdf_dir: str = None) -> int:
         }
 
         if text:
-            docs = chunk_text(text, sanitize_metadata(metadata))
-            vector_store.add_documents(docs)
+            docs = chunk_pages(pages, sanitize_metadata(metadata))
+            vector_registry.add_documents(docs)
 
         existing.append(metadata)
         new_count += 1
 
     if new_count:
-        save_dgft_metadata(existing)  # Save to DGFT-specific metadata
+        _append_metadata("dgft", METADATA_DGFT_FILE, existing[-new_count:])  # DGFT-specific metadata
+        vector_registry.persist()
 
     return new_count
 
 def load_dgft_metadata() -> List[Dict]:
-    """Load DGFT-specific metadata"""
-    if os.path.exists(METADATA_DGFT_FILE):
-        try:
-            with open(METADATA_DGFT_FILE, 'r') as f:
-                content = f.read().strip()
-                if not content:  # Handle empty file
-                    return []
-                return json.loads(content)
-        except (json.JSONDecodeError, Exception) as e:
-            print(f"Warning: Error loading DGFT metadata, creating fresh: {e}")
-            return []
-    return []
+    """Load DGFT-specific metadata ([] if missing; a damaged file raises CorruptStoreError)"""
+    return read_json(METADATA_DGFT_FILE, [])
 
 def save_dgft_metadata(metadata: List[Dict]):
     """Save DGFT-specific metadata"""
-    with open(METADATA_DGFT_FILE, 'w') as f:
-        json.dump(metadata, f, indent=2)
+    write_json(METADATA_DGFT_FILE, metadata)
 
 def scrape_gst_notifications() -> List[Dict]:
     """Scrape GST Council notifications with pagination"""
@@ -1205,23 +1426,12 @@ def scrape_gst_notifications() -> List[Dict]:
         return notifications  # Return whatever we've collected so far
 
 def load_gst_metadata() -> List[Dict]:
-    """Load GST-specific metadata"""
-    if os.path.exists(METADATA_GST_FILE):
-        try:
-            with open(METADATA_GST_FILE, 'r') as f:
-                content = f.read().strip()
-                if not content:
-                    return []
-                return json.loads(content)
-        except (json.JSONDecodeError, Exception) as e:
-            print(f"Warning: Error loading GST metadata, creating fresh: {e}")
-            return []
-    return []
+    """Load GST-specific metadata ([] if missing; a damaged file raises CorruptStoreError)"""
+    return read_json(METADATA_GST_FILE, [])
 
 def save_gst_metadata(metadata: List[Dict]):
     """Save GST-specific metadata"""
-    with open(METADATA_GST_FILE, 'w') as f:
-        json.dump(metadata, f, indent=2)
+    write_json(METADATA_GST_FILE, metadata)
 
 def update_gst_only(target_pdf_dir: str = None) -> int:
     """Download new GST notifications, ingest into vector DB and update GST metadata"""
@@ -1246,10 +1456,13 @@ def update_gst_only(target_pdf_dir: str = None) -> int:
         if not pdf_path:
             continue
 
-        text = extract_text_from_pdf(pdf_path)
+        pages = extract_pdf_pages(pdf_path)
+        cache_ingested_pages(pdf_path, pages)
+        text = join_pages(pages)
         metadata = {
             "title": n.get("title", "GST Notification"),
             "date": n.get("date", "Unknown"),
+            "date_iso": iso_date(n.get("date") or ""),
             "source": "GST",
             "pdf_url": pdf_url,
             "pdf_path": pdf_path,
@@ -1259,105 +1472,84 @@ def update_gst_only(target_pdf_dir: str = None) -> int:
         }
 
         if text:
-            docs = chunk_text(text, sanitize_metadata(metadata))
-            vector_store.add_documents(docs)
+            docs = chunk_pages(pages, sanitize_metadata(metadata))
+            vector_registry.add_documents(docs)
 
         existing.append(metadata)
         new_count += 1
 
     if new_count:
-        save_gst_metadata(existing)
+        _append_metadata("gst", METADATA_GST_FILE, existing[-new_count:])
+        vector_registry.persist()
 
     return new_count
 
-def save_filtered_amendments(amendments: List[Dict], company_id: Optional[str] = None):
-    """Save filtered amendments to backend/data/filtered_amms/"""
-    filtered_dir = os.path.join(DATA_DIR, "filtered_amms")
-    os.makedirs(filtered_dir, exist_ok=True)
-    
-    # Create filename with timestamp and optional company ID
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"filtered_{timestamp}"
-    if company_id:
-        filename += f"_{company_id}"
-    filename += ".json"
-    
-    filepath = os.path.join(filtered_dir, filename)
-    
-    # Prepare data to save
-    data_to_save = {
-        "timestamp": timestamp,
-        "company_id": company_id,
-        "total_count": len(amendments),
-        "amendments": amendments
-    }
-    
-    # Save to file
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data_to_save, f, indent=2, ensure_ascii=False)
-    
-    print(f"Saved {len(amendments)} filtered amendments to {filepath}")
-    return filepath
+def known_document_ids() -> Set[str]:
+    """Document ids of every notification in the metadata stores (a damaged store raises)"""
+    ids = set()
+    for entries in (load_metadata(), load_rbi_metadata(), load_dgft_metadata(), load_gst_metadata()):
+        for m in entries:
+            ids.add(m.get("document_id") or hashlib.md5((m.get("pdf_url") or "").encode()).hexdigest())
+    return ids
+
+def vector_health() -> Dict:
+    """Index-health report of the vector collections (see VectorRegistry.health)"""
+    return vector_registry.health(known_document_ids())
+
+def compact_vector_db(dry_run: bool = False) -> int:
+    """Drop orphaned/duplicate vectors and re-key legacy chunk ids; returns the number of chunks removed"""
+    result = vector_registry.gc(known_document_ids(), dry_run=dry_run)
+    return sum(r["deleted_dangling"] + r["deleted_duplicates"] for r in result.values())
+
+def save_filtered_amendments(amendments: List[Dict], company_id: Optional[str] = None) -> int:
+    """Save filtered amendments as the company's current set (new version); returns the version"""
+    version = filtered_store.save(amendments, company_id)
+    print(f"Saved {len(amendments)} filtered amendments for {company_id or 'all companies'} (v{version})")
+    return version
 
 def backfill_metadata_excerpts() -> Dict[str, int]:
     """Scan ALL existing metadata entries and populate description fields."""
     results = {"FSSAI": 0, "DGFT": 0, "GST": 0, "RBI": 0}
 
-    # FSSAI general metadata - force description for ALL entries
-    meta = load_metadata()
-    updated = 0
-    for m in meta:
+    # FSSAI general metadata - force description for ALL entries (PDFs are read outside the file
+    # lock; the descriptions are then applied to the current file under it)
+    descriptions: Dict[str, str] = {}
+    for m in load_metadata():
         if m.get("source") == "FSSAI":
             path = m.get("pdf_path")
             if path and os.path.exists(path):
-                text = extract_text_from_file(path)
+                text = extract_text_from_file(path, max_pages=DESCRIPTION_PAGE_BUDGET)
                 if text:
                     # Always regenerate description for FSSAI
-                    m["description"] = extract_description(text)
-                    updated += 1
-    
-    if updated:
-        save_metadata(meta)
-    results["FSSAI"] = updated
+                    descriptions[m.get("pdf_url")] = extract_description(text)
+
+    def apply_descriptions(meta: List[Dict]) -> List[Dict]:
+        for m in meta:
+            if m.get("pdf_url") in descriptions:
+                m["description"] = descriptions[m.get("pdf_url")]
+                results["FSSAI"] += 1
+        return meta
+
+    if descriptions:
+        update_json(METADATA_FILE, apply_descriptions, default=[])
 
     # For DGFT and GST, use existing description or title
-    dgft_meta = load_dgft_metadata()
-    gst_meta = load_gst_metadata()
-    
-    # Ensure DGFT entries have description
-    for m in dgft_meta:
-        if not m.get("description"):
-            m["description"] = m.get("title", "DGFT Notification")
-    
-    # Ensure GST entries have description  
-    for m in gst_meta:
-        if not m.get("description"):
-            m["description"] = m.get("title", "GST Notification")
-    
-    save_dgft_metadata(dgft_meta)
-    save_gst_metadata(gst_meta)
+    def fill_from_title(fallback: str):
+        def fill(meta: List[Dict]) -> List[Dict]:
+            for m in meta:
+                if not m.get("description"):
+                    m["description"] = m.get("title", fallback)
+            return meta
+        return fill
+
+    update_json(METADATA_DGFT_FILE, fill_from_title("DGFT Notification"), default=[])
+    update_json(METADATA_GST_FILE, fill_from_title("GST Notification"), default=[])
 
     return results
 
-def get_latest_filtered_amendments() -> List[Dict]:
-    """Get the most recent filtered amendments from backend/data/filtered_amms/"""
-    filtered_dir = os.path.join(DATA_DIR, "filtered_amms")
-    if not os.path.exists(filtered_dir):
-        return []
-    
-    # Find the latest filtered amendments file
-    files = [f for f in os.listdir(filtered_dir) if f.startswith("filtered_") and f.endswith(".json")]
-    if not files:
-        return []
-    
-    # Sort by timestamp (newest first)
-    files.sort(reverse=True)
-    latest_file = files[0]
-    
-    try:
-        with open(os.path.join(filtered_dir, latest_file), 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return data.get("amendments", [])
-    except Exception as e:
-        print(f"Error loading filtered amendments: {e}")
-        return []
\ No newline at end of file
+def get_latest_filtered_amendments(company_id: Optional[str] = None) -> List[Dict]:
+    """Get the company's current filtered amendments (falls back to the set saved without a company)"""
+    current = filtered_store.current(company_id)
+    if current is None and company_id:
+        current = filtered_store.current(None)
+    return current["amendments"] if current else []
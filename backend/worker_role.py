@@ -0,0 +1,75 @@
+import os
+import threading
+from typing import Callable
+
+"""Process roles for multi-worker deployments.
+
+VIGILO_ROLE selects what this process does:
+  all     (default) serve HTTP and compete for the ingestion writer role; `python main.py`
+  web     serve HTTP only: /update* just enqueue, the vector store is opened read-only
+  ingest  the single ingestion writer, `python ingest_worker.py`
+
+gunicorn.conf.py starts web workers; run one ingest process beside them. Every web worker opens
+the same persisted vector store and reopens it when the writer signals new vectors (the writer
+touches <persist_dir>/.updated after each persist), so searches see fresh ingests without a restart.
+"""
+
+ROLE = os.getenv("VIGILO_ROLE", "all").strip().lower()
+WRITER_ROLES = ("all", "ingest")
+# Methods of a LangChain vector store that modify it
+WRITE_METHODS = ("add_documents", "add_texts", "delete", "update_document", "update_documents", "persist",
+                 "delete_collection", "reset_collection")
+
+
+def is_writer() -> bool:
+    """Whether this process may ingest: it writes the vector store and runs an ingestion worker
+    (only the worker holding the leader lock executes runs)."""
+    return ROLE in WRITER_ROLES
+
+
+class SharedVectorStore:
+    """A vector store opened by `factory`, shared on disk with other processes.
+
+    Reads reopen the store when another process has persisted new vectors since it was opened.
+    When `writable` is False, write methods raise PermissionError; otherwise persist() also
+    publishes the change to the other processes.
+    """
+
+    def __init__(self, factory: Callable, persist_dir: str, writable: bool):
+        self._factory = factory
+        self._marker = os.path.join(persist_dir, ".updated")
+        self.writable = writable
+        self._lock = threading.Lock()
+        self._seen = self._marker_mtime()
+        self._store = factory()
+
+    def _marker_mtime(self) -> int:
+        try:
+            return os.stat(self._marker).st_mtime_ns
+        except OSError:
+            return 0
+
+    def _current(self):
+        mtime = self._marker_mtime()
+        if mtime != self._seen:
+            with self._lock:
+                if mtime != self._seen:
+                    self._store = self._factory()
+                    self._seen = mtime
+        return self._store
+
+    def persist(self):
+        if not self.writable:
+            raise PermissionError("vector store is read-only in this process (VIGILO_ROLE=web)")
+        store = self._current()
+        if hasattr(store, "persist"):
+            store.persist()
+        os.makedirs(os.path.dirname(self._marker), exist_ok=True)
+        with open(self._marker, "a"):
+            os.utime(self._marker, None)
+        self._seen = self._marker_mtime()
+
+    def __getattr__(self, name: str):
+        if name in WRITE_METHODS and not self.writable:
+            raise PermissionError(f"vector store is read-only in this process (VIGILO_ROLE=web): {name}")
+        return getattr(self._current(), name)